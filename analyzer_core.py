@@ -0,0 +1,676 @@
+import asyncio
+import datetime
+import heapq
+import re
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+
+import async_client
+from api_cache import CachedSpotify, open_cache
+from auth_handler import TokenSession
+from credential_pool import CredentialPool, PooledSpotify
+from singleflight import CoalescingSpotify
+
+# GUI-free part of the analyzer: everything that talks to Spotify and shapes the results.
+# popularity.py (Tk) and batch_cli.py (headless) both sit on top of this module, so it must never import tkinter.
+
+ALBUM_BATCH_SIZE = 20  # the bulk albums endpoint accepts up to 20 IDs per call
+TRACK_BATCH_SIZE = 50  # and the bulk tracks endpoint up to 50
+FEATURES_BATCH_SIZE = 100  # audio-features up to 100
+
+DEFAULT_SETTINGS = {
+    "types": ["album", "single", "compilation"],
+    "filters": [],  # По умолчанию — без фильтрации
+    "albums_to_export": "3",
+    "tracks_to_export": "5",
+    "sort_order": "Descending",
+    "market": "",  # two-letter country code, empty lists releases from every market
+    "collapse_variants": True
+}
+
+KEYWORD_ALIASES = {
+    "reissue": ["reissue", "re-issue"],
+    "remix": ["remix", "remixed"],
+    "remastered": ["remastered", "remaster"]
+}
+
+ARTIST_ID_RE = re.compile(r"(?:spotify:artist:|open\.spotify\.com/artist/)?([0-9A-Za-z]{22})(?:\?.*)?$")
+SERVER_ERRORS = (500, 502, 503, 504)  # what spotipy clients that leave 429s to us still retry themselves
+
+
+def make_client(client_id, client_secret, use_cache=True, wrap=None, flight=None, pool=None, retry_429=True):
+    # Returns (sp, auth_manager, api_cache). api_cache is None when caching is off or unavailable.
+    # pool is a list of more {"client_id", "client_secret"} pairs: requests are then spread over all the
+    # credentials and auth_manager is a credential_pool.CredentialPool.
+    # wrap(sp) can put a layer between spotipy and the cache (e.g. crawler.BudgetedSpotify), it only sees
+    # the requests that actually go to Spotify. Concurrent identical requests are coalesced by flight
+    # (a singleflight.SingleFlight, a private one if None). retry_429=False is for a wrap that deals with 429s
+    # itself: spotipy then hands them over at once, with their Retry-After, instead of retrying them.
+    # The access token comes from a persisted, background-refreshed auth_handler.TokenSession.
+    # spotipy (and requests under it) is imported here rather than at the top, it's a big part of the startup time.
+    import spotipy
+    extra = [c for c in pool or () if c["client_id"] != client_id]
+
+    def client(session):
+        # A pooled key has to see its 429s (with their Retry-After) to step aside, so it doesn't retry them
+        if extra or not retry_429:
+            return spotipy.Spotify(auth_manager=session, requests_session=_session_without_429_retries())
+        return spotipy.Spotify(auth_manager=session)
+
+    auth_manager = TokenSession(client_id, client_secret)
+    sp = client(auth_manager)
+    if extra:
+        keys = [(client_id, sp, auth_manager)]
+        for creds in extra:
+            session = TokenSession(creds["client_id"], creds["client_secret"])
+            keys.append((creds["client_id"], client(session), session))
+        auth_manager = CredentialPool(keys)
+        sp = PooledSpotify(auth_manager)
+    if wrap:
+        sp = wrap(sp)
+    sp = CoalescingSpotify(sp, flight)
+    api_cache = open_cache() if use_cache else None
+    if api_cache:
+        sp = CachedSpotify(sp, api_cache)
+    return sp, auth_manager, api_cache
+
+
+def _session_without_429_retries():
+    # The requests session spotipy builds by default retries 429s inside urllib3: the caller only sees one
+    # once the retries ran out, and then without its headers. This one only retries connection and server
+    # errors, a 429 comes back at once with its Retry-After.
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+    retry = Retry(total=3, connect=None, read=False, status=3, backoff_factor=0.3, status_forcelist=SERVER_ERRORS,
+                  allowed_methods=frozenset(["GET", "POST", "PUT", "DELETE"]), respect_retry_after_header=False)
+    adapter = HTTPAdapter(max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def expand_keywords(filters):
+    result = []
+    for keyword in filters:
+        if keyword in KEYWORD_ALIASES:
+            result.extend(KEYWORD_ALIASES[keyword])
+        else:
+            result.append(keyword)
+    return result
+
+
+class KeywordFilter:
+    # Filter keywords compiled into one case-insensitive regex. Keywords only match whole words,
+    # so "live" drops "Live in Oslo" but keeps "Alive", and "edit" doesn't hit "Deluxe Edition".
+    # The same filter is used for releases and tracks.
+    def __init__(self, keywords=()):
+        self.keywords = tuple(sorted({k.lower() for k in keywords if k}, key=len, reverse=True))
+        self._regex = None
+        if self.keywords:
+            self._regex = re.compile(r"(?<!\w)(?:" + "|".join(map(re.escape, self.keywords)) + r")(?!\w)",
+                                     re.IGNORECASE)
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(expand_keywords(settings.get("filters", [])))
+
+    def matches(self, name):
+        return bool(self._regex and self._regex.search(name or ""))
+
+    def albums(self, albums):
+        # (id, name, popularity, year) tuples whose name doesn't match
+        return [album for album in albums if not self.matches(album[1])]
+
+    def tracks(self, tracks):
+        # {"id", "name", "popularity"} dicts whose name doesn't match
+        return [track for track in tracks if not self.matches(track["name"])]
+
+
+def normalize_name(name):
+    # Lowercase words without accents and punctuation, for comparing and indexing names
+    name = unicodedata.normalize("NFKD", name or "").casefold()
+    return " ".join(re.sub(r"[^\w]+", " ", "".join(c for c in name if not unicodedata.combining(c))).split())
+
+
+def variant_key(album):
+    # What makes two entries of a discography page the same release: name (case, accents and punctuation
+    # ignored), track count, release date and type
+    return (normalize_name(album.get("name", "")), album.get("total_tracks"), album.get("release_date"),
+            album.get("album_type"))
+
+
+class VariantGroups:
+    # Collapses the copies Spotify lists of one release (regional variants, clean/explicit versions,
+    # re-uploads) using only the discography page data, so they never cost a lookup. The first entry of
+    # every group represents it; the others are kept in `variants` to be shown on request.
+    def __init__(self):
+        self._first = {}  # variant_key -> ID of the representative
+        self._seen = set()
+        self.variants = {}  # representative ID -> [(id, name)] of the releases collapsed into it
+        self.collapsed = 0
+
+    def keep(self, album):
+        album_id = album["id"]
+        if album_id in self._seen:
+            # The very same release listed twice
+            self.collapsed += 1
+            return False
+        self._seen.add(album_id)
+        first = self._first.setdefault(variant_key(album), album_id)
+        if first == album_id:
+            return True
+        self.variants.setdefault(first, []).append((album_id, album.get("name", "")))
+        self.collapsed += 1
+        return False
+
+
+def _as_filter(keywords):
+    # Accepts a KeywordFilter or a plain list of (already expanded) keywords
+    return keywords if isinstance(keywords, KeywordFilter) else KeywordFilter(keywords or ())
+
+
+def _top(items, n, key, descending):
+    # Same result as sorted(items, key=key, reverse=descending)[:n], without sorting everything
+    if n is None or n >= len(items):
+        return sorted(items, key=key, reverse=descending)
+    return (heapq.nlargest if descending else heapq.nsmallest)(n, items, key=key)
+
+
+def sort_albums(albums, settings):
+    # Albums picked for an export, in export order. albums is a list of (id, name, popularity, year)
+    # tuples or a columnar.AlbumView (vectorized top-N).
+    count_option = settings.get("albums_to_export", "3")
+    export_num = None if count_option == "All" else int(count_option)
+    reverse_order = settings.get("sort_order", "Descending") == "Descending"
+    if hasattr(albums, "top"):
+        return albums.top(export_num, reverse_order)
+    return _top(albums, export_num, lambda x: x[2], reverse_order)
+
+
+def limit_tracks(track_data, settings):
+    # track_data is a list of (name, popularity[, ...]) tuples, sorted and cut down to tracks_to_export
+    reverse_order = settings.get("sort_order", "Descending") == "Descending"
+    track_limit = settings.get("tracks_to_export", "3")
+    return _top(track_data, None if track_limit == "All" else int(track_limit), lambda x: x[1], reverse_order)
+
+
+def format_popularity_export(artist_name, export, dt=None):
+    # Turns the result of AnalyzerCore.collect_popularity_export into the text export format
+    parts = [format_export_header(artist_name, export["genres"], dt)]
+    parts.extend(format_export_album(album, top_tracks, error) for album, top_tracks, error in export["albums"])
+    # Blocks end with a newline, the text as a whole doesn't
+    return "".join(parts)[:-1]
+
+
+def format_export_header(artist_name, genres, dt=None):
+    dt = dt or datetime.datetime.now().astimezone()
+    lines = []
+    lines.append(f"Popularity Export for Artist: {artist_name}")
+    lines.append(f"Date/Time (Local): {dt.strftime('%Y-%m-%d %H:%M:%S %Z')}")
+    lines.append(f"Genre: {genres}")
+    lines.append(f"The most popular song: ")
+    lines.append(f"Stream Count: ")
+    lines.append("Source: Spotify API — https://www.spotify.com\n")
+    return "\n".join(lines) + "\n"
+
+
+def format_export_album(album, top_tracks, error):
+    # One album block of the text export, top_tracks as returned by export_tracks
+    alb_id, alb_name, alb_pop, alb_year = album
+    lines = [f"Album: {alb_name} ({alb_year}), Popularity: {alb_pop}"]
+    if error:
+        lines.append(f"  Error fetching tracks: {error}\n")
+        return "\n".join(lines) + "\n"
+    for (t_name, t_pop, t_id) in top_tracks:
+        lines.append(f"   Track: {t_name}, Popularity: {t_pop}, Stream Count: ")
+    lines.append("")
+    return "\n".join(lines) + "\n"
+
+
+def export_tracks(tracks, settings):
+    # (name, popularity, id) tuples of the tracks an export shows for one album
+    return limit_tracks([(t["name"], t["popularity"], t["id"]) for t in tracks], settings)
+
+
+class NullTask:
+    # Stand-in for background.Task when there is no GUI to report progress to
+    def check(self):
+        pass
+
+    def progress(self, done, total=None, text=None):
+        pass
+
+
+NULL_TASK = NullTask()
+
+
+class QuietTask:
+    # Passes cancellation checks through but swallows progress, for helpers running in parallel
+    def __init__(self, task):
+        self._task = task
+
+    def check(self):
+        self._task.check()
+
+    def progress(self, done, total=None, text=None):
+        pass
+
+
+class AnalyzerCore:
+    # Fetch logic shared by the GUI and the batch CLI. All methods block and are meant to be called
+    # from worker threads; `task` is used for cancellation checks and progress reports.
+    # With use_async (and aiohttp installed) bulk requests go through async_client instead of sp,
+    # api_prefix points it at another server (fake_spotify.py in the benchmarks) and api_stats
+    # (a diagnostics.ApiStats) records its requests. pool is the CredentialPool when make_client built one:
+    # the async requests then take their keys from it too.
+
+    def __init__(self, sp, token_provider=None, use_async=False, concurrency=8, api_prefix=async_client.API_PREFIX,
+                 api_stats=None, pool=None):
+        self.sp = sp
+        self.token_provider = token_provider
+        self.pool = pool
+        self.use_async = use_async
+        self.concurrency = concurrency
+        self.api_prefix = api_prefix
+        self.api_stats = api_stats
+
+    def async_enabled(self):
+        return bool(self.use_async and self.token_provider and async_client.available())
+
+    def _async_options(self):
+        return {"concurrency": self.concurrency, "prefix": self.api_prefix, "stats": self.api_stats, "pool": self.pool}
+
+    def _run_async(self, work):
+        return async_client.run_bulk(self.token_provider, work, **self._async_options())
+
+    def _cache_aware(self):
+        return isinstance(self.sp, CachedSpotify)
+
+    def fetched_at(self, endpoint, ids):
+        # {id: time it was fetched} for the objects the response cache served, which may be hours old.
+        # Whatever isn't in there was just fetched (or there is no cache).
+        return self.sp.fetched_at(endpoint, list(ids)) if self._cache_aware() else {}
+
+    # ------------------------------
+    # Artists
+    # ------------------------------
+    def resolve_artist(self, query):
+        # Accepts an artist ID, URI or URL, or a name (the best search match is used).
+        # Returns the full artist object or None.
+        query = query.strip()
+        match = ARTIST_ID_RE.search(query)
+        if match:
+            return self.sp.artist(match.group(1))
+        artists = self.sp.search(q=query, type="artist", limit=1)["artists"]["items"]
+        return artists[0] if artists else None
+
+    # ------------------------------
+    # Discography
+    # ------------------------------
+    def fetch_discography(self, artist_id, album_types, keywords, task=NULL_TASK, variants=None, market=None):
+        # Whole discography at once. Returns (albums, page_calls, lookup_calls) where albums are
+        # (id, name, popularity, year) tuples.
+        stats = {}
+        albums = []
+        for batch in self.iter_discography(artist_id, album_types, keywords, task, stats, variants, market):
+            albums.extend(batch)
+        return albums, stats["pages"], stats["lookups"]
+
+    def iter_discography(self, artist_id, album_types, keywords, task=NULL_TASK, stats=None, variants=None,
+                         market=None):
+        # Generator: pages through the discography and yields hydrated (id, name, popularity, year) tuples
+        # batch by batch, in discography order, so callers can show results before the fetch is over.
+        # stats (a dict) gets "pages", "lookups" and "total" filled in along the way, plus "groups"
+        # (album ID -> album group, e.g. "single") for every release that was yielded or collapsed.
+        # With variants (a VariantGroups) duplicate editions are dropped before they're hydrated;
+        # market limits the discography to releases available in that country.
+        stats = {} if stats is None else stats
+        stats.update(pages=0, lookups=0, total=None, groups={})
+        keywords = _as_filter(keywords)
+        if self.async_enabled():
+            yield from self._iter_discography_async(artist_id, album_types, keywords, task, stats, variants, market)
+            return
+        offset = 0
+        loaded = 0
+        # spotipy calls the market parameter of this endpoint "country"
+        market_param = {"country": market} if market else {}
+
+        while True:
+            task.check()
+            stats["pages"] += 1
+            results = self.sp.artist_albums(artist_id, album_type=album_types, limit=50, offset=offset,
+                                            **market_param)
+            stats["total"] = results.get("total")
+
+            items = results["items"]
+            if not items:
+                break
+
+            # Collect the IDs from this page first, details are then resolved in multi-ID batches
+            page = _filter_page(items, keywords, stats["groups"], variants)
+            for start in range(0, len(page), ALBUM_BATCH_SIZE):
+                batch = self.hydrate_albums(page[start:start + ALBUM_BATCH_SIZE], task, stats)
+                loaded += len(batch)
+                task.progress(offset + len(items), stats["total"], f"Loading discography... {loaded} releases")
+                yield batch
+
+            offset += 50
+            if len(items) < 50:
+                break
+
+    def iter_catalog(self, artist_id, release_types, task=NULL_TASK, stats=None, variants=None, market=None):
+        # Unfiltered discography for the given release types in one paging run, yielded as
+        # {release type: [(id, name, popularity, year)]} dicts as the batches come in
+        stats = {} if stats is None else stats
+        for batch in self.iter_discography(artist_id, ",".join(release_types), None, task, stats, variants, market):
+            by_type = {}
+            for album in batch:
+                by_type.setdefault(stats["groups"].get(album[0], "album"), []).append(album)
+            yield by_type
+
+    def _iter_discography_async(self, artist_id, album_types, keywords, task, stats, variants, market):
+        # Every page runs as its own fetch-then-hydrate pipeline and all pipelines run concurrently;
+        # results are still handed out in discography order, each page as soon as it (and the ones
+        # before it) are done
+        def hydrated(page, details):
+            return [album_row(album_id, album_name, details.get(album_id)) for album_id, album_name in page]
+
+        async def hydrate(client, page):
+            # Albums that are still in the response cache don't need to be requested again
+            ids = [album_id for album_id, _ in page]
+            details = self.sp.lookup_cached("album", ids) if self._cache_aware() else {}
+            missing = [album_id for album_id in ids if album_id not in details]
+            if missing:
+                stats["lookups"] += (len(missing) + ALBUM_BATCH_SIZE - 1) // ALBUM_BATCH_SIZE
+                fetched = await client.albums(missing)
+                if self._cache_aware():
+                    self.sp.remember("album", fetched)
+                details.update(zip(missing, fetched))
+            return hydrated(page, details)
+
+        async def pipeline(client, offset):
+            result = await client.artist_albums(artist_id, album_type=album_types, offset=offset, market=market)
+            stats["pages"] += 1
+            return await hydrate(client, _filter_page(result["items"], keywords, stats["groups"], variants))
+
+        async def work(client, emit):
+            first = await client.artist_albums(artist_id, album_type=album_types, offset=0, market=market)
+            stats["pages"] += 1
+            stats["total"] = first.get("total", len(first["items"]))
+            rest = [asyncio.ensure_future(pipeline(client, offset)) for offset in range(50, stats["total"], 50)]
+            try:
+                emit(await hydrate(client, _filter_page(first["items"], keywords, stats["groups"], variants)))
+                for future in rest:
+                    emit(await future)
+            finally:
+                for future in rest:
+                    future.cancel()
+
+        loaded = 0
+        for batch in async_client.iter_bulk(self.token_provider, work, **self._async_options()):
+            loaded += len(batch)
+            task.progress(min(stats["pages"] * 50, stats["total"]), stats["total"],
+                          f"Loading discography... {loaded} releases")
+            yield batch
+
+    def hydrate_albums(self, page, task=NULL_TASK, stats=None):
+        # Resolves popularity and release year for up to ALBUM_BATCH_SIZE (album_id, album_name) pairs
+        # with one bulk albums request and returns them as (id, name, popularity, year) tuples.
+        # Requests sent to Spotify are counted in stats["lookups"], albums the response cache has aren't.
+        stats = {} if stats is None else stats
+        stats.setdefault("lookups", 0)
+        task.check()
+        ids = [album_id for album_id, _ in page]
+        details = self.sp.lookup_cached("album", ids) if self._cache_aware() else {}
+        missing = [album_id for album_id in ids if album_id not in details]
+        if missing:
+            try:
+                stats["lookups"] += 1
+                details.update(zip(missing, self.sp.albums(missing)["albums"]))
+            except Exception:
+                # The whole batch got rejected (e.g. one malformed ID), so look the albums up one by one
+                for album_id in missing:
+                    task.check()
+                    stats["lookups"] += 1
+                    try:
+                        details[album_id] = self.sp.album(album_id)
+                    except Exception:
+                        details[album_id] = None
+        return [album_row(album_id, album_name, details.get(album_id)) for album_id, album_name in page]
+
+    # ------------------------------
+    # Tracks
+    # ------------------------------
+    def fetch_album_tracks(self, album_id, keywords=None, task=NULL_TASK):
+        # Returns [{"id", "name", "popularity"}] for the album, skipping tracks matching keywords
+        # (a KeywordFilter or a keyword list; None keeps every track)
+        keywords = _as_filter(keywords)
+        if self.async_enabled():
+            return self._fetch_album_tracks_async(album_id, keywords, task)
+        task.check()
+        album_tracks = [t for t in self.sp.album_tracks(album_id, limit=50)['items']
+                        if not keywords.matches(t.get("name", ""))]
+        return track_rows(album_tracks, self.lookup_tracks([t["id"] for t in album_tracks], task))
+
+    def lookup_tracks(self, track_ids, task=NULL_TASK):
+        # Full track objects aligned with track_ids (None for the ones that couldn't be loaded),
+        # TRACK_BATCH_SIZE per request
+        full_tracks = []
+        for start in range(0, len(track_ids), TRACK_BATCH_SIZE):
+            batch = track_ids[start:start + TRACK_BATCH_SIZE]
+            task.check()
+            task.progress(start, len(track_ids))
+            try:
+                full_tracks.extend(self.sp.tracks(batch)["tracks"])
+            except Exception:
+                # The whole batch got rejected (e.g. one malformed ID), so look the tracks up one by one
+                for track_id in batch:
+                    task.check()
+                    try:
+                        full_tracks.append(self.sp.track(track_id))
+                    except Exception:
+                        full_tracks.append(None)
+        return full_tracks
+
+    def _fetch_album_tracks_async(self, album_id, keywords, task):
+        # Tracklist plus one multi-ID lookup per 50 tracks instead of one request per track
+        async def work(client):
+            task.check()
+            return await self._album_tracks_async(client, album_id, keywords)
+
+        return self._run_async(work)
+
+    async def _album_tracks_async(self, client, album_id, keywords):
+        album_tracks = (await client.album_tracks(album_id, limit=50))["items"]
+        album_tracks = [t for t in album_tracks if not keywords.matches(t.get("name", ""))]
+        full_tracks = await client.tracks([t["id"] for t in album_tracks])
+        if self._cache_aware():
+            self.sp.remember("track", full_tracks)
+        return track_rows(album_tracks, full_tracks)
+
+    def iter_albums_tracks(self, albums, keywords=None, task=NULL_TASK):
+        # Tracklists of many albums, fetched concurrently (up to `concurrency` albums at a time).
+        # Yields (album, tracks, error) in the order of albums, each one as soon as it and all
+        # albums before it are done; a failed album comes with [] and the exception.
+        keywords = _as_filter(keywords)
+        if self.async_enabled():
+            yield from self._iter_albums_tracks_async(albums, keywords, task)
+            return
+        quiet = QuietTask(task)
+
+        def fetch(album):
+            try:
+                return album, self.fetch_album_tracks(album[0], keywords, quiet), None
+            except Exception as e:
+                return album, [], e
+
+        pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="album-tracks")
+        try:
+            futures = [pool.submit(fetch, album) for album in albums]
+            for future in futures:
+                result = future.result()
+                # A cancelled task makes the workers fail, those results must not count as errors
+                task.check()
+                yield result
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _iter_albums_tracks_async(self, albums, keywords, task):
+        async def fetch(client, album):
+            try:
+                return album, await self._album_tracks_async(client, album[0], keywords), None
+            except Exception as e:
+                return album, [], e
+
+        async def work(client, emit):
+            futures = [asyncio.ensure_future(fetch(client, album)) for album in albums]
+            try:
+                for future in futures:
+                    emit(await future)
+            finally:
+                for future in futures:
+                    future.cancel()
+
+        for result in async_client.iter_bulk(self.token_provider, work, **self._async_options()):
+            task.check()
+            yield result
+
+    def artist_genres(self, artist_id):
+        try:
+            genres = self.sp.artist(artist_id).get("genres", [])
+            return ", ".join(sorted(set(genres))) if genres else "N/A"
+        except Exception:
+            return "N/A"
+
+    # ------------------------------
+    # Exports
+    # ------------------------------
+    def collect_popularity_export(self, artist_id, albums, settings, task=NULL_TASK):
+        # Returns {"genres": str, "albums": [(album, top_tracks, error)]} for the albums picked by settings.
+        # top_tracks are (name, popularity, id) tuples, already sorted and limited.
+        top_albums = sort_albums(albums, settings)
+        task.progress(0, len(top_albums), "Exporting popularity...")
+        export = {"genres": self.artist_genres(artist_id), "albums": []}
+        for album, tracks, error in self.iter_albums_tracks(top_albums, KeywordFilter.from_settings(settings), task):
+            export["albums"].append((album, export_tracks(tracks, settings), error))
+            task.progress(len(export["albums"]), len(top_albums), f"Exporting popularity... {album[1]}")
+        return export
+
+    def collect_raw_details(self, artist_id, album_ids, track_ids, task=NULL_TASK):
+        # What the Raw Data window can't show from the data the app holds, for the blocks being rendered:
+        # the artist (artist_id is None when it's known already), release date and label of the albums,
+        # durations and audio features of the tracks. Errors are kept per item so they can be shown in red.
+        details = {"artist": None, "artist_error": None, "albums": {}, "tracks": {}, "features": {}}
+        task.progress(0, text="Loading raw data...")
+        if artist_id:
+            try:
+                details["artist"] = self.sp.artist(artist_id)
+            except Exception as e:
+                details["artist_error"] = e
+        details["albums"] = dict(zip(album_ids, self.lookup_albums(album_ids, task)))
+        if track_ids:
+            task.check()
+            details["tracks"] = dict(zip(track_ids, self.lookup_tracks(track_ids, task)))
+            for start in range(0, len(track_ids), FEATURES_BATCH_SIZE):
+                batch = track_ids[start:start + FEATURES_BATCH_SIZE]
+                task.check()
+                try:
+                    details["features"].update((t, (f, None)) for t, f in zip(batch, self.sp.audio_features(batch)))
+                except Exception as e:
+                    # audio-features isn't available to every app, no point asking again for the rest
+                    details["features"].update((t, (None, e)) for t in track_ids[start:])
+                    break
+        return details
+
+    def lookup_albums(self, album_ids, task=NULL_TASK):
+        # (full album object, error) for every ID, ALBUM_BATCH_SIZE per request
+        results = []
+        for start in range(0, len(album_ids), ALBUM_BATCH_SIZE):
+            batch = album_ids[start:start + ALBUM_BATCH_SIZE]
+            task.check()
+            task.progress(start, len(album_ids))
+            try:
+                albums = self.sp.albums(batch)["albums"]
+                results.extend((album, None if album else LookupError("album not found")) for album in albums)
+            except Exception:
+                # The whole batch got rejected, so look the albums up one by one to find the bad one
+                for album_id in batch:
+                    task.check()
+                    try:
+                        results.append((self.sp.album(album_id), None))
+                    except Exception as e:
+                        results.append((None, e))
+        return results
+
+    def analyze_artist(self, query, settings, task=NULL_TASK):
+        # Full headless analysis of one artist: discography filtered by settings plus the export selection.
+        # Returns a JSON-serializable record.
+        artist = self.resolve_artist(query)
+        if not artist:
+            raise LookupError(f"No artist found for '{query}'")
+        album_types = ",".join(settings.get("types", ["album"]))
+        keywords = KeywordFilter.from_settings(settings)
+        variants = VariantGroups() if settings.get("collapse_variants", True) else None
+        albums, page_calls, lookup_calls = self.fetch_discography(artist["id"], album_types, keywords, task,
+                                                                  variants, settings.get("market") or None)
+        export = self.collect_popularity_export(artist["id"], albums, settings, task)
+        return {
+            "input": query,
+            "artist": {
+                "id": artist["id"],
+                "name": artist["name"],
+                "genres": artist.get("genres", []),
+                "followers": artist.get("followers", {}).get("total", 0),
+                "popularity": artist.get("popularity", 0),
+            },
+            "releases": len(albums),
+            "variants_collapsed": variants.collapsed if variants else 0,
+            "albums": [{
+                "id": alb_id,
+                "name": alb_name,
+                "year": alb_year,
+                "popularity": alb_pop,
+                "error": str(error) if error else None,
+                "tracks": [{"id": t_id, "name": t_name, "popularity": t_pop} for t_name, t_pop, t_id in tracks],
+            } for (alb_id, alb_name, alb_pop, alb_year), tracks, error in export["albums"]],
+        }
+
+
+def _filter_page(items, keyword_filter, groups, variants=None):
+    # (id, name) pairs of a discography page, without the releases matching the filter and, with
+    # variants (a VariantGroups), without the ones that duplicate an earlier release.
+    # The album group of every release that passed the filter is recorded in groups.
+    page = []
+    for album in items:
+        album_name = album.get("name", "")
+        if keyword_filter.matches(album_name):
+            continue
+        groups[album["id"]] = album.get("album_group") or album.get("album_type") or "album"
+        if variants is not None and not variants.keep(album):
+            continue
+        page.append((album["id"], album_name))
+    return page
+
+
+def track_rows(album_tracks, full_tracks):
+    # [{"id", "name", "popularity"}] from simplified tracklist entries and the matching full track objects
+    return [{
+        "id": track["id"],
+        "name": track.get("name", ""),
+        "popularity": (full or {}).get("popularity", 0)
+    } for track, full in zip(album_tracks, full_tracks)]
+
+
+def album_row(album_id, album_name, details):
+    # (id, name, popularity, year) from a full album object. Unknown IDs come back as null
+    # inside an otherwise successful batch, those get pop=0 / "????".
+    try:
+        pop = details.get("popularity", 0)
+        release_date = details.get("release_date", "unknown")
+        release_year = release_date.split("-")[0]
+    except Exception:
+        pop = 0
+        release_year = "????"
+    return (album_id, album_name, pop, release_year)
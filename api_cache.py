@@ -0,0 +1,297 @@
+import json
+import sqlite3
+import threading
+import time
+import zlib
+
+# Persistent on-disk cache for Spotify API responses.
+# Responses are stored in a small SQLite file next to the credentials file, so they survive restarts.
+# Every endpoint has its own TTL and the file is kept under a size cap by evicting least recently used entries.
+
+CACHE_FILE = ".spotify_cache.sqlite"
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+ACCESS_FLUSH = 256  # cache hits whose access times are written to the file in one go
+SIZE_CHECK_PUTS = 200  # writes after which the size of the file is read back (other processes write too)
+
+HOUR = 60 * 60
+DAY = 24 * HOUR
+
+# Anything that carries a popularity value changes often, catalog metadata (tracklists,
+# audio features) practically never does. Discographies only change when something is released.
+ENDPOINT_TTL = {
+    "artist": 6 * HOUR,
+    "album": 6 * HOUR,
+    "track": 6 * HOUR,
+    "search": DAY,
+    "artist_albums": DAY,
+    "album_tracks": 30 * DAY,
+    "audio_features": 30 * DAY,
+}
+
+
+class ResponseCache:
+    def __init__(self, path=CACHE_FILE, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # Several processes (batch_cli.py --processes) may share the file, so wait for locks instead of failing
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        # WAL: readers don't block the writer and a commit doesn't need an fsync of the whole journal.
+        # Some file systems (network shares) can't do it, the default journal is fine there too.
+        try:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        except sqlite3.Error:
+            pass
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " value BLOB NOT NULL,"
+            " expires REAL NOT NULL,"
+            " accessed REAL NOT NULL,"
+            " size INTEGER NOT NULL)"
+        )
+        # Covers the eviction order and SUM(size), so neither has to read the (mostly overflowing) values
+        self._conn.execute("DROP INDEX IF EXISTS responses_accessed")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses (accessed, size, key)")
+        self._conn.commit()
+        self._total_bytes = self._stored_bytes()
+        self._puts = 0
+        # key -> last hit. Written together with the next put (or every ACCESS_FLUSH hits) instead of a
+        # commit per hit; the ones still pending when the app exits only make the LRU order a bit older.
+        self._accessed = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _stored_bytes(self):
+        return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def _flush_accessed(self):
+        if self._accessed:
+            self._conn.executemany("UPDATE responses SET accessed = ? WHERE key = ?",
+                                   [(accessed, key) for key, accessed in self._accessed.items()])
+            self._accessed = {}
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or row[1] < now:
+                self.misses += 1
+                return None
+            self._accessed[key] = now
+            if len(self._accessed) >= ACCESS_FLUSH:
+                self._flush_accessed()
+                self._conn.commit()
+            self.hits += 1
+        return json.loads(zlib.decompress(row[0]))
+
+    def expiries(self, keys):
+        # {key: expiry time} for the keys that are stored and still fresh, without reading the values
+        now = time.time()
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, expires FROM responses WHERE key IN ({','.join('?' * len(chunk))})", chunk)
+                found.update((key, expires) for key, expires in rows if expires >= now)
+        return found
+
+    def put(self, key, value, ttl):
+        blob = zlib.compress(json.dumps(value, separators=(",", ":")).encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            self._flush_accessed()
+            old = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            if old:
+                self._total_bytes -= old[0]
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, expires, accessed, size) VALUES (?, ?, ?, ?, ?)",
+                (key, blob, now + ttl, now, len(blob))
+            )
+            self._total_bytes += len(blob)
+            self._puts += 1
+            # The running total only sees this process's writes: read the real one back now and then,
+            # and before deleting anything
+            if self._puts % SIZE_CHECK_PUTS == 0 or self._total_bytes > self.max_bytes:
+                self._total_bytes = self._stored_bytes()
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        # Expired entries go first, then the least recently used ones until we're at 90% of the cap
+        self._conn.execute("DELETE FROM responses WHERE expires < ?", (time.time(),))
+        self._total_bytes = self._stored_bytes()
+        target = self.max_bytes * 0.9
+        rows = self._conn.execute("SELECT key, size FROM responses ORDER BY accessed").fetchall()
+        victims = []
+        for key, size in rows:
+            if self._total_bytes <= target:
+                break
+            victims.append((key,))
+            self._total_bytes -= size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", victims)
+
+    def clear(self):
+        with self._lock:
+            self._accessed = {}
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+            self._total_bytes = 0
+        try:
+            self._conn.execute("VACUUM")
+        except sqlite3.Error:
+            pass
+
+    def flush(self):
+        # Writes the pending access times, e.g. before the app exits
+        with self._lock:
+            self._flush_accessed()
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            self._total_bytes = self._stored_bytes()
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": entries,
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+class CachedSpotify:
+    # Drop-in wrapper around spotipy.Spotify for the endpoints the app uses.
+    # Multi-ID endpoints are cached per ID, so sp.albums([...]) also warms sp.album(id) and vice versa.
+    # Everything else is passed straight through to the wrapped client.
+
+    def __init__(self, sp, cache):
+        self._sp = sp
+        self.cache = cache
+
+    def __getattr__(self, name):
+        return getattr(self._sp, name)
+
+    def _get(self, cache_key):
+        # A broken or locked cache must never break the actual request
+        try:
+            return self.cache.get(cache_key)
+        except sqlite3.Error:
+            return None
+
+    def _put(self, cache_key, value, endpoint):
+        try:
+            self.cache.put(cache_key, value, ENDPOINT_TTL[endpoint])
+        except sqlite3.Error as e:
+            print(f"API cache write failed: {e}")
+
+    def _cached(self, endpoint, key, fetch):
+        cache_key = f"{endpoint}:{key}"
+        value = self._get(cache_key)
+        if value is None:
+            value = fetch()
+            if value is not None:
+                self._put(cache_key, value, endpoint)
+        return value
+
+    def _cached_many(self, endpoint, ids, batch_size, fetch_batch):
+        # Returns the objects for ids in order, only asking Spotify for the ones that aren't cached yet
+        results = {}
+        missing = []
+        for item_id in ids:
+            value = self._get(f"{endpoint}:{item_id}")
+            if value is None:
+                missing.append(item_id)
+            else:
+                results[item_id] = value
+        for start in range(0, len(missing), batch_size):
+            batch = missing[start:start + batch_size]
+            for item_id, value in zip(batch, fetch_batch(batch)):
+                results[item_id] = value
+                if value is not None:
+                    self._put(f"{endpoint}:{item_id}", value, endpoint)
+        return [results.get(item_id) for item_id in ids]
+
+    def lookup_cached(self, endpoint, ids):
+        # Returns {id: object} for the IDs that are cached and still fresh
+        results = {}
+        for item_id in ids:
+            value = self._get(f"{endpoint}:{item_id}")
+            if value is not None:
+                results[item_id] = value
+        return results
+
+    def fetched_at(self, endpoint, ids):
+        # {id: time the cached object was fetched from Spotify} for the IDs that are cached and still fresh.
+        # A popularity served from the cache is as old as this, not as old as the call that returned it.
+        try:
+            expiries = self.cache.expiries([f"{endpoint}:{item_id}" for item_id in ids])
+        except sqlite3.Error:
+            return {}
+        ttl = ENDPOINT_TTL[endpoint]
+        return {key.split(":", 1)[1]: expires - ttl for key, expires in expiries.items()}
+
+    def remember(self, endpoint, objects):
+        # Stores objects fetched outside this wrapper (e.g. by the async transport) under their IDs
+        for obj in objects:
+            if obj:
+                self._put(f"{endpoint}:{obj['id']}", obj, endpoint)
+
+    @staticmethod
+    def _args_key(*args, **kwargs):
+        return json.dumps([args, kwargs], sort_keys=True, separators=(",", ":"))
+
+    def artist(self, artist_id):
+        return self._cached("artist", artist_id, lambda: self._sp.artist(artist_id))
+
+    def album(self, album_id, market=None):
+        if market:
+            return self._sp.album(album_id, market=market)
+        return self._cached("album", album_id, lambda: self._sp.album(album_id))
+
+    def track(self, track_id, market=None):
+        if market:
+            return self._sp.track(track_id, market=market)
+        return self._cached("track", track_id, lambda: self._sp.track(track_id))
+
+    def albums(self, albums, market=None):
+        if market:
+            return self._sp.albums(albums, market=market)
+        items = self._cached_many("album", list(albums), 20, lambda batch: self._sp.albums(batch)["albums"])
+        return {"albums": items}
+
+    def tracks(self, tracks, market=None):
+        if market:
+            return self._sp.tracks(tracks, market=market)
+        items = self._cached_many("track", list(tracks), 50, lambda batch: self._sp.tracks(batch)["tracks"])
+        return {"tracks": items}
+
+    def audio_features(self, tracks=[]):
+        if isinstance(tracks, str):
+            tracks = [tracks]
+        return self._cached_many("audio_features", list(tracks), 100, lambda batch: self._sp.audio_features(batch))
+
+    def artist_albums(self, artist_id, *args, **kwargs):
+        key = self._args_key(artist_id, *args, **kwargs)
+        return self._cached("artist_albums", key, lambda: self._sp.artist_albums(artist_id, *args, **kwargs))
+
+    def album_tracks(self, album_id, *args, **kwargs):
+        key = self._args_key(album_id, *args, **kwargs)
+        return self._cached("album_tracks", key, lambda: self._sp.album_tracks(album_id, *args, **kwargs))
+
+    def search(self, q, *args, **kwargs):
+        key = self._args_key(q, *args, **kwargs)
+        return self._cached("search", key, lambda: self._sp.search(q, *args, **kwargs))
+
+
+def open_cache(path=CACHE_FILE, max_bytes=DEFAULT_MAX_BYTES):
+    # Returns None instead of failing when the cache file can't be used (read-only folder, corrupted file...)
+    try:
+        return ResponseCache(path, max_bytes)
+    except (sqlite3.Error, OSError) as e:
+        print(f"API cache disabled: {e}")
+        return None
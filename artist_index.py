@@ -0,0 +1,229 @@
+import bisect
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from analyzer_core import normalize_name
+
+# Local index of every artist the app has seen (search results and selected artists) for typeahead.
+# Artists are kept in a small SQLite file and loaded into an in-memory trie at startup. Every word start
+# of a normalized name is a key ("the beatles" is found by "the be" and by "beat"), and every trie node
+# remembers its TOP_PER_NODE most followed artists, so a prefix lookup is a walk down the query's
+# characters, no matter how many artists share the prefix.
+# ArtistSearch puts the index in front of Spotify's search: the index answers first, search pages only
+# fill in what it doesn't have, and merged answers are cached per query so paging and retyping are free.
+
+INDEX_FILE = ".spotify_artists.sqlite"
+TOP_PER_NODE = 20
+PAGE_SIZE = 5
+MAX_QUERIES = 256  # merged answers kept in memory
+
+
+def artist_entry(artist):
+    # The indexed fields of an artist object from the search or artist endpoint
+    followers = artist.get("followers")
+    return {
+        "id": artist["id"],
+        "name": artist.get("name", ""),
+        "followers": (followers.get("total") if isinstance(followers, dict) else followers) or 0,
+        "popularity": artist.get("popularity") or 0,
+    }
+
+
+class _Node:
+    __slots__ = ("children", "here", "top")
+
+    def __init__(self):
+        self.children = {}
+        self.here = set()  # IDs of the artists whose key ends at this node
+        self.top = []  # [(-followers, artist ID)] of the whole subtree, sorted, at most TOP_PER_NODE
+
+
+class ArtistIndex:
+    def __init__(self, path=INDEX_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._artists = {}  # artist ID -> entry
+        self._keys = {}  # artist ID -> indexed name, to take it out again when the name changes
+        self._root = _Node()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS artists ("
+            " id TEXT PRIMARY KEY,"
+            " name TEXT NOT NULL,"
+            " followers INTEGER NOT NULL,"
+            " popularity INTEGER NOT NULL,"
+            " seen REAL NOT NULL)")
+        self._conn.commit()
+        for artist_id, name, followers, popularity in self._conn.execute(
+                "SELECT id, name, followers, popularity FROM artists"):
+            self._insert({"id": artist_id, "name": name, "followers": followers, "popularity": popularity})
+
+    def __len__(self):
+        return len(self._artists)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def _word_starts(key):
+        yield key
+        for i, char in enumerate(key):
+            if char == " ":
+                yield key[i + 1:]
+
+    def _insert(self, entry):
+        key = normalize_name(entry["name"])
+        old_key = self._keys.get(entry["id"])
+        if old_key is not None:
+            self._remove(entry["id"], old_key)
+        self._artists[entry["id"]] = entry
+        self._keys[entry["id"]] = key
+        rank = (-entry["followers"], entry["id"])
+        for suffix in self._word_starts(key):
+            node = self._root
+            for char in suffix:
+                node = node.children.setdefault(char, _Node())
+                if rank not in node.top and (len(node.top) < TOP_PER_NODE or rank < node.top[-1]):
+                    bisect.insort(node.top, rank)
+                    del node.top[TOP_PER_NODE:]
+            node.here.add(entry["id"])
+
+    def _remove(self, artist_id, key):
+        # Renamed artist or new follower count: take it out of the nodes of its old key. The lists it was
+        # in are rebuilt bottom-up from the children, so whoever it pushed out comes back.
+        for suffix in self._word_starts(key):
+            path = [self._root]
+            for char in suffix:
+                path.append(path[-1].children[char])
+            path[-1].here.discard(artist_id)
+            for node in reversed(path[1:]):
+                if all(rank[1] != artist_id for rank in node.top):
+                    break
+                ranks = {(-self._artists[i]["followers"], i) for i in node.here}
+                for child in node.children.values():
+                    ranks.update(child.top)
+                node.top = sorted(ranks)[:TOP_PER_NODE]
+
+    def add(self, artists):
+        # artists are artist objects from the API; returns how many were new
+        entries = [artist_entry(a) for a in artists if a and a.get("id")]
+        if not entries:
+            return 0
+        now = time.time()
+        with self._lock:
+            new = sum(1 for e in entries if e["id"] not in self._artists)
+            for entry in entries:
+                known = self._artists.get(entry["id"])
+                if known != entry:
+                    self._insert(entry)
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO artists (id, name, followers, popularity, seen) VALUES (?, ?, ?, ?, ?)",
+                    [(e["id"], e["name"], e["followers"], e["popularity"], now) for e in entries])
+        return new
+
+    def _find(self, key):
+        node = self._root
+        for char in key:
+            node = node.children.get(char)
+            if node is None:
+                return None
+        return node
+
+    def search(self, query, limit=PAGE_SIZE):
+        # Entries whose name has a word starting with the query, most followed first
+        key = normalize_name(query)
+        if not key:
+            return []
+        with self._lock:
+            node = self._find(key)
+            if node is None:
+                return []
+            if limit <= TOP_PER_NODE or len(node.top) < TOP_PER_NODE:
+                ranks = node.top[:limit]
+            else:
+                # Deeper pages than the node remembers: collect the whole subtree
+                ids = set()
+                stack = [node]
+                while stack:
+                    current = stack.pop()
+                    ids.update(current.here)
+                    stack.extend(current.children.values())
+                ranks = sorted((-self._artists[i]["followers"], i) for i in ids)[:limit]
+            return [dict(self._artists[artist_id]) for _, artist_id in ranks]
+
+
+def open_index(path=INDEX_FILE):
+    # Returns None instead of failing when the index file can't be used
+    try:
+        return ArtistIndex(path)
+    except sqlite3.Error as e:
+        print(f"Artist index disabled: {e}")
+        return None
+
+
+class ArtistSearch:
+    # Merged answers per normalized query: {"results": [entries], "offset": next search offset,
+    # "total": total search matches or None before the first page}. Used from the Tk thread (local
+    # lookups) and from workers (search pages).
+    def __init__(self, index=None, page_size=PAGE_SIZE, max_queries=MAX_QUERIES):
+        self.index = index
+        self.page_size = page_size
+        self.max_queries = max_queries
+        self._lock = threading.Lock()
+        self._answers = OrderedDict()
+
+    def _answer(self, key):
+        answer = self._answers.get(key)
+        if answer is None:
+            answer = self._answers[key] = {"results": [], "offset": 0, "total": None}
+            while len(self._answers) > self.max_queries:
+                self._answers.popitem(last=False)
+        self._answers.move_to_end(key)
+        return answer
+
+    def matches(self, query, count):
+        # The first `count` results: indexed artists first, then what search pages brought in
+        key = normalize_name(query)
+        if not key:
+            return []
+        local = self.index.search(key, count) if self.index is not None else []
+        with self._lock:
+            answer = self._answer(key)
+            seen = {entry["id"] for entry in local}
+            results = local + [entry for entry in answer["results"] if entry["id"] not in seen]
+        return results[:count]
+
+    def exhausted(self, query):
+        # True once every search page for the query was loaded
+        with self._lock:
+            answer = self._answer(normalize_name(query))
+            return answer["total"] is not None and answer["offset"] >= answer["total"]
+
+    def needs_search(self, query, count):
+        return len(self.matches(query, count)) < count and not self.exhausted(query)
+
+    def has_more(self, query, count):
+        return len(self.matches(query, count + 1)) > count or not self.exhausted(query)
+
+    def fetch_page(self, sp, query, task=None):
+        # Loads the next search page for the query (worker thread); found artists go into the index
+        key = normalize_name(query)
+        with self._lock:
+            offset = self._answer(key)["offset"]
+        if task:
+            task.progress(0, text=f"Searching for '{query}'...")
+        results = sp.search(q=query, type="artist", limit=self.page_size, offset=offset)["artists"]
+        items = [item for item in results["items"] if item]
+        if self.index is not None:
+            self.index.add(items)
+        with self._lock:
+            answer = self._answer(key)
+            known = {entry["id"] for entry in answer["results"]}
+            answer["results"].extend(artist_entry(item) for item in items if item["id"] not in known)
+            answer["offset"] = offset + self.page_size
+            answer["total"] = results.get("total", 0) if items else offset
+        return items
@@ -0,0 +1,264 @@
+import asyncio
+import importlib.util
+import json
+import queue
+import threading
+import time
+
+from credential_pool import retry_after
+
+# aiohttp is optional (without it every request goes through the synchronous spotipy client)
+# and slow to import, so it's only imported when the first AsyncSpotify is created
+aiohttp = None
+
+# Optional asyncio transport for bulk work (discography pages, album and track hydration).
+# A single aiohttp session keeps a pool of keep-alive connections and an AIMD limiter decides how many
+# requests run at once: a 429 halves the window and pauses new requests for Retry-After seconds,
+# every full window of successful requests opens it up by one again.
+
+API_PREFIX = "https://api.spotify.com/v1/"
+
+
+def available():
+    return importlib.util.find_spec("aiohttp") is not None
+
+
+def _import_aiohttp():
+    global aiohttp
+    if aiohttp is None:
+        import aiohttp as module
+        aiohttp = module
+    return aiohttp
+
+
+class AsyncSpotifyError(Exception):
+    def __init__(self, http_status, msg, headers=None):
+        super().__init__(f"HTTP {http_status}: {msg}")
+        self.http_status = http_status
+        self.msg = msg
+        self.headers = headers or {}
+
+
+class AdaptiveLimiter:
+    def __init__(self, initial=8, minimum=1, maximum=32):
+        self.limit = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.throttled = 0
+        self._in_flight = 0
+        self._successes = 0
+        self._paused_until = 0.0
+        self._cond = asyncio.Condition()
+
+    async def acquire(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self._in_flight < self.limit)
+            self._in_flight += 1
+        # Honour a Retry-After pause that started while this request was queued
+        delay = self._paused_until - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def release(self):
+        async with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    def on_success(self):
+        # Additive increase: one more slot after a full window of successful requests
+        self._successes += 1
+        if self._successes >= self.limit:
+            self._successes = 0
+            self.limit = min(self.maximum, self.limit + 1)
+
+    def on_throttled(self, retry_after):
+        # Multiplicative decrease, once per Retry-After window: the other requests of the burst that
+        # get a 429 before the pause is over were sent with the old window and say nothing new
+        self.throttled += 1
+        self._successes = 0
+        now = time.monotonic()
+        if now >= self._paused_until:
+            self.limit = max(self.minimum, self.limit // 2)
+        self._paused_until = max(self._paused_until, now + retry_after)
+
+
+class AsyncSpotify:
+    # token_provider is a plain (blocking) callable returning an access token, for example
+    # lambda: auth_manager.get_access_token(as_dict=False). It runs in a thread so it never blocks the loop.
+    # Every response is recorded in stats (a diagnostics.ApiStats) when one is given.
+    # With a pool (a credential_pool.CredentialPool) every request takes a key and uses that key's token
+    # instead; a 429 cools that key down and the request is sent again on another one, the limiter
+    # backs off like without a pool.
+
+    def __init__(self, token_provider, prefix=API_PREFIX, concurrency=8, max_concurrency=32, max_retries=5,
+                 timeout=20, stats=None, pool=None):
+        if not available():
+            raise RuntimeError("aiohttp is not installed")
+        _import_aiohttp()
+        self.token_provider = token_provider
+        self.prefix = prefix
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.concurrency = concurrency
+        self.stats = stats
+        self.pool = pool
+        self.limiter = None
+        self._session = None
+
+    async def __aenter__(self):
+        self.limiter = AdaptiveLimiter(self.concurrency, maximum=self.max_concurrency)
+        connector = aiohttp.TCPConnector(limit=self.max_concurrency, keepalive_timeout=30)
+        self._session = aiohttp.ClientSession(connector=connector,
+                                              timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._session.close()
+
+    async def _token(self):
+        return await asyncio.to_thread(self.token_provider)
+
+    async def _key(self):
+        while True:
+            key, wait = self.pool.try_acquire()
+            if key is not None:
+                return key
+            await asyncio.sleep(wait)
+
+    async def get(self, path, **params):
+        params = {k: str(v) for k, v in params.items() if v is not None}
+        for attempt in range(self.max_retries + 1):
+            await self.limiter.acquire()
+            key = None
+            status = 599
+            started = time.perf_counter()
+            try:
+                if self.pool:
+                    key = await self._key()
+                    token = await asyncio.to_thread(key.session.get_access_token, as_dict=False)
+                else:
+                    token = await self._token()
+                headers = {"Authorization": f"Bearer {token}"}
+                started = time.perf_counter()
+                async with self._session.get(self.prefix + path, params=params, headers=headers) as resp:
+                    status = resp.status
+                    body = await resp.read()
+                    if self.stats:
+                        self.stats.record(_endpoint(path), time.perf_counter() - started, len(body), resp.status)
+                    if resp.status == 429:
+                        seconds = retry_after(resp)
+                        if key is not None:
+                            self.pool.cool_down(key, seconds)
+                        self.limiter.on_throttled(seconds)
+                        continue
+                    if resp.status >= 500 and attempt < self.max_retries:
+                        await asyncio.sleep(0.5 * 2 ** attempt)
+                        continue
+                    if resp.status >= 400:
+                        raise AsyncSpotifyError(resp.status, body.decode("utf-8", "replace"), dict(resp.headers))
+                    data = json.loads(body)
+                    self.limiter.on_success()
+                    return data
+            finally:
+                if key is not None:
+                    self.pool.release(key, time.perf_counter() - started, status)
+                await self.limiter.release()
+        raise AsyncSpotifyError(429, f"still rate limited after {self.max_retries} retries")
+
+    async def artist(self, artist_id):
+        return await self.get(f"artists/{artist_id}")
+
+    async def album_tracks(self, album_id, limit=50, offset=0):
+        return await self.get(f"albums/{album_id}/tracks", limit=limit, offset=offset)
+
+    async def artist_albums(self, artist_id, album_type=None, limit=50, offset=0, market=None):
+        return await self.get(f"artists/{artist_id}/albums", include_groups=album_type, limit=limit, offset=offset,
+                              market=market)
+
+    async def _single(self, path, item_id):
+        try:
+            return await self.get(f"{path}/{item_id}")
+        except AsyncSpotifyError as e:
+            if e.http_status == 429 or e.http_status >= 500:
+                raise
+            return None
+
+    async def _many(self, path, key, ids, batch_size, on_batch=None):
+        async def batch(chunk):
+            try:
+                result = (await self.get(path, ids=",".join(chunk)))[key]
+            except AsyncSpotifyError as e:
+                if e.http_status != 400:
+                    raise
+                # One malformed ID rejects the whole batch, so resolve the IDs one by one instead
+                result = await asyncio.gather(*(self._single(path, item_id) for item_id in chunk))
+            if on_batch:
+                on_batch(chunk, result)
+            return result
+
+        chunks = [ids[i:i + batch_size] for i in range(0, len(ids), batch_size)]
+        results = await asyncio.gather(*(batch(chunk) for chunk in chunks))
+        return [item for chunk in results for item in chunk]
+
+    async def albums(self, album_ids, on_batch=None):
+        # Full album objects aligned with album_ids (None for unknown IDs), 20 per request
+        return await self._many("albums", "albums", list(album_ids), 20, on_batch)
+
+    async def tracks(self, track_ids, on_batch=None):
+        # Full track objects aligned with track_ids, 50 per request
+        return await self._many("tracks", "tracks", list(track_ids), 50, on_batch)
+
+
+def _endpoint(path):
+    # Imported here, diagnostics isn't needed unless stats are collected
+    from diagnostics import endpoint_for_path
+    return endpoint_for_path(path)
+
+
+def run_bulk(token_provider, work, **options):
+    # Runs `await work(client)` on a private event loop and returns its result.
+    # Meant to be called from a worker thread, e.g. one of background.TaskRunner's.
+    async def main():
+        async with AsyncSpotify(token_provider, **options) as client:
+            return await work(client)
+
+    return asyncio.run(main())
+
+
+class _Failure:
+    def __init__(self, error):
+        self.error = error
+
+
+def iter_bulk(token_provider, work, **options):
+    # Like run_bulk, but `await work(client, emit)` can hand out partial results while it runs.
+    # They are yielded here, on the calling thread, as soon as they arrive (the event loop runs on a
+    # helper thread). Closing the generator early stops the job at its next emit().
+    results = queue.Queue()
+    stopped = threading.Event()
+    done = object()
+
+    def emit(item):
+        if stopped.is_set():
+            raise asyncio.CancelledError()
+        results.put(item)
+
+    def runner():
+        try:
+            run_bulk(token_provider, lambda client: work(client, emit), **options)
+            results.put(done)
+        except BaseException as e:
+            results.put(_Failure(e))
+
+    threading.Thread(target=runner, daemon=True, name="async-bulk").start()
+    try:
+        while True:
+            item = results.get()
+            if item is done:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        stopped.set()
@@ -1,13 +1,31 @@
 import os
 import json
-import tkinter as tk
-from tkinter import messagebox
 import sys
 import ctypes
+import threading
+import time
 
 CRED_FILE = ".spotify_credentials"
-def save_credentials(client_id, client_secret):
+# Headless runs (batch_cli.py on a server) can pass the keys through the environment instead of the file
+ENV_CLIENT_ID = "SPOTIPY_CLIENT_ID"
+ENV_CLIENT_SECRET = "SPOTIPY_CLIENT_SECRET"
+# More API applications to spread the load over (see credential_pool.py): "id:secret,id:secret"
+ENV_CLIENT_POOL = "SPOTIPY_CLIENT_POOL"
+
+# Access tokens are kept next to the credentials (one per client ID), so a new session (or another batch
+# worker) starts with the token an earlier one got instead of asking Spotify again
+TOKEN_FILE = ".spotify_token"
+TOKEN_URL = "https://accounts.spotify.com/api/token"
+REFRESH_MARGIN = 300  # seconds before expiry a token is replaced in the background
+MIN_VALIDITY = 30  # a token that expires sooner than this isn't handed out any more
+RETRY_DELAY = 10  # seconds between attempts when a background refresh fails
+def save_credentials(client_id, client_secret, pool=None):
+    # pool: more {"client_id", "client_secret"} pairs; None keeps the ones already in the file
+    if pool is None:
+        pool = (load_credentials() or {}).get("pool") if os.path.exists(CRED_FILE) else None
     creds = {"client_id": client_id, "client_secret": client_secret}
+    if pool:
+        creds["pool"] = pool
     with open(".spotify_credentials", "w") as f:
         json.dump(creds, f)
     try:
@@ -17,7 +35,14 @@ def save_credentials(client_id, client_secret):
         print(f"Failed to hide credentials file: {e}")
 
 def load_credentials():
+    # {"client_id", "client_secret"} plus "pool", a list of more such pairs, when there are any
     if not os.path.exists(CRED_FILE):
+        if os.environ.get(ENV_CLIENT_ID) and os.environ.get(ENV_CLIENT_SECRET):
+            creds = {"client_id": os.environ[ENV_CLIENT_ID], "client_secret": os.environ[ENV_CLIENT_SECRET]}
+            pool = [pair.split(":", 1) for pair in os.environ.get(ENV_CLIENT_POOL, "").split(",") if ":" in pair]
+            if pool:
+                creds["pool"] = [{"client_id": cid.strip(), "client_secret": secret.strip()} for cid, secret in pool]
+            return creds
         return None
     with open(CRED_FILE, "r") as f:
         return json.load(f)
@@ -25,8 +50,166 @@ def load_credentials():
 def delete_credentials():
     if os.path.exists(CRED_FILE):
         os.remove(CRED_FILE)
+    if os.path.exists(TOKEN_FILE):
+        os.remove(TOKEN_FILE)
+
+
+class _FileLock:
+    # Exclusive lock on path + ".lock" between processes (the threads of one process use TokenSession's lock)
+    def __init__(self, path):
+        self.path = path + ".lock"
+        self._file = None
+
+    def __enter__(self):
+        self._file = open(self.path, "a+")
+        if os.name == 'nt':
+            import msvcrt
+            while True:
+                try:
+                    # LK_LOCK itself only retries for about 10 seconds
+                    msvcrt.locking(self._file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+        else:
+            import fcntl
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            if os.name == 'nt':
+                import msvcrt
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        finally:
+            self._file.close()
+
+
+class TokenSession:
+    # Client credentials access token shared by every thread and process that uses the same token file.
+    # Drop-in for spotipy's SpotifyClientCredentials as the auth_manager of spotipy.Spotify.
+    # The token is persisted with its expiry; whoever needs a new one takes the file lock, re-reads the file
+    # (another process may have refreshed it meanwhile) and only then asks Spotify. A daemon thread replaces
+    # the token REFRESH_MARGIN seconds before it expires, so requests never wait for a token except for
+    # the very first one on a machine.
+    def __init__(self, client_id, client_secret, path=TOKEN_FILE, refresh_margin=REFRESH_MARGIN,
+                 token_url=TOKEN_URL):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.path = path
+        self.refresh_margin = refresh_margin
+        self.token_url = token_url
+        self.requested = 0  # tokens this process got from Spotify
+        self._token = None  # {"access_token", "token_type", "expires_at"}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._refresher = None
+
+    def get_access_token(self, as_dict=True, check_cache=True):
+        token = self._token
+        if token is None or token["expires_at"] - time.time() < MIN_VALIDITY:
+            with self._lock:
+                token = self._renew(self._token, MIN_VALIDITY)
+        self._start_refresher()
+        if not as_dict:
+            return token["access_token"]
+        return dict(token, expires_in=max(0, int(token["expires_at"] - time.time())))
+
+    def stop(self):
+        self._stopped.set()
+
+    def _renew(self, token, min_validity):
+        # Returns a token valid for at least min_validity seconds: ours, the one in the file or a new one.
+        # Callers hold self._lock.
+        if token is not None and token["expires_at"] - time.time() >= min_validity:
+            return token
+        with _FileLock(self.path):
+            token = self._read()
+            if token is None or token["expires_at"] - time.time() < min_validity:
+                token = self._request_token()
+                self.requested += 1
+                self._write(token)
+        self._token = token
+        return token
+
+    def _read(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # {client ID: token}, one file for every credential of a pool
+        stored = stored.get(self.client_id) if isinstance(stored, dict) else None
+        if not isinstance(stored, dict) or not stored.get("access_token"):
+            return None
+        return {"access_token": stored["access_token"], "token_type": stored.get("token_type", "Bearer"),
+                "expires_at": stored.get("expires_at", 0)}
+
+    def _write(self, token):
+        # Called under the file lock. Atomic replace, readers never see half a file.
+        # Tokens are secrets: owner-only permissions.
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            stored = {}
+        if not isinstance(stored, dict):
+            stored = {}
+        # Tokens of other credentials that have expired are dropped on the way
+        now = time.time()
+        stored = {cid: t for cid, t in stored.items() if isinstance(t, dict) and t.get("expires_at", 0) > now}
+        stored[self.client_id] = token
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(stored, f)
+        os.replace(tmp_path, self.path)
+
+    def _request_token(self):
+        # requests is imported here, like spotipy it's a noticeable part of the startup time
+        import requests
+        response = requests.post(self.token_url, data={"grant_type": "client_credentials"},
+                                 auth=(self.client_id, self.client_secret), timeout=10)
+        response.raise_for_status()
+        data = response.json()
+        return {"access_token": data["access_token"], "token_type": data.get("token_type", "Bearer"),
+                "expires_at": int(time.time()) + int(data.get("expires_in", 3600))}
+
+    def _start_refresher(self):
+        if self._refresher is None:
+            with self._lock:
+                if self._refresher is None:
+                    self._refresher = threading.Thread(target=self._refresh_loop, name="spotify-token-refresh",
+                                                       daemon=True)
+                    self._refresher.start()
+
+    def _refresh_loop(self):
+        refreshed = None
+        while not self._stopped.is_set():
+            token = self._token
+            wait = token["expires_at"] - self.refresh_margin - time.time() if token else 0
+            if wait <= 0 and token is not None and token is refreshed:
+                # A token that lives shorter than the margin is replaced halfway through instead
+                wait = max(RETRY_DELAY, (token["expires_at"] - time.time()) / 2)
+            if wait > 0 and self._stopped.wait(wait):
+                return
+            try:
+                with self._lock:
+                    # Valid for more than the margin means the token is fresh (maybe from another process)
+                    refreshed = self._renew(self._token, self.refresh_margin + 1)
+            except Exception as e:
+                print(f"Refreshing the Spotify access token failed: {e}")
+                if self._stopped.wait(RETRY_DELAY):
+                    return
 
 def prompt_for_credentials():
+    # tkinter is imported here so the rest of this module also works on machines without Tk
+    import tkinter as tk
+    from tkinter import messagebox
     cred_win = tk.Tk()
     if hasattr(sys, "_MEIPASS"):
         base_path = sys._MEIPASS
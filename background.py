@@ -0,0 +1,150 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Background execution for everything that talks to Spotify.
+# Work runs on a small thread pool and results are handed back to the Tk main loop, which drains
+# a queue with after() (Tk widgets must only be touched from the main thread).
+# Tasks are keyed: submitting a new task under a key that is still running cancels the old one
+# and drops whatever it still reports (latest wins).
+
+
+class TaskCancelled(Exception):
+    pass
+
+
+class Task:
+    def __init__(self, runner, key, on_done=None, on_error=None, on_progress=None, on_partial=None):
+        self._runner = runner
+        self._cancelled = threading.Event()
+        self.key = key
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_progress = on_progress
+        self.on_partial = on_partial
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def check(self):
+        # Workers call this between requests so a superseded task stops as early as possible
+        if self._cancelled.is_set():
+            raise TaskCancelled()
+
+    def progress(self, done, total=None, text=None):
+        self.check()
+        self._runner._post(self, "progress", (done, total, text))
+
+    def emit(self, item):
+        # Hands a partial result to on_partial before the task is done
+        self.check()
+        self._runner._post(self, "partial", item)
+
+
+class TaskRunner:
+    def __init__(self, root, max_workers=4, poll_ms=50, on_busy_change=None):
+        self.root = root
+        self.poll_ms = poll_ms
+        self.on_busy_change = on_busy_change
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="spotify-worker")
+        self._queue = queue.Queue()
+        self._tasks = {}
+        self._busy = False
+        self._after_id = self.root.after(self.poll_ms, self._poll)
+
+    def submit(self, key, fn, *args, on_done=None, on_error=None, on_progress=None, on_partial=None, delay_ms=0):
+        # fn is called on a worker thread as fn(task, *args); callbacks run on the Tk main thread.
+        # With delay_ms the start is postponed, so a burst of submissions (e.g. arrow-keying through
+        # a listbox) only ever starts the last one.
+        previous = self._tasks.get(key)
+        if previous:
+            previous.cancel()
+        task = Task(self, key, on_done, on_error, on_progress, on_partial)
+        self._tasks[key] = task
+        if delay_ms:
+            self.root.after(delay_ms, lambda: self._start(task, fn, args))
+        else:
+            self._start(task, fn, args)
+        self._update_busy()
+        return task
+
+    def cancel(self, key=None):
+        # Cancels one task, or every running task when no key is given
+        keys = [key] if key is not None else list(self._tasks)
+        for k in keys:
+            task = self._tasks.pop(k, None)
+            if task:
+                task.cancel()
+        self._update_busy()
+
+    def is_running(self, key):
+        return key in self._tasks
+
+    def busy(self):
+        # Safe to call from other threads (the prefetcher asks before every request)
+        return bool(self._tasks)
+
+    def shutdown(self):
+        self.cancel()
+        try:
+            self.root.after_cancel(self._after_id)
+        except Exception:
+            pass
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _start(self, task, fn, args):
+        if task.cancelled:
+            return
+        self._executor.submit(self._run, task, fn, args)
+
+    def _run(self, task, fn, args):
+        try:
+            result = fn(task, *args)
+        except TaskCancelled:
+            return
+        except Exception as e:
+            self._post(task, "error", e)
+            return
+        self._post(task, "done", result)
+
+    def _post(self, task, kind, payload):
+        self._queue.put((task, kind, payload))
+
+    def _poll(self):
+        try:
+            while True:
+                task, kind, payload = self._queue.get_nowait()
+                self._dispatch(task, kind, payload)
+        except queue.Empty:
+            pass
+        self._after_id = self.root.after(self.poll_ms, self._poll)
+
+    def _dispatch(self, task, kind, payload):
+        # Anything coming from a task that has been cancelled or replaced is stale and dropped
+        if task.cancelled or self._tasks.get(task.key) is not task:
+            return
+        if kind in ("done", "error"):
+            del self._tasks[task.key]
+            self._update_busy()
+        try:
+            if kind == "progress" and task.on_progress:
+                task.on_progress(*payload)
+            elif kind == "partial" and task.on_partial:
+                task.on_partial(payload)
+            elif kind == "done" and task.on_done:
+                task.on_done(payload)
+            elif kind == "error" and task.on_error:
+                task.on_error(payload)
+        except Exception as e:
+            print(f"Callback of task '{task.key}' failed: {e}")
+
+    def _update_busy(self):
+        busy = bool(self._tasks)
+        if busy != self._busy:
+            self._busy = busy
+            if self.on_busy_change:
+                self.on_busy_change(busy)
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+import argparse
+import csv
+import json
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+import history
+from analyzer_core import AnalyzerCore, DEFAULT_SETTINGS, make_client
+from auth_handler import load_credentials
+from credential_pool import CredentialPool
+
+# Headless batch analysis: reads artist names/IDs from a file (one per line, # for comments),
+# analyzes them in parallel with the same settings as the GUI and writes one result per artist
+# as soon as it's done.
+#
+#   python batch_cli.py artists.txt -o results.jsonl --workers 8
+#   python batch_cli.py artists.txt -o results.csv --processes 4 --types album --filters live,demo --albums All
+#
+# Every album and track popularity that comes back is also added to the popularity history
+# (history.py, the same file the GUI uses) unless --no-history is given; running this daily builds the trends.
+#
+# Credentials come from .spotify_credentials or the SPOTIPY_CLIENT_ID / SPOTIPY_CLIENT_SECRET variables.
+
+CSV_COLUMNS = ["input", "artist_id", "artist_name", "followers", "album_id", "album_name", "album_year",
+               "album_popularity", "track_id", "track_name", "track_popularity", "error"]
+
+_process_core = None
+
+
+def build_core(creds, use_async, concurrency, use_cache):
+    sp, auth_manager, _ = make_client(creds["client_id"], creds["client_secret"], use_cache=use_cache,
+                                      pool=creds.get("pool"))
+    pool = auth_manager if isinstance(auth_manager, CredentialPool) else None
+    return AnalyzerCore(sp, lambda: auth_manager.get_access_token(as_dict=False), use_async, concurrency, pool=pool)
+
+
+def _init_process(creds, use_async, concurrency, use_cache):
+    # Every worker process gets its own client (and its own connection to the cache file)
+    global _process_core
+    _process_core = build_core(creds, use_async, concurrency, use_cache)
+
+
+def _analyze_in_process(query, settings):
+    return analyze(_process_core, query, settings)
+
+
+def analyze(core, query, settings):
+    # Returns the record and, for the history, when the popularities in it that the API cache served were
+    # fetched: {"album": {id: unix time}, "track": {id: unix time}}
+    started = time.perf_counter()
+    fetched = {"album": {}, "track": {}}
+    try:
+        record = core.analyze_artist(query, settings)
+        fetched["album"] = core.fetched_at("album", [album["id"] for album in record["albums"]])
+        fetched["track"] = core.fetched_at("track", [track["id"] for album in record["albums"]
+                                                     for track in album["tracks"]])
+    except Exception as e:
+        record = {"input": query, "error": str(e)}
+    record["elapsed_s"] = round(time.perf_counter() - started, 3)
+    return record, fetched
+
+
+def record_history(store, record, fetched):
+    artist = record.get("artist")
+    if not artist:
+        return
+    albums = record["albums"]
+    store.record(artist["id"], artist["name"], history.ALBUM,
+                 [(album["id"], album["name"], album["popularity"]) for album in albums], fetched=fetched["album"])
+    store.record(artist["id"], artist["name"], history.TRACK,
+                 [(track["id"], track["name"], track["popularity"]) for album in albums for track in album["tracks"]],
+                 fetched=fetched["track"])
+
+
+def read_queries(path):
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+
+class ResultWriter:
+    # Writes records as they arrive and flushes after each one, so partial results survive a crash
+    def __init__(self, path, fmt):
+        self.fmt = fmt
+        self._file = open(path, "w", encoding="utf-8", newline="") if path != "-" else sys.stdout
+        self._csv = None
+        if fmt == "csv":
+            self._csv = csv.DictWriter(self._file, fieldnames=CSV_COLUMNS)
+            self._csv.writeheader()
+
+    def write(self, record):
+        if self.fmt == "jsonl":
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        else:
+            for row in self._csv_rows(record):
+                self._csv.writerow(row)
+        self._file.flush()
+
+    @staticmethod
+    def _csv_rows(record):
+        base = {"input": record["input"], "error": record.get("error", "")}
+        artist = record.get("artist")
+        if not artist:
+            yield base
+            return
+        base.update(artist_id=artist["id"], artist_name=artist["name"], followers=artist["followers"])
+        if not record["albums"]:
+            yield base
+        for album in record["albums"]:
+            row = dict(base, album_id=album["id"], album_name=album["name"], album_year=album["year"],
+                       album_popularity=album["popularity"], error=album["error"] or "")
+            if not album["tracks"]:
+                yield row
+            for track in album["tracks"]:
+                yield dict(row, track_id=track["id"], track_name=track["name"],
+                           track_popularity=track["popularity"])
+
+    def close(self):
+        if self._file is not sys.stdout:
+            self._file.close()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze the popularity of many artists without the GUI")
+    parser.add_argument("input", help="file with one artist name, ID, URI or URL per line")
+    parser.add_argument("-o", "--output", default="-", help="output file (.jsonl or .csv), '-' for stdout")
+    parser.add_argument("--format", choices=["jsonl", "csv"], help="defaults to the output file extension")
+    parser.add_argument("--workers", type=int, default=4, help="artists analyzed at the same time")
+    parser.add_argument("--processes", action="store_true", help="use worker processes instead of threads")
+    parser.add_argument("--types", default=",".join(DEFAULT_SETTINGS["types"]),
+                        help="release types to look for, e.g. album,single,compilation")
+    parser.add_argument("--filters", default="", help="keywords to filter out, e.g. live,demo,remastered")
+    parser.add_argument("--albums", default=DEFAULT_SETTINGS["albums_to_export"], help="albums to export or All")
+    parser.add_argument("--tracks", default=DEFAULT_SETTINGS["tracks_to_export"], help="tracks per album or All")
+    parser.add_argument("--sort", choices=["Descending", "Ascending"], default=DEFAULT_SETTINGS["sort_order"])
+    parser.add_argument("--concurrent-requests", type=int, default=0,
+                        help="use the async transport with this many parallel requests per worker (needs aiohttp)")
+    parser.add_argument("--market", default="", help="only releases available in this country, e.g. US")
+    parser.add_argument("--keep-variants", action="store_true",
+                        help="don't collapse duplicate editions of a release (costs one lookup per 20 of them)")
+    parser.add_argument("--no-cache", action="store_true", help="don't use the on-disk API cache")
+    parser.add_argument("--no-history", action="store_true", help="don't add the results to the popularity history")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    fmt = args.format or ("csv" if args.output.lower().endswith(".csv") else "jsonl")
+    creds = load_credentials()
+    if not creds:
+        sys.exit("No Spotify credentials: run the GUI once or set SPOTIPY_CLIENT_ID / SPOTIPY_CLIENT_SECRET")
+
+    settings = {
+        "types": [t for t in args.types.split(",") if t],
+        "filters": [f for f in args.filters.split(",") if f],
+        "albums_to_export": args.albums,
+        "tracks_to_export": args.tracks,
+        "sort_order": args.sort,
+        "market": args.market.upper(),
+        "collapse_variants": not args.keep_variants
+    }
+    queries = read_queries(args.input)
+    client_options = (creds, args.concurrent_requests > 0, args.concurrent_requests or 8, not args.no_cache)
+
+    if args.processes:
+        executor = ProcessPoolExecutor(max_workers=args.workers, initializer=_init_process,
+                                       initargs=client_options)
+        submit = lambda query: executor.submit(_analyze_in_process, query, settings)
+    else:
+        core = build_core(*client_options)
+        executor = ThreadPoolExecutor(max_workers=args.workers)
+        submit = lambda query: executor.submit(analyze, core, query, settings)
+
+    writer = ResultWriter(args.output, fmt)
+    store = None if args.no_history else history.open_history()
+    started = time.perf_counter()
+    failed = 0
+    try:
+        futures = [submit(query) for query in queries]
+        for done, future in enumerate(as_completed(futures), 1):
+            record, fetched = future.result()
+            failed += "error" in record
+            writer.write(record)
+            if store:
+                record_history(store, record, fetched)
+            print(f"[{done}/{len(queries)}] {record['input']}: "
+                  f"{record.get('error') or str(record['releases']) + ' releases'}", file=sys.stderr)
+        executor.shutdown()
+    except KeyboardInterrupt:
+        executor.shutdown(wait=False, cancel_futures=True)
+        print("Interrupted, results so far are saved.", file=sys.stderr)
+    finally:
+        writer.close()
+        if store:
+            store.close()
+    elapsed = time.perf_counter() - started
+    print(f"Analyzed {len(queries)} artists in {elapsed:.1f} s ({failed} failed)", file=sys.stderr)
+    return 1 if failed == len(queries) and queries else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+# Performance benchmarks that run without Spotify credentials or a display.
+#
+#   python benchmarks.py charts                 # redraw time vs. number of bars
+#   python benchmarks.py charts --bars 10,100,1000 --updates 20
+#   python benchmarks.py api                    # app paths against fake_spotify.py, small/medium/large artists
+#   python benchmarks.py api --sizes large --latency 0.03 --throttle-rate 0.02 --cache --json results.json
+#
+# The api benchmark runs the worker code behind fetch_albums, on_select_album, export_popularity and
+# the Raw Data window against a local fake_spotify.py server and reports wall time, API calls, 429s,
+# bytes received and peak Python memory (tracemalloc, which also slows the run down a little).
+# It can replay recorded responses instead of the synthetic catalog:
+#
+#   python benchmarks.py api --artists <artist id> --fixtures band.json.gz --upstream https://api.spotify.com/v1/
+#   python benchmarks.py api --artists <artist id> --fixtures band.json.gz
+#
+# The first run records (needs credentials), the second one replays the fixture file offline.
+
+API_SIZES = {"small": 25, "medium": 500, "large": 5000}  # releases of the synthetic artists
+API_SCENARIOS = ["fetch_albums", "on_select_album", "export_popularity", "raw_data"]
+
+
+def _legacy_redraw(ax, canvas, names, pops):
+    # What the charts did before charts.BarChart: rebuild every bar and draw synchronously
+    ax.clear()
+    ax.barh(names, pops, color="skyblue")
+    ax.invert_yaxis()
+    ax.set_title("Albums")
+    ax.set_xlabel("Popularity")
+    canvas.draw()
+
+
+def bench_charts(bar_counts, updates):
+    # Average time per chart update (one delete = one update) with the old full redraw and with
+    # BarChart. The Agg canvas has no event loop, its draw_idle() draws right away, so every
+    # BarChart update below includes one full draw (in Tk, a burst of updates shares one draw).
+    import matplotlib
+    matplotlib.use("Agg")
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from charts import BarChart
+
+    rng = random.Random(42)
+    rows = []
+    for count in bar_counts:
+        names = [f"Release {i} ({1970 + i % 50})" for i in range(count)]
+        pops = sorted((rng.randint(0, 100) for _ in range(count)), reverse=True)
+        results = {}
+        for mode in ("legacy", "incremental"):
+            fig = Figure(figsize=(5, 3), dpi=100)
+            ax = fig.add_subplot(111)
+            canvas = FigureCanvasAgg(fig)
+            chart = BarChart(ax, canvas, "Albums", "skyblue") if mode == "incremental" else None
+            started = time.perf_counter()
+            for i in range(updates):
+                # Every update removes one release, like delete_selected_album
+                shown_names, shown_pops = names[:count - i], pops[:count - i]
+                if chart:
+                    chart.set_data(shown_names, shown_pops, "Albums", keep_offset=True)
+                else:
+                    _legacy_redraw(ax, canvas, shown_names, shown_pops)
+            results[mode] = (time.perf_counter() - started) / updates * 1000
+        rows.append((count, results["legacy"], results["incremental"]))
+
+    print(f"{'bars':>8} {'legacy ms':>12} {'incremental ms':>16} {'speedup':>9}")
+    for count, legacy, incremental in rows:
+        print(f"{count:>8} {legacy:>12.1f} {incremental:>16.1f} {legacy / incremental:>8.1f}x")
+    return rows
+
+
+class _ApiBench:
+    # One artist's data as the GUI would hold it, built up scenario by scenario
+    def __init__(self, core, artist_id, settings, selected_albums, workdir):
+        from analyzer_core import KeywordFilter
+        self.core = core
+        self.artist_id = artist_id
+        self.artist_name = core.sp.artist(artist_id)["name"]
+        self.settings = settings
+        self.keyword_filter = KeywordFilter.from_settings(settings)
+        self.selected_albums = selected_albums
+        self.workdir = workdir
+        self.catalog = None
+        self.albums = []
+        self.tracks = []
+
+    def fetch_albums(self):
+        # _fetch_albums_worker plus what the partial/done callbacks do with the batches
+        from catalog import ArtistCatalog
+        types = self.settings["types"]
+        self.catalog = ArtistCatalog(self.artist_id)
+        self.catalog.start(types)
+        for by_type in self.core.iter_catalog(self.artist_id, types):
+            self.catalog.select(self.catalog.add(by_type), self.keyword_filter)
+        self.catalog.finish(types)
+        self.albums = self.catalog.albums(types, self.keyword_filter)
+        return f"{len(self.albums)} releases"
+
+    def on_select_album(self):
+        # Clicking through the first few releases, each tracklist loaded once like in the GUI
+        for album in list(self.albums)[:self.selected_albums]:
+            self.catalog.tracks[album[0]] = self.core.fetch_album_tracks(album[0])
+            self.tracks = self.catalog.album_tracks(album[0], self.keyword_filter)
+        return f"{min(self.selected_albums, len(self.albums))} albums"
+
+    def export_popularity(self):
+        from exporter import PopularityExport
+        path = os.path.join(self.workdir, f"{self.artist_id}.txt")
+        job = PopularityExport(self.core, self.artist_id, self.artist_name, self.albums, self.settings, path)
+        result = job.run(resume=False)
+        return f"{result['albums']} albums, {os.path.getsize(path)} bytes"
+
+    def raw_data(self):
+        from raw_data import RawDataReport
+        # Like "Copy All": the details of every block, then the whole text
+        report = RawDataReport(self.artist_id, self.artist_name, self.albums, self.tracks)
+        artist_wanted, album_ids, track_ids = report.missing()
+        report.update(self.core.collect_raw_details(self.artist_id if artist_wanted else None, album_ids, track_ids))
+        lines = sum(1 for _ in report.lines())
+        return f"{lines} lines"
+
+
+def bench_api(artists, latency=0.0, throttle_rate=0.0, use_cache=False, use_async=False, concurrency=8,
+              export_albums="100", selected_albums=5, fixtures=None, upstream=None, measure_memory=True):
+    # artists: [(label, artist ID)]. Returns one result dict per artist and scenario.
+    import spotipy
+    from analyzer_core import AnalyzerCore, DEFAULT_SETTINGS
+    from api_cache import CachedSpotify, ResponseCache
+    from fake_spotify import FakeSpotifyServer
+
+    token = "benchmark"
+    if upstream:
+        # Recording talks to the real API, so it needs a real token
+        from auth_handler import TokenSession, load_credentials
+        creds = load_credentials()
+        if not creds:
+            raise SystemExit("Recording fixtures needs Spotify credentials")
+        token = TokenSession(creds["client_id"], creds["client_secret"]).get_access_token(as_dict=False)
+
+    import columnar
+    columnar.load()  # numpy's import shouldn't count towards the first fetch_albums
+
+    settings = dict(DEFAULT_SETTINGS, albums_to_export=export_albums, tracks_to_export="All")
+    server = FakeSpotifyServer(latency=latency, throttle_rate=throttle_rate, fixtures=fixtures, upstream=upstream)
+    results = []
+    with server, tempfile.TemporaryDirectory() as workdir:
+        for label, artist_id in artists:
+            sp = spotipy.Spotify(auth=token)
+            sp.prefix = server.prefix
+            if use_cache:
+                # A fresh cache per artist: later scenarios profit from earlier ones, like in the app
+                sp = CachedSpotify(sp, ResponseCache(os.path.join(workdir, f"{artist_id}.sqlite")))
+            core = AnalyzerCore(sp, lambda: token, use_async, concurrency, api_prefix=server.prefix)
+            bench = _ApiBench(core, artist_id, settings, selected_albums, workdir)
+            for scenario in API_SCENARIOS:
+                server.reset_stats()
+                if measure_memory:
+                    tracemalloc.start()
+                started = time.perf_counter()
+                summary = getattr(bench, scenario)()
+                elapsed = time.perf_counter() - started
+                peak = tracemalloc.get_traced_memory()[1] if measure_memory else None
+                if measure_memory:
+                    tracemalloc.stop()
+                results.append({
+                    "artist": label,
+                    "scenario": scenario,
+                    "wall_ms": round(elapsed * 1000, 1),
+                    "calls": sum(server.requests.values()),
+                    "throttled": server.throttled,
+                    "bytes": server.bytes_sent,
+                    "peak_mb": round(peak / 2 ** 20, 2) if peak is not None else None,
+                    "result": summary,
+                })
+
+    print(f"{'artist':>12} {'scenario':>18} {'wall ms':>10} {'calls':>7} {'429s':>5} {'KB':>9} {'peak MB':>8}  result")
+    for r in results:
+        peak = f"{r['peak_mb']:.2f}" if r["peak_mb"] is not None else "-"
+        print(f"{r['artist']:>12} {r['scenario']:>18} {r['wall_ms']:>10.1f} {r['calls']:>7} {r['throttled']:>5} "
+              f"{r['bytes'] / 1024:>9.0f} {peak:>8}  {r['result']}")
+    if server.recorded:
+        print(f"Recorded {server.recorded} responses to {fixtures}")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Spotify Popularity Analyzer benchmarks")
+    sub = parser.add_subparsers(dest="benchmark", required=True)
+    charts = sub.add_parser("charts", help="chart redraw time vs. number of bars")
+    charts.add_argument("--bars", default="10,100,500,1000", help="comma-separated bar counts")
+    charts.add_argument("--updates", type=int, default=5, help="updates measured per bar count")
+    api = sub.add_parser("api", help="fetch, select, export and raw data paths against a local fake API")
+    api.add_argument("--sizes", default=",".join(API_SIZES), help="synthetic artists: small, medium, large")
+    api.add_argument("--artists", help="comma-separated artist IDs instead of the synthetic ones (for fixtures)")
+    api.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    api.add_argument("--throttle-rate", type=float, default=0.0, help="share of requests answered with 429")
+    api.add_argument("--cache", action="store_true", help="use a (fresh) response cache per artist")
+    api.add_argument("--async", dest="use_async", action="store_true", help="use the aiohttp transport")
+    api.add_argument("--concurrency", type=int, default=8)
+    api.add_argument("--export-albums", default="100", help="albums in the popularity export, or All")
+    api.add_argument("--select", type=int, default=5, help="albums opened in the on_select_album scenario")
+    api.add_argument("--fixtures", help="recorded responses to replay (.json or .json.gz)")
+    api.add_argument("--upstream", help="record missing fixtures from this API prefix (needs credentials)")
+    api.add_argument("--no-memory", action="store_true", help="don't trace memory (slightly faster runs)")
+    api.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    if args.benchmark == "charts":
+        bench_charts([int(n) for n in args.bars.split(",")], args.updates)
+    elif args.benchmark == "api":
+        if args.upstream and not args.fixtures:
+            parser.error("--upstream needs --fixtures to record into")
+        if args.artists:
+            artists = [(artist_id[:12], artist_id) for artist_id in args.artists.split(",") if artist_id]
+        else:
+            artists = [(size, f"bench{size}{API_SIZES[size]}") for size in args.sizes.split(",") if size]
+        results = bench_api(artists, args.latency, args.throttle_rate, args.cache, args.use_async, args.concurrency,
+                            args.export_albums, args.select, args.fixtures, args.upstream, not args.no_memory)
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+# In-memory catalog of the selected artist.
+# Releases and tracklists are kept unfiltered, so changing the keyword filters, the export settings
+# or turning a release type off is applied locally; only release types that were never loaded
+# for this artist need a trip to Spotify.
+# Duplicate editions collapsed while loading (analyzer_core.VariantGroups) are remembered per
+# representative but only hydrated when the user asks to see them; hydrated variants are regular
+# rows flagged in `variant` and left out of albums() unless requested.
+
+from columnar import AlbumTable, AlbumView, load
+
+RELEASE_TYPES = ["album", "single", "compilation"]
+
+
+class ArtistCatalog:
+    # tracks can be shared between catalogs, e.g. a prefetch.TracklistCache
+    def __init__(self, artist_id, tracks=None):
+        self.artist_id = artist_id
+        self.releases = AlbumTable()  # every release loaded so far, in discography order per type
+        self.type_codes = {t: code for code, t in enumerate(RELEASE_TYPES)}
+        self.loaded = set()  # release types whose discography was loaded completely
+        self.tracks = {} if tracks is None else tracks  # album ID -> [{"id", "name", "popularity"}], unfiltered
+        self.removed = set()  # album IDs the user deleted from the discography list
+        self._filter_masks = {}  # KeywordFilter -> rows matching it (computed once per row)
+        self.variants = {}  # representative album ID -> [(id, name, release type)] collapsed into it
+        self._variant_of = {}  # collapsed album ID -> its representative
+        self.variant = load().zeros(0, dtype=bool)  # per row: a collapsed variant of another release
+
+    def _codes(self, release_types):
+        return [self.type_codes.setdefault(t, len(self.type_codes)) for t in release_types]
+
+    def missing_types(self, release_types):
+        return [t for t in release_types if t not in self.loaded]
+
+    def start(self, release_types):
+        # Forget whatever an earlier (possibly cancelled) load left behind for these types
+        np = load()
+        table = self.releases
+        table.kill(np.isin(table.type, self._codes(release_types)))
+        self.loaded.difference_update(release_types)
+        for rep_id in list(self.variants):
+            kept = [v for v in self.variants[rep_id] if v[2] not in release_types]
+            for album_id, _, release_type in self.variants[rep_id]:
+                if release_type in release_types:
+                    self._variant_of.pop(album_id, None)
+            if kept:
+                self.variants[rep_id] = kept
+            else:
+                del self.variants[rep_id]
+
+    def add(self, by_type, variant=False):
+        # Returns the table rows of the new releases
+        np = load()
+        added = [self.releases.append(albums, self._codes([release_type])[0],
+                                      alive=[a[0] not in self.removed for a in albums])
+                 for release_type, albums in by_type.items()]
+        rows = np.concatenate(added) if added else np.empty(0, dtype=np.intp)
+        self.variant = np.concatenate([self.variant, np.full(len(rows), variant, dtype=bool)])
+        return rows
+
+    def add_variants(self, variant_groups, groups):
+        # Remembers what a load collapsed; groups is the album ID -> release type map of that load
+        for rep_id, collapsed in variant_groups.variants.items():
+            self.variants.setdefault(rep_id, []).extend(
+                (album_id, name, groups.get(album_id, "album")) for album_id, name in collapsed)
+            self._variant_of.update((album_id, rep_id) for album_id, _ in collapsed)
+
+    def copy(self, tracks=None):
+        # An independent catalog with the same live releases, e.g. for the comparison view
+        np = load()
+        other = ArtistCatalog(self.artist_id, tracks)
+        table = self.releases
+        for release_type, code in self.type_codes.items():
+            for variant in (False, True):
+                rows = np.flatnonzero(table.alive & (table.type == code) & (self.variant == variant))
+                if len(rows):
+                    other.add({release_type: table.rows(rows)}, variant)
+        other.loaded = set(self.loaded)
+        other.removed = set(self.removed)
+        other.set_variants(self.variants)
+        return other
+
+    def set_variants(self, variants):
+        # Replaces the collapsed variants, e.g. with the ones saved in a snapshot.py bundle
+        self.variants = {rep_id: [tuple(v) for v in collapsed] for rep_id, collapsed in variants.items()}
+        self._variant_of = {v[0]: rep_id for rep_id, collapsed in self.variants.items() for v in collapsed}
+
+    def variant_count(self, album_id):
+        return len(self.variants.get(album_id, ()))
+
+    def variant_of(self, album_id):
+        # The representative a collapsed edition belongs to, None for everything else
+        return self._variant_of.get(album_id)
+
+    def unloaded_variants(self, release_types):
+        # {release type: [(id, name)]} of the collapsed variants of these types that aren't in the table yet
+        np = load()
+        table = self.releases
+        loaded = {table.ids[row] for row in np.flatnonzero(self.variant & table.alive)} | self.removed
+        by_type = {}
+        for collapsed in self.variants.values():
+            for album_id, name, release_type in collapsed:
+                if release_type in release_types and album_id not in loaded:
+                    by_type.setdefault(release_type, []).append((album_id, name))
+        return by_type
+
+    def finish(self, release_types):
+        self.loaded.update(release_types)
+
+    def remove(self, row):
+        self.removed.add(self.releases.ids[row])
+        self.releases.kill([row])
+
+    def _matching(self, keyword_filter):
+        # Keyword matches are cached per filter and only computed for rows added since the last call
+        np = load()
+        mask = self._filter_masks.get(keyword_filter)
+        if mask is None:
+            self._filter_masks = {}
+            mask = np.zeros(0, dtype=bool)
+        if len(mask) < self.releases.size:
+            mask = np.concatenate([mask, self.releases.name_mask(keyword_filter.matches, len(mask))])
+            self._filter_masks[keyword_filter] = mask
+        return mask
+
+    def select(self, rows, keyword_filter):
+        # The given rows minus dead and filtered-out ones
+        np = load()
+        rows = np.asarray(rows, dtype=np.intp)
+        return rows[self.releases.alive[rows] & ~self._matching(keyword_filter)[rows]]
+
+    def albums(self, release_types, keyword_filter, show_variants=False):
+        # The discography as the settings want it: selected types in their usual order, filtered,
+        # collapsed variants only when asked for
+        np = load()
+        table = self.releases
+        mask = table.alive & np.isin(table.type, self._codes(release_types)) & ~self._matching(keyword_filter)
+        if not show_variants:
+            mask &= ~self.variant
+        rows = np.flatnonzero(mask)
+        return AlbumView(table, rows[np.argsort(table.type[rows], kind="stable")])
+
+    def album_tracks(self, album_id, keyword_filter):
+        # Filtered tracklist, or None if the album hasn't been loaded yet
+        tracks = self.tracks.get(album_id)
+        return None if tracks is None else keyword_filter.tracks(tracks)
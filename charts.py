@@ -0,0 +1,197 @@
+# Popularity bar charts that are updated in place.
+# The bars are created once; an update only changes their widths, colors and the tick labels and then asks
+# for a draw_idle(), so Tk redraws once when it's idle no matter how many updates came in (streaming
+# discographies, deletes...). Long lists show a window of max_bars - 1 rows plus an "Others" bar
+# with the average popularity of everything outside the window; the mouse wheel scrolls the window.
+
+OTHERS_COLOR = "lightgray"
+SCROLL_ROWS = 3
+
+
+class BarChart:
+    def __init__(self, ax, canvas, title, color, max_bars=25, label_chars=40):
+        self.ax = ax
+        self.canvas = canvas
+        self.title = title
+        self.color = color
+        self.max_bars = max_bars
+        self.label_chars = label_chars
+        self.labels = []
+        self.values = []
+        self.offset = 0
+        self._bars = None
+        ax.set_title(title, fontsize=8)
+        ax.set_xlim(0, 100)  # popularity is always 0-100, a fixed scale means no relayout on updates
+        canvas.mpl_connect("scroll_event", self._on_scroll)
+
+    def _ensure_bars(self):
+        if self._bars is None:
+            positions = range(self.max_bars)
+            self._bars = list(self.ax.barh(positions, [0] * self.max_bars, color=self.color))
+            self.ax.set_yticks(list(positions))
+            self.ax.set_xlabel("Popularity")
+
+    def set_data(self, labels, values, title, keep_offset=False):
+        # labels/values must already be in display order (most popular first)
+        self.labels = list(labels)
+        self.values = list(values)
+        self.title = title
+        if not keep_offset:
+            self.offset = 0
+        self.render()
+
+    def clear(self, title):
+        self.set_data([], [], title)
+
+    def _rows(self):
+        # (label, value, is_others) for every visible bar
+        count = len(self.values)
+        if count <= self.max_bars:
+            self.offset = 0
+            return [(label, value, False) for label, value in zip(self.labels, self.values)]
+        window = self.max_bars - 1
+        self.offset = max(0, min(self.offset, count - window))
+        end = self.offset + window
+        rows = [(label, value, False)
+                for label, value in zip(self.labels[self.offset:end], self.values[self.offset:end])]
+        rest = count - window
+        rest_total = sum(self.values) - sum(self.values[self.offset:end])
+        rows.append((f"{rest} others (average)", rest_total / rest, True))
+        return rows
+
+    def _short(self, label):
+        if len(label) <= self.label_chars:
+            return label
+        return label[:self.label_chars - 1] + "…"
+
+    def render(self):
+        self._ensure_bars()
+        rows = self._rows()
+        for i, bar in enumerate(self._bars):
+            if i < len(rows):
+                label, value, is_others = rows[i]
+                bar.set_width(value)
+                bar.set_color(OTHERS_COLOR if is_others else self.color)
+                bar.set_visible(True)
+            else:
+                bar.set_visible(False)
+        self.ax.set_yticklabels([self._short(row[0]) for row in rows] + [""] * (self.max_bars - len(rows)),
+                                fontsize=6)
+        # Highest popularity at the top; only the used rows take up space
+        self.ax.set_ylim(max(len(rows), 1) - 0.5, -0.5)
+        if self.offset:
+            self.ax.set_title(f"{self.title} (from #{self.offset + 1})", fontsize=8)
+        else:
+            self.ax.set_title(self.title, fontsize=8)
+        self.canvas.draw_idle()
+
+    def scroll(self, rows):
+        if len(self.values) > self.max_bars:
+            self.offset += rows
+            self.render()
+
+    def _on_scroll(self, event):
+        if event.inaxes is self.ax:
+            self.scroll(-SCROLL_ROWS if event.step > 0 else SCROLL_ROWS)
+
+
+class HistoryChart:
+    # Popularity over time (step lines, popularity only changes between snapshots) or the biggest movers.
+    # Only a handful of series are ever shown, so this one simply redraws its axes.
+    def __init__(self, ax, canvas, label_chars=30):
+        self.ax = ax
+        self.canvas = canvas
+        self.label_chars = label_chars
+
+    def _short(self, label):
+        return label if len(label) <= self.label_chars else label[:self.label_chars - 1] + "…"
+
+    def _start(self, title):
+        self.ax.clear()
+        self.ax.set_title(title, fontsize=8)
+        self.ax.tick_params(axis="both", labelsize=6)
+
+    def clear(self, title):
+        self._start(title)
+        self.canvas.draw_idle()
+
+    def show_series(self, title, series):
+        # series: {label: [(date, popularity)]}, the first one is drawn thicker
+        self._start(title)
+        for i, (label, points) in enumerate(series.items()):
+            if not points:
+                continue
+            dates, pops = zip(*points)
+            self.ax.plot(dates, pops, drawstyle="steps-post", marker="o", markersize=2,
+                         linewidth=2 if i == 0 else 1, label=self._short(label))
+        self.ax.set_ylim(0, 100)
+        self.ax.set_ylabel("Popularity", fontsize=6)
+        if series:
+            self.ax.legend(fontsize=5, loc="best")
+        self.canvas.draw_idle()
+
+    def show_movers(self, title, movers):
+        # movers: [(label, popularity_then, popularity_now)], biggest change first
+        self._start(title)
+        labels = [self._short(label) for label, _, _ in movers]
+        changes = [now - then for _, then, now in movers]
+        self.ax.barh(labels, changes, color=["seagreen" if c > 0 else "indianred" for c in changes])
+        self.ax.invert_yaxis()
+        self.ax.axvline(0, color="gray", linewidth=0.5)
+        self.ax.set_xlabel("Popularity change", fontsize=6)
+        self.canvas.draw_idle()
+
+
+class ComparisonChart:
+    # Several artists side by side: the popularity distribution of their releases (a violin with a box plot in
+    # it) and their top albums overlaid by rank. Artists keep their color in both. Redrawn as a whole, like
+    # HistoryChart.
+    def __init__(self, dist_ax, top_ax, canvas, label_chars=18):
+        self.dist_ax = dist_ax
+        self.top_ax = top_ax
+        self.canvas = canvas
+        self.label_chars = label_chars
+
+    def _short(self, label):
+        return label if len(label) <= self.label_chars else label[:self.label_chars - 1] + "…"
+
+    def show(self, artists):
+        # artists: [(name, popularity values, [(album name, popularity)] most popular first)]
+        dist_ax, top_ax = self.dist_ax, self.top_ax
+        dist_ax.clear()
+        top_ax.clear()
+        dist_ax.set_title("Release popularity", fontsize=8)
+        top_ax.set_title("Top albums", fontsize=8)
+        for ax in (dist_ax, top_ax):
+            ax.tick_params(axis="both", labelsize=6)
+            ax.set_ylim(0, 100)
+        if not artists:
+            dist_ax.text(0.5, 0.5, "Add artists to compare", ha="center", va="center", transform=dist_ax.transAxes,
+                         fontsize=8)
+            self.canvas.draw_idle()
+            return
+        positions = range(1, len(artists) + 1)
+        for position, (name, values, top) in zip(positions, artists):
+            color = f"C{(position - 1) % 10}"
+            values = [float(v) for v in values]
+            # A violin needs at least two different values, a single release or equal ones only get the box
+            if len(set(values)) > 1:
+                violin = dist_ax.violinplot([values], [position], widths=0.8, showextrema=False)
+                for body in violin["bodies"]:
+                    body.set_facecolor(color)
+                    body.set_alpha(0.35)
+            if values:
+                dist_ax.boxplot([values], positions=[position], widths=0.2, showfliers=False,
+                                medianprops={"color": color}, manage_ticks=False)
+            if top:
+                pops = [pop for _, pop in top]
+                top_ax.plot(range(1, len(pops) + 1), pops, marker="o", markersize=3, color=color,
+                            label=self._short(name))
+        dist_ax.set_xticks(list(positions))
+        dist_ax.set_xticklabels([self._short(name) for name, _, _ in artists], rotation=30, ha="right")
+        dist_ax.set_xlim(0.4, len(artists) + 0.6)
+        dist_ax.set_ylabel("Popularity", fontsize=6)
+        top_ax.set_xlabel("Rank", fontsize=6)
+        if top_ax.lines:
+            top_ax.legend(fontsize=5, loc="lower left")
+        self.canvas.draw_idle()
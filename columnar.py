@@ -0,0 +1,150 @@
+# Columnar storage for release lists.
+# Popularity, year and release type live in NumPy arrays (names and IDs in plain lists), so filtering,
+# ordering and top-N selection are vectorized and a 10k-release catalog costs a few hundred KB
+# instead of 10k tuples. Rows are only turned back into (id, name, popularity, year) tuples
+# for the ones that actually get shown or exported.
+
+# numpy comes with matplotlib but takes a moment to import, popularity.py loads it while the splash is up
+np = None
+
+UNKNOWN_YEAR = "????"
+
+
+def load():
+    global np
+    if np is None:
+        import numpy as module
+        np = module
+    return np
+
+
+def top_indices(values, n=None, descending=True):
+    # Positions of the n largest (or smallest) values in order; ties keep their original order,
+    # just like sorted(..., reverse=descending)[:n]. Only a full sort when all values are wanted.
+    load()
+    values = np.asarray(values, dtype=np.int64)
+    size = len(values)
+    n = size if n is None else max(0, min(n, size))
+    if n == 0:
+        return np.empty(0, dtype=np.intp)
+    # One unique key per row (value first, position second) makes the selection deterministic
+    keys = (-values if descending else values) * size + np.arange(size)
+    if n < size:
+        picked = np.argpartition(keys, n - 1)[:n]
+        return picked[np.argsort(keys[picked])]
+    return np.argsort(keys)
+
+
+class AlbumTable:
+    # Append-only store of (id, name, popularity, year) rows plus a release type code per row.
+    # Rows are never removed, only marked dead in the `alive` mask.
+
+    def __init__(self, capacity=256):
+        load()
+        self.ids = []
+        self.names = []
+        self.size = 0
+        self._popularity = np.zeros(capacity, dtype=np.int16)
+        self._year = np.zeros(capacity, dtype=np.int16)
+        self._type = np.zeros(capacity, dtype=np.int8)
+        self._alive = np.zeros(capacity, dtype=bool)
+
+    @property
+    def popularity(self):
+        return self._popularity[:self.size]
+
+    @property
+    def year(self):
+        return self._year[:self.size]
+
+    @property
+    def type(self):
+        return self._type[:self.size]
+
+    @property
+    def alive(self):
+        return self._alive[:self.size]
+
+    def _grow(self, needed):
+        capacity = len(self._popularity)
+        if needed <= capacity:
+            return
+        capacity = max(needed, capacity * 2)
+        for name in ("_popularity", "_year", "_type", "_alive"):
+            column = getattr(self, name)
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            setattr(self, name, grown)
+
+    def append(self, albums, type_code=0, alive=True):
+        # Returns the row indices of the new rows
+        start = self.size
+        self._grow(start + len(albums))
+        for i, (album_id, name, popularity, year) in enumerate(albums, start):
+            self.ids.append(album_id)
+            self.names.append(name)
+            self._popularity[i] = popularity or 0
+            self._year[i] = int(year) if str(year).isdigit() else 0
+        self.size = start + len(albums)
+        self._type[start:self.size] = type_code
+        self._alive[start:self.size] = alive
+        return np.arange(start, self.size)
+
+    def kill(self, rows):
+        self._alive[:self.size][rows] = False
+
+    def row(self, i):
+        year = int(self._year[i])
+        return self.ids[i], self.names[i], int(self._popularity[i]), str(year) if year else UNKNOWN_YEAR
+
+    def rows(self, indices):
+        return [self.row(i) for i in indices]
+
+    def name_mask(self, predicate, start=0):
+        # predicate(name) for every row from start on, as a bool array
+        return np.fromiter((predicate(name) for name in self.names[start:self.size]), dtype=bool,
+                           count=self.size - start)
+
+
+class AlbumView:
+    # A list-like selection of AlbumTable rows: indexing and iterating give (id, name, popularity, year)
+    # tuples, deleting an item just masks it.
+
+    def __init__(self, table, rows=()):
+        self.table = table
+        self._rows = np.asarray(rows, dtype=np.intp)
+        self._visible = np.ones(len(self._rows), dtype=bool)
+        self._index = None
+
+    def index(self):
+        # Table row index of every visible item
+        if self._index is None:
+            self._index = self._rows[self._visible]
+        return self._index
+
+    def __len__(self):
+        return len(self.index())
+
+    def __getitem__(self, i):
+        return self.table.row(self.index()[i])
+
+    def __iter__(self):
+        return iter(self.table.rows(self.index()))
+
+    def __delitem__(self, i):
+        self._visible[np.flatnonzero(self._visible)[i]] = False
+        self._index = None
+
+    def extend(self, rows):
+        rows = np.asarray(rows, dtype=np.intp)
+        self._rows = np.concatenate([self._rows, rows])
+        self._visible = np.concatenate([self._visible, np.ones(len(rows), dtype=bool)])
+        self._index = None
+
+    def same_rows(self, other):
+        return np.array_equal(self.index(), other.index())
+
+    def top(self, n=None, descending=True):
+        # The n most (or least) popular items as tuples, in order
+        index = self.index()
+        return self.table.rows(index[top_indices(self.table.popularity[index], n, descending)])
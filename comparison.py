@@ -0,0 +1,184 @@
+import queue
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from analyzer_core import NULL_TASK, AnalyzerCore, QuietTask, VariantGroups
+from catalog import ArtistCatalog
+from columnar import load
+
+# Several artists side by side: popularity distribution of their releases and their top albums.
+# Every compared artist has its own ArtistCatalog for as long as it stays in the comparison, so adding
+# an artist only loads that one and a settings change only loads release types that are new.
+# Missing discographies are loaded concurrently, one paging run per artist, through SharedAlbums: the
+# album lookups of all artists go into one table, so a release that is in several discographies
+# (splits, collaborations, compilations) is requested once, even while both artists are still loading.
+
+MAX_ARTISTS = 12
+TOP_ALBUMS = 10  # albums per artist in the top albums overlay
+WORKERS = 4  # artists loaded at the same time
+POLL_S = 0.1
+ALBUM_FIELDS = ("id", "popularity", "release_date")  # all analyzer_core.album_row reads from an album object
+
+
+class SharedAlbums:
+    # Wraps the client for the comparison: albums() answers from the shared table, waits for IDs another
+    # worker is loading and only requests the rest. Everything else goes straight to the client.
+    # The table lives as long as the comparison, so it only keeps the ALBUM_FIELDS of every album (the
+    # comparison loads only hydrate releases) instead of the full objects with their tracklists.
+    def __init__(self, sp):
+        self.sp = sp
+        self.requested = 0  # album IDs that were looked up
+        self.shared = 0  # ... that another artist had looked up already (or was looking up)
+        self._lock = threading.Lock()
+        self._albums = {}
+        self._loading = {}  # album ID -> Event set once its lookup is over
+
+    def __getattr__(self, name):
+        return getattr(self.sp, name)
+
+    def _keep(self, fetched):
+        self._albums.update((album_id, {field: album.get(field) for field in ALBUM_FIELDS})
+                            for album_id, album in fetched if album)
+
+    def albums(self, albums, market=None):
+        if market:
+            return self.sp.albums(albums, market=market)
+        ids = list(albums)
+        with self._lock:
+            mine = [album_id for album_id in dict.fromkeys(ids)
+                    if album_id not in self._albums and album_id not in self._loading]
+            waits = {self._loading[album_id] for album_id in ids if album_id in self._loading}
+            for album_id in mine:
+                self._loading[album_id] = threading.Event()
+            self.requested += len(mine)
+            self.shared += len(ids) - len(mine)
+        try:
+            fetched = self.sp.albums(mine)["albums"] if mine else []
+        finally:
+            with self._lock:
+                if mine:
+                    self._keep(zip(mine, fetched or ()))
+                for album_id in mine:
+                    self._loading.pop(album_id).set()
+        for event in waits:
+            event.wait()
+        # The lookup failed for the other worker: asked again like any other lookup
+        with self._lock:
+            retry = [album_id for album_id in dict.fromkeys(ids)
+                     if album_id not in self._albums and album_id not in mine]
+        if retry:
+            fetched = self.sp.albums(retry)["albums"]
+            with self._lock:
+                self._keep(zip(retry, fetched))
+        with self._lock:
+            return {"albums": [self._albums.get(album_id) for album_id in ids]}
+
+
+class Comparison:
+    def __init__(self, max_artists=MAX_ARTISTS):
+        self.max_artists = max_artists
+        self.artists = OrderedDict()  # artist ID -> {"name", "catalog"}
+        self._shared = None
+
+    def __len__(self):
+        return len(self.artists)
+
+    def __contains__(self, artist_id):
+        return artist_id in self.artists
+
+    def add(self, artist_id, name, catalog=None):
+        # catalog can bring what's loaded already (e.g. a copy of the main window's catalog).
+        # Returns False when the artist is compared already or the comparison is full.
+        if artist_id in self.artists or len(self.artists) >= self.max_artists:
+            return False
+        self.artists[artist_id] = {"name": name, "catalog": catalog or ArtistCatalog(artist_id)}
+        return True
+
+    def remove(self, artist_id):
+        self.artists.pop(artist_id, None)
+
+    def reset(self):
+        # Forgets the loaded discographies (another market), the artists stay
+        for entry in self.artists.values():
+            entry["catalog"] = ArtistCatalog(entry["catalog"].artist_id)
+
+    def name(self, artist_id):
+        return self.artists[artist_id]["name"]
+
+    def catalog(self, artist_id):
+        return self.artists[artist_id]["catalog"]
+
+    def start(self, release_types, skip=()):
+        # {artist ID: release types to load} for every artist that misses some of them (except the ones in
+        # skip, e.g. still loading); their leftovers from an earlier (cancelled) load are dropped
+        pending = {}
+        for artist_id, entry in self.artists.items():
+            missing = [] if artist_id in skip else entry["catalog"].missing_types(release_types)
+            if missing:
+                entry["catalog"].start(missing)
+                pending[artist_id] = missing
+        return pending
+
+    def core(self, live_core):
+        # An AnalyzerCore for the loads: the live client behind SharedAlbums, kept across loads so an artist
+        # added later finds the albums of the others. Sync transport, the artists run in parallel instead.
+        if self._shared is None or self._shared.sp is not live_core.sp:
+            self._shared = SharedAlbums(live_core.sp)
+        return AnalyzerCore(self._shared, concurrency=live_core.concurrency)
+
+    def distributions(self, release_types, keyword_filter, top=TOP_ALBUMS):
+        # [(artist ID, name, popularity array, top albums as (id, name, popularity, year))] in comparison order
+        result = []
+        for artist_id, entry in self.artists.items():
+            view = entry["catalog"].albums(release_types, keyword_filter)
+            result.append((artist_id, entry["name"], view.table.popularity[view.index()], view.top(top)))
+        return result
+
+
+def summary(popularity):
+    # Releases, median, quartiles and maximum of one artist's popularity array (None without releases)
+    np = load()
+    if not len(popularity):
+        return None
+    p25, median, p75 = np.percentile(popularity, [25, 50, 75])
+    return {"releases": int(len(popularity)), "median": float(median), "p25": float(p25), "p75": float(p75),
+            "max": int(popularity.max())}
+
+
+def iter_catalogs(core, wanted, task=NULL_TASK, market=None, workers=WORKERS):
+    # Loads {artist ID: release types} concurrently, up to `workers` artists at a time. Yields
+    # (artist ID, by_type, None) for every hydrated batch (see AnalyzerCore.iter_catalog) and
+    # (artist ID, None, result) once an artist is done, result being {"stats", "variants"} or the exception.
+    events = queue.Queue()
+    quiet = QuietTask(task)
+
+    def load_artist(artist_id, release_types):
+        stats = {}
+        variants = VariantGroups()
+        try:
+            for by_type in core.iter_catalog(artist_id, release_types, quiet, stats, variants, market):
+                events.put((artist_id, by_type, None))
+            events.put((artist_id, None, {"stats": stats, "variants": variants}))
+        except Exception as e:
+            events.put((artist_id, None, e))
+
+    pool = ThreadPoolExecutor(max_workers=max(1, min(workers, len(wanted))), thread_name_prefix="compare")
+    try:
+        for artist_id, release_types in wanted.items():
+            pool.submit(load_artist, artist_id, release_types)
+        finished = 0
+        while finished < len(wanted):
+            try:
+                event = events.get(timeout=POLL_S)
+            except queue.Empty:
+                task.check()
+                continue
+            # A cancelled task makes the workers fail, those aren't results
+            task.check()
+            if event[1] is None:
+                finished += 1
+                task.progress(finished, len(wanted), f"Comparing artists... {finished}/{len(wanted)} loaded")
+            yield event
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+import argparse
+import heapq
+import json
+import os
+import sys
+import threading
+import time
+
+import history
+from analyzer_core import AnalyzerCore, DEFAULT_SETTINGS, VariantGroups, make_client, sort_albums
+from auth_handler import load_credentials
+from background import TaskCancelled
+from batch_cli import read_queries
+from credential_pool import CredentialPool, retry_after
+
+# Scheduled crawl of a watchlist of artists.
+# Every artist gets the same treatment as in the GUI (the discography like fetch_albums, the tracklists like
+# on_select_album) and the popularity numbers go to the popularity history (history.py).
+#
+#   python crawler.py watchlist.txt                     # every artist not crawled in the last 20 hours
+#   python crawler.py watchlist.txt --order popular --rate 5 --burst 20 --workers 2 --track-albums 10
+#
+# Artists are taken from a priority queue: "stale" crawls the ones that were crawled longest ago first,
+# "popular" the most popular ones (as of their last crawl) first; artists that were never crawled come first
+# either way. Requests that actually go to Spotify (cache hits are free) take a token from a token bucket
+# of the credential, a 429 empties the bucket for Retry-After seconds for every worker.
+# With a credential pool there is one bucket with the budget of all the keys: the pool hands every call to
+# the least-loaded key, so the calls are spread evenly anyway, and it moves a throttled call to another key
+# itself. A 429 only gets to the bucket once every key was throttled, so that pause is right for all workers.
+# The state file is rewritten after every artist, so a crash, Ctrl+C or a 429 storm only loses the artists
+# that were in progress; the next run picks up the ones that are still due.
+
+STATE_FILE = ".spotify_crawl.json"
+MAX_RETRIES = 6  # attempts per request when Spotify keeps answering 429 (spotipy no longer retries them)
+
+
+class TokenBucket:
+    # rate tokens per second, up to burst tokens saved up. Thread-safe, take() blocks until a token is there.
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.taken = 0
+        self.throttled = 0
+        self.waited = 0.0  # seconds spent waiting for tokens, all threads together
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        if now > self._paused_until:
+            start = max(self._updated, self._paused_until)
+            self.tokens = min(self.burst, self.tokens + (now - start) * self.rate)
+        self._updated = now
+
+    def take(self, stop=None):
+        started = time.monotonic()
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    self.taken += 1
+                    self.waited += now - started
+                    return
+                delay = max(self._paused_until - now, (1 - self.tokens) / self.rate)
+            if stop is not None and stop.wait(delay):
+                raise TaskCancelled()
+            if stop is None:
+                time.sleep(delay)
+
+    def pause(self, seconds):
+        # Spotify said 429: nobody gets a token for `seconds`, and the bucket starts empty after that
+        with self._lock:
+            self.throttled += 1
+            self.tokens = 0
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+class BudgetedSpotify:
+    # Wraps spotipy.Spotify: every API call takes a token from the bucket first and a 429 pauses the bucket
+    # for its Retry-After and retries the call. Goes under CachedSpotify (make_client's wrap, with retry_429
+    # off so spotipy doesn't retry the 429s on its own first), so cache hits cost nothing.
+    def __init__(self, sp, bucket, stop=None):
+        self._sp = sp
+        self.bucket = bucket
+        self.stop = stop
+
+    def __getattr__(self, name):
+        attr = getattr(self._sp, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            for attempt in range(MAX_RETRIES):
+                self.bucket.take(self.stop)
+                try:
+                    return attr(*args, **kwargs)
+                except Exception as e:
+                    if getattr(e, "http_status", None) != 429 or attempt == MAX_RETRIES - 1:
+                        raise
+                    self.bucket.pause(retry_after(e))
+
+        return call
+
+
+class CrawlTask:
+    # Cancellation for AnalyzerCore calls, set by Ctrl+C
+    def __init__(self, stop):
+        self.stop = stop
+
+    def check(self):
+        if self.stop.is_set():
+            raise TaskCancelled()
+
+    def progress(self, done, total=None, text=None):
+        self.check()
+
+
+class CrawlState:
+    # The checkpoint file: {"artists": {query: {"artist_id", "name", "popularity", "crawled", "error"}}}
+    def __init__(self, path=STATE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path, encoding="utf-8") as f:
+                self.artists = json.load(f).get("artists", {})
+        except (OSError, ValueError):
+            self.artists = {}
+
+    def get(self, query):
+        return self.artists.get(query, {})
+
+    def update(self, query, **fields):
+        with self._lock:
+            self.artists.setdefault(query, {}).update(fields)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"artists": self.artists}, f, ensure_ascii=False, indent=1)
+            os.replace(tmp_path, self.path)
+
+
+def priority(entry, order):
+    # Smaller comes first. Never crawled (or failed before the artist was known) goes first in both orders.
+    if not entry.get("crawled"):
+        return (0, 0)
+    if order == "popular":
+        return (1, -entry.get("popularity", 0))
+    return (1, entry["crawled"])
+
+
+class Crawler:
+    def __init__(self, core, state, store, settings, bucket, order="stale", max_age_hours=20, track_albums="All",
+                 stop=None):
+        self.core = core
+        self.state = state
+        self.store = store
+        self.settings = settings
+        self.bucket = bucket
+        self.order = order
+        self.max_age = max_age_hours * 3600
+        self.track_albums = track_albums
+        self.stop = stop or threading.Event()
+        self.task = CrawlTask(self.stop)
+        self._queue = []
+        self._lock = threading.Lock()
+        self.stats = {"artists": 0, "failed": 0, "releases": 0, "tracks": 0}
+
+    def schedule(self, queries, now=None):
+        # Queues the artists that are due, returns how many
+        now = time.time() if now is None else now
+        for position, query in enumerate(dict.fromkeys(queries)):
+            entry = self.state.get(query)
+            if entry.get("crawled") and not entry.get("error") and now - entry["crawled"] < self.max_age:
+                continue
+            heapq.heappush(self._queue, (priority(entry, self.order), position, query))
+        return len(self._queue)
+
+    def _next(self):
+        with self._lock:
+            return heapq.heappop(self._queue)[2] if self._queue and not self.stop.is_set() else None
+
+    def crawl_artist(self, query):
+        # One artist, the way the GUI loads it: the discography page by page, then every tracklist
+        entry = self.state.get(query)
+        artist = self.core.resolve_artist(entry.get("artist_id") or query)
+        if not artist:
+            raise LookupError(f"No artist found for '{query}'")
+        albums = []
+        variants = VariantGroups() if self.settings.get("collapse_variants", True) else None
+        for by_type in self.core.iter_catalog(artist["id"], self.settings["types"], self.task, None, variants,
+                                              self.settings.get("market") or None):
+            for rows in by_type.values():
+                albums.extend(rows)
+        # Popularities the API cache served are recorded under the day they were fetched
+        self.store.record(artist["id"], artist["name"], history.ALBUM,
+                          [(alb_id, alb_name, alb_pop) for alb_id, alb_name, alb_pop, alb_year in albums],
+                          fetched=self.core.fetched_at("album", [album[0] for album in albums]))
+
+        picked = sort_albums(albums, {"albums_to_export": self.track_albums, "sort_order": "Descending"})
+        tracks = []
+        for album, album_tracks, error in self.core.iter_albums_tracks(picked, None, self.task):
+            if error:
+                raise error
+            tracks.extend((t["id"], t["name"], t["popularity"]) for t in album_tracks)
+        self.store.record(artist["id"], artist["name"], history.TRACK, tracks,
+                          fetched=self.core.fetched_at("track", [track[0] for track in tracks]))
+        return artist, len(albums), len(tracks)
+
+    def _worker(self, report):
+        while True:
+            query = self._next()
+            if query is None:
+                return
+            try:
+                artist, releases, tracks = self.crawl_artist(query)
+            except TaskCancelled:
+                return
+            except Exception as e:
+                with self._lock:
+                    self.stats["failed"] += 1
+                self.state.update(query, error=str(e), attempted=time.time())
+                report(query, f"failed: {e}")
+                continue
+            self.state.update(query, artist_id=artist["id"], name=artist["name"],
+                              popularity=artist.get("popularity", 0), crawled=time.time(), error=None)
+            with self._lock:
+                self.stats["artists"] += 1
+                self.stats["releases"] += releases
+                self.stats["tracks"] += tracks
+            report(query, f"{releases} releases, {tracks} tracks")
+
+    def run(self, workers=1, report=None):
+        # Crawls everything that was scheduled, returns the run stats
+        report = report or (lambda text: None)
+        total = len(self._queue)
+        done = [0]
+        lock = threading.Lock()
+
+        def counted(query, text):
+            with lock:
+                done[0] += 1
+                report(f"[{done[0]}/{total}] {query}: {text}")
+
+        started = time.perf_counter()
+        calls_before = self.bucket.taken
+        threads = [threading.Thread(target=self._worker, args=(counted,), name=f"crawler-{i}", daemon=True)
+                   for i in range(max(1, workers))]
+        for thread in threads:
+            thread.start()
+        try:
+            # join() with a timeout so Ctrl+C gets through on every platform
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(0.5)
+        except KeyboardInterrupt:
+            self.stop.set()
+            for thread in threads:
+                thread.join()
+        elapsed = time.perf_counter() - started
+        calls = self.bucket.taken - calls_before
+        crawled = self.stats["artists"]
+        return dict(self.stats,
+                    pending=total - done[0],
+                    interrupted=self.stop.is_set(),
+                    elapsed_s=round(elapsed, 1),
+                    artists_per_min=round(crawled / elapsed * 60, 2) if elapsed else 0.0,
+                    api_calls=calls,
+                    calls_per_artist=round(calls / crawled, 1) if crawled else 0.0,
+                    throttled=self.bucket.throttled,
+                    waited_s=round(self.bucket.waited, 1))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Crawl a watchlist of artists into the popularity history")
+    parser.add_argument("input", help="watchlist file with one artist name, ID, URI or URL per line")
+    parser.add_argument("--order", choices=["stale", "popular"], default="stale",
+                        help="crawl the longest-not-crawled or the most popular artists first")
+    parser.add_argument("--max-age", type=float, default=20, help="hours before an artist is crawled again")
+    parser.add_argument("--rate", type=float, default=5, help="requests per second allowed for each credential")
+    parser.add_argument("--burst", type=int, default=20,
+                        help="requests per credential that may be sent at once after a pause")
+    parser.add_argument("--workers", type=int, default=2, help="artists crawled at the same time")
+    parser.add_argument("--concurrency", type=int, default=4, help="tracklists loaded at the same time per artist")
+    parser.add_argument("--types", default=",".join(DEFAULT_SETTINGS["types"]),
+                        help="release types to crawl, e.g. album,single,compilation")
+    parser.add_argument("--track-albums", default="All",
+                        help="load the tracks of this many of the most popular releases per artist, or All")
+    parser.add_argument("--state", default=STATE_FILE, help="checkpoint file of the crawl")
+    parser.add_argument("--history", default=history.HISTORY_FILE, help="popularity history file")
+    parser.add_argument("--market", default="", help="only releases available in this country, e.g. US")
+    parser.add_argument("--keep-variants", action="store_true", help="don't collapse duplicate editions")
+    parser.add_argument("--no-cache", action="store_true", help="don't use the on-disk API cache")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    creds = load_credentials()
+    if not creds:
+        sys.exit("No Spotify credentials: run the GUI once or set SPOTIPY_CLIENT_ID / SPOTIPY_CLIENT_SECRET")
+
+    # Every credential of the pool brings its own rate limit, so the budget grows with them
+    keys = 1 + len([c for c in creds.get("pool", ()) if c["client_id"] != creds["client_id"]])
+    bucket = TokenBucket(args.rate * keys, args.burst * keys)
+    stop = threading.Event()
+    sp, auth_manager, _ = make_client(creds["client_id"], creds["client_secret"], use_cache=not args.no_cache,
+                                      wrap=lambda client: BudgetedSpotify(client, bucket, stop),
+                                      pool=creds.get("pool"), retry_429=False)
+    # The budget is enforced on the spotipy client, so the crawl always uses the synchronous transport
+    core = AnalyzerCore(sp, concurrency=args.concurrency)
+    store = history.HistoryStore(args.history)
+    settings = {"types": [t for t in args.types.split(",") if t], "market": args.market.upper(),
+                "collapse_variants": not args.keep_variants}
+    crawler = Crawler(core, CrawlState(args.state), store, settings, bucket, args.order, args.max_age,
+                      args.track_albums, stop)
+
+    queued = crawler.schedule(read_queries(args.input))
+    print(f"{queued} artists due", file=sys.stderr)
+    stats = crawler.run(args.workers, lambda text: print(text, file=sys.stderr))
+    store.close()
+    if stats["interrupted"]:
+        print("Interrupted, the remaining artists are crawled on the next run.", file=sys.stderr)
+    print(f"Crawled {stats['artists']} artists ({stats['failed']} failed, {stats['pending']} left) "
+          f"in {stats['elapsed_s']} s: {stats['artists_per_min']} artists/min, "
+          f"{stats['calls_per_artist']} API calls per artist, {stats['throttled']} times throttled, "
+          f"{stats['waited_s']} s waiting for the budget", file=sys.stderr)
+    if isinstance(auth_manager, CredentialPool):
+        for key in auth_manager.stats():
+            print(f"  {key['client_id']}: {key['calls']} calls, {key['calls_per_s']}/s, "
+                  f"{key['throttled']} throttled, {key['errors']} errors", file=sys.stderr)
+    auth_manager.stop()
+    return 1 if stats["failed"] and not stats["artists"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
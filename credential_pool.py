@@ -0,0 +1,152 @@
+import threading
+import time
+
+# Spreading the traffic over several Spotify API applications.
+# Spotify rate-limits per application, so with one client ID every request shares one budget and a 429
+# stalls all of them. A CredentialPool holds one spotipy client (with its own auth_handler.TokenSession)
+# per credential. PooledSpotify sends every call through the least-loaded key that isn't cooling down;
+# a 429 takes that key out of rotation for its Retry-After and the call is retried on another one.
+# async_client.AsyncSpotify does the same per request when it's given the pool.
+# Per-key counters show whether the load is really spread.
+
+DEFAULT_RETRY_AFTER = 1  # seconds a key rests after a 429 without a Retry-After header
+
+
+def retry_after(error, default=DEFAULT_RETRY_AFTER):
+    # Seconds to wait after a 429, from the Retry-After header of the response the error came with
+    headers = getattr(error, "headers", None) or {}
+    try:
+        return max(0.0, float(headers.get("Retry-After", default)))
+    except (TypeError, ValueError):
+        return default
+
+
+def mask(client_id):
+    return f"{client_id[:6]}…" if len(client_id) > 8 else client_id
+
+
+class _Key:
+    def __init__(self, client_id, sp, session):
+        self.client_id = client_id
+        self.sp = sp
+        self.session = session
+        self.in_flight = 0
+        self.calls = 0
+        self.errors = 0
+        self.throttled = 0
+        self.busy_s = 0.0
+        self.cooling_until = 0.0
+
+
+class CredentialPool:
+    # keys: [(client_id, spotipy client, auth_handler.TokenSession)]. Also works as the auth_manager
+    # make_client returns: get_access_token hands out the token of the key that would be picked next.
+    def __init__(self, keys):
+        self.keys = [_Key(*key) for key in keys]
+        self.started = time.monotonic()
+        self._cond = threading.Condition()
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _pick(self, now):
+        ready = [key for key in self.keys if key.cooling_until <= now]
+        if not ready:
+            return None
+        return min(ready, key=lambda key: (key.in_flight, key.calls))
+
+    def _take(self, now):
+        key = self._pick(now)
+        if key is not None:
+            key.in_flight += 1
+            key.calls += 1
+        return key
+
+    def acquire(self):
+        # The least-loaded key that isn't cooling down; waits for the first one to come back otherwise
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                key = self._take(now)
+                if key is not None:
+                    return key
+                self._cond.wait(min(k.cooling_until for k in self.keys) - now)
+
+    def try_acquire(self):
+        # acquire() for the event loop, which mustn't block: (key, 0) or (None, seconds until a key is back)
+        with self._cond:
+            now = time.monotonic()
+            key = self._take(now)
+            if key is not None:
+                return key, 0.0
+            return None, min(k.cooling_until for k in self.keys) - now
+
+    def release(self, key, seconds, status=200):
+        with self._cond:
+            key.in_flight -= 1
+            key.busy_s += seconds
+            if status == 429:
+                key.throttled += 1
+            elif status >= 400:
+                key.errors += 1
+            self._cond.notify()
+
+    def cool_down(self, key, seconds):
+        with self._cond:
+            key.cooling_until = max(key.cooling_until, time.monotonic() + seconds)
+
+    def get_access_token(self, as_dict=True, check_cache=True):
+        # Only for callers that check the credentials; requests take a key (and its token) with acquire()
+        with self._cond:
+            key = self._pick(time.monotonic()) or min(self.keys, key=lambda key: key.cooling_until)
+        return key.session.get_access_token(as_dict=as_dict)
+
+    def stop(self):
+        for key in self.keys:
+            key.session.stop()
+
+    def stats(self):
+        # One dict per key, JSON-serializable
+        now = time.monotonic()
+        elapsed = max(now - self.started, 1e-9)
+        with self._cond:
+            return [{
+                "client_id": mask(key.client_id),
+                "calls": key.calls,
+                "errors": key.errors,
+                "throttled": key.throttled,
+                "in_flight": key.in_flight,
+                "calls_per_s": round(key.calls / elapsed, 2),
+                "busy_s": round(key.busy_s, 1),
+                "cooling_s": round(max(0.0, key.cooling_until - now), 1),
+            } for key in self.keys]
+
+
+class PooledSpotify:
+    # Stands in for spotipy.Spotify in front of a CredentialPool
+    def __init__(self, pool):
+        self.pool = pool
+
+    def __getattr__(self, name):
+        attr = getattr(self.pool.keys[0].sp, name)
+        if not callable(attr) or name.startswith("_"):
+            return attr
+
+        def call(*args, **kwargs):
+            # Every key gets two chances before a 429 reaches the caller
+            attempts = 2 * len(self.pool)
+            for attempt in range(attempts):
+                key = self.pool.acquire()
+                started = time.perf_counter()
+                status = 200
+                try:
+                    return getattr(key.sp, name)(*args, **kwargs)
+                except Exception as e:
+                    status = getattr(e, "http_status", None) or 599
+                    if status != 429 or attempt == attempts - 1:
+                        raise
+                    self.pool.cool_down(key, retry_after(e))
+                finally:
+                    self.pool.release(key, time.perf_counter() - started, status)
+
+        return call
@@ -0,0 +1,218 @@
+import json
+import math
+import threading
+import time
+from collections import deque
+
+# Per-endpoint instrumentation of the requests that go to Spotify.
+# InstrumentedSpotify wraps the spotipy client under the response cache (make_client's wrap), so it only
+# sees real network calls; async_client records into the same ApiStats. For every endpoint it keeps
+# calls, errors, 429s, bytes and the most recent latencies (for p50/p95/p99). Cache hits and misses come
+# from the response cache itself.
+#
+# async_client records the size of the body it got. spotipy doesn't expose the raw response, so for
+# InstrumentedSpotify bytes are the size of the decoded JSON, which is close to the uncompressed body size;
+# serializing every response again costs about as much as parsing it, so only one in SIZE_SAMPLE per
+# endpoint is measured and the others count as the average of the measured ones.
+# 429s that spotipy retries on its own (or PooledSpotify moves to another key) never reach
+# InstrumentedSpotify: only async 429s and the ones a call finally failed with are counted.
+
+LATENCY_SAMPLES = 2048  # latencies kept per endpoint for the percentiles
+SIZE_SAMPLE = 16  # synchronous responses per endpoint of which one is serialized to count its bytes
+
+
+def percentile(sorted_values, p):
+    # Nearest-rank percentile of an already sorted list, None for an empty one
+    if not sorted_values:
+        return None
+    rank = max(1, min(len(sorted_values), math.ceil(p / 100 * len(sorted_values))))
+    return sorted_values[rank - 1]
+
+
+def endpoint_for_path(path):
+    # Endpoint name of an API path like "albums/{id}/tracks", the same names InstrumentedSpotify uses
+    parts = [p for p in path.split("?")[0].strip("/").split("/") if p]
+    if parts and parts[0] == "v1":
+        parts = parts[1:]
+    if len(parts) == 1:
+        return parts[0].replace("-", "_")
+    if len(parts) == 2:
+        return parts[0][:-1]  # "artists/{id}" -> "artist"
+    if len(parts) == 3:
+        return f"{parts[0][:-1]}_{parts[2]}"  # "artists/{id}/albums" -> "artist_albums"
+    return path
+
+
+class _Endpoint:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.throttled = 0
+        self.bytes = 0
+        self.total_s = 0.0
+        self.shared = 0  # callers that got the result of an identical request in flight (singleflight.py)
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+
+
+class ApiStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+        self.started = time.time()
+
+    def record(self, endpoint, seconds, size=0, status=200):
+        with self._lock:
+            stats = self._endpoints.get(endpoint)
+            if stats is None:
+                stats = self._endpoints[endpoint] = _Endpoint()
+            stats.calls += 1
+            stats.bytes += size
+            stats.total_s += seconds
+            stats.latencies.append(seconds)
+            if status == 429:
+                stats.throttled += 1
+            elif status >= 400:
+                stats.errors += 1
+
+    def record_shared(self, endpoint):
+        with self._lock:
+            stats = self._endpoints.get(endpoint)
+            if stats is None:
+                stats = self._endpoints[endpoint] = _Endpoint()
+            stats.shared += 1
+
+    def reset(self):
+        with self._lock:
+            self._endpoints = {}
+            self.started = time.time()
+
+    def mark(self, cache=None):
+        # Counters to measure one operation against: summary(since=mark) only counts what happened after it
+        with self._lock:
+            counters = {name: (s.calls, s.errors, s.throttled, s.bytes, s.total_s, s.shared)
+                        for name, s in self._endpoints.items()}
+        return {"endpoints": counters, "cache": _cache_counters(cache)}
+
+    def snapshot(self, cache=None, since=None):
+        # {"endpoints": {name: {...}}, "total": {...}, "cache": {...} or None}, JSON-serializable
+        before = (since or {}).get("endpoints", {})
+        endpoints = {}
+        all_latencies = []
+        with self._lock:
+            for name, s in sorted(self._endpoints.items()):
+                calls0, errors0, throttled0, bytes0, total0, shared0 = before.get(name, (0, 0, 0, 0, 0.0, 0))
+                calls = s.calls - calls0
+                shared = s.shared - shared0
+                if not calls and not shared:
+                    continue
+                # The newest `calls` samples belong to the period (as far as they were kept)
+                latencies = sorted(list(s.latencies)[-calls:]) if calls else []
+                all_latencies.extend(latencies)
+                endpoints[name] = _summary(calls, s.errors - errors0, s.throttled - throttled0, s.bytes - bytes0,
+                                           s.total_s - total0, latencies, shared)
+        all_latencies.sort()
+        total = _summary(sum(e["calls"] for e in endpoints.values()),
+                         sum(e["errors"] for e in endpoints.values()),
+                         sum(e["throttled"] for e in endpoints.values()),
+                         sum(e["bytes"] for e in endpoints.values()),
+                         sum(e["total_ms"] for e in endpoints.values()) / 1000, all_latencies,
+                         sum(e["shared"] for e in endpoints.values()))
+        result = {"since": self.started, "endpoints": endpoints, "total": total, "cache": None}
+        counters = _cache_counters(cache)
+        if counters:
+            hits, misses = counters
+            if since and since.get("cache"):
+                hits, misses = hits - since["cache"][0], misses - since["cache"][1]
+            lookups = hits + misses
+            result["cache"] = {"hits": hits, "misses": misses,
+                               "hit_ratio": round(hits / lookups, 3) if lookups else None}
+        return result
+
+    def summary(self, label, cache=None, since=None):
+        # One log line, e.g. "fetch_albums: 43 API calls (albums 40, artist_albums 3), 1.2 MB, ..."
+        snap = self.snapshot(cache, since)
+        total = snap["total"]
+        if not total["calls"]:
+            text = f"{label}: no API calls"
+        else:
+            by_endpoint = ", ".join(f"{name} {e['calls']}" for name, e in
+                                    sorted(snap["endpoints"].items(), key=lambda item: -item[1]["calls"]))
+            text = (f"{label}: {total['calls']} API calls ({by_endpoint}), {total['bytes'] / 2 ** 20:.1f} MB, "
+                    f"p50/p95/p99 {total['p50_ms']}/{total['p95_ms']}/{total['p99_ms']} ms, "
+                    f"{total['errors']} errors, {total['throttled']} throttled, {total['shared']} shared")
+        if snap["cache"]:
+            ratio = snap["cache"]["hit_ratio"]
+            text += f", cache hit ratio {'n/a' if ratio is None else f'{ratio:.0%}'}"
+        return text
+
+    def export(self, path, cache=None):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(dict(self.snapshot(cache), exported=time.time()), f, indent=2)
+
+
+def _summary(calls, errors, throttled, size, total_s, sorted_latencies, shared=0):
+    def ms(value):
+        return None if value is None else round(value * 1000, 1)
+
+    return {
+        "calls": calls,
+        "errors": errors,
+        "throttled": throttled,
+        "bytes": size,
+        "shared": shared,
+        "total_ms": ms(total_s),
+        "p50_ms": ms(percentile(sorted_latencies, 50)),
+        "p95_ms": ms(percentile(sorted_latencies, 95)),
+        "p99_ms": ms(percentile(sorted_latencies, 99)),
+    }
+
+
+def _cache_counters(cache):
+    if not cache:
+        return None
+    return cache.hits, cache.misses
+
+
+def _json_size(value):
+    try:
+        return len(json.dumps(value, separators=(",", ":")))
+    except (TypeError, ValueError):
+        return 0
+
+
+class InstrumentedSpotify:
+    # Wraps spotipy.Spotify, every API method call is timed and recorded under the method's name
+    def __init__(self, sp, stats):
+        self._sp = sp
+        self.stats = stats
+        self._sizes = {}  # method name -> [responses, measured responses, their bytes]
+        self._lock = threading.Lock()
+
+    def _size(self, name, result):
+        with self._lock:
+            sizes = self._sizes.setdefault(name, [0, 0, 0])
+            sizes[0] += 1
+            if (sizes[0] - 1) % SIZE_SAMPLE:
+                return sizes[2] // sizes[1] if sizes[1] else 0
+        size = _json_size(result)
+        with self._lock:
+            sizes[1] += 1
+            sizes[2] += size
+        return size
+
+    def __getattr__(self, name):
+        attr = getattr(self._sp, name)
+        if not callable(attr) or name.startswith("_"):
+            return attr
+
+        def call(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                result = attr(*args, **kwargs)
+            except Exception as e:
+                self.stats.record(name, time.perf_counter() - started, 0, getattr(e, "http_status", None) or 599)
+                raise
+            self.stats.record(name, time.perf_counter() - started, self._size(name, result))
+            return result
+
+        return call
@@ -0,0 +1,280 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from analyzer_core import (KeywordFilter, NULL_TASK, export_tracks, format_export_album, format_export_header,
+                           sort_albums)
+from raw_data import ms_to_minsec
+
+# Exports that are written straight to a file while the data comes in.
+#
+# Popularity export:
+# Albums are fetched concurrently (AnalyzerCore.iter_albums_tracks) and every album block is written and
+# flushed as soon as it's done, in export order. After each block a small checkpoint file next to the
+# export records how far it got, so an interrupted export (cancel, crash, network error) continues
+# where it stopped when it's started again for the same file with the same settings.
+
+#
+# Discography export (DiscographyExport): artist, every album and every track with popularity, duration and
+# audio features as NDJSON (one record per line) or as one JSON document, written album chunk by album chunk.
+
+CHECKPOINT_SUFFIX = ".checkpoint"
+DISCOGRAPHY_CHUNK = 20  # albums per chunk, one albums lookup
+
+
+def _encode(text):
+    # The file is written in binary mode (checkpoint offsets are byte offsets), with the platform's line endings
+    # like a text-mode file
+    return text.replace("\n", os.linesep).encode("utf-8")
+
+
+class PopularityExport:
+    def __init__(self, core, artist_id, artist_name, albums, settings, path):
+        self.core = core
+        self.artist_id = artist_id
+        self.artist_name = artist_name
+        self.settings = dict(settings)
+        self.path = path
+        self.checkpoint_path = path + CHECKPOINT_SUFFIX
+        self.albums = sort_albums(albums, settings)
+        # Everything that decides the content of the file; a checkpoint only counts if it matches
+        self.job = {
+            "artist_id": artist_id,
+            "albums": [album[0] for album in self.albums],
+            "filters": sorted(self.settings.get("filters", [])),
+            "tracks_to_export": self.settings.get("tracks_to_export", "3"),
+            "sort_order": self.settings.get("sort_order", "Descending"),
+        }
+
+    def _load_checkpoint(self):
+        try:
+            with open(self.checkpoint_path, encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if state.get("job") != self.job or not os.path.exists(self.path):
+            return None
+        if os.path.getsize(self.path) < state["offset"]:
+            return None
+        return state
+
+    def _save_checkpoint(self, offset, done):
+        tmp_path = self.checkpoint_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"job": self.job, "offset": offset, "done": done}, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def resumable(self):
+        # Number of albums already written by an earlier, unfinished run of the same export (0 if none)
+        state = self._load_checkpoint()
+        return state["done"] if state else 0
+
+    def run(self, task=NULL_TASK, resume=True):
+        # Writes the export and returns {"albums", "resumed", "errors"}. An exception, a cancelled task or
+        # albums that failed to load leave the file and the checkpoint behind for the next run.
+        state = self._load_checkpoint() if resume else None
+        total = len(self.albums)
+        if state:
+            f = open(self.path, "r+b")
+            f.truncate(state["offset"])
+            f.seek(state["offset"])
+            done = state["done"]
+        else:
+            task.progress(0, total, "Exporting popularity...")
+            f = open(self.path, "wb")
+            f.write(_encode(format_export_header(self.artist_name, self.core.artist_genres(self.artist_id))))
+            done = 0
+            self._save_checkpoint(f.tell(), done)
+        resumed = done
+        errors = 0
+        try:
+            keyword_filter = KeywordFilter.from_settings(self.settings)
+            for album, tracks, error in self.core.iter_albums_tracks(self.albums[done:], keyword_filter, task):
+                f.write(_encode(format_export_album(album, export_tracks(tracks, self.settings), error)))
+                f.flush()
+                done += 1
+                errors += error is not None
+                # The checkpoint stops moving at the first failed album, so a rerun retries from there
+                if not errors:
+                    self._save_checkpoint(f.tell(), done)
+                task.progress(done, total, f"Exporting popularity... {done}/{total} albums")
+        finally:
+            f.close()
+        if not errors:
+            os.remove(self.checkpoint_path)
+        return {"albums": done, "resumed": resumed, "errors": errors}
+
+
+class DiscographyExport:
+    # Only a few chunks are in memory at any time: at most `concurrency` are loading ahead while
+    # the oldest one is written. Lookups are batched (20 albums, 50 tracks or 100 audio features per request)
+    # and go through the response cache, so whatever the app already loaded isn't requested again.
+
+    def __init__(self, core, artist_id, albums, path, fmt=None):
+        self.core = core
+        self.artist_id = artist_id
+        self.album_ids = [album[0] for album in albums]
+        self.path = path
+        self.fmt = fmt or ("ndjson" if path.lower().endswith((".ndjson", ".jsonl")) else "json")
+
+    def run(self, task=NULL_TASK):
+        # Returns {"albums", "tracks", "format"}
+        task.progress(0, len(self.album_ids), "Exporting discography...")
+        counts = {"albums": 0, "tracks": 0, "format": self.fmt}
+        with open(self.path, "w", encoding="utf-8") as f:
+            writer = _NdjsonWriter(f) if self.fmt == "ndjson" else _JsonWriter(f)
+            writer.artist(self._artist())
+            for albums in self.iter_albums(task):
+                for album in albums:
+                    writer.album(album)
+                    counts["albums"] += 1
+                    counts["tracks"] += len(album["tracks"])
+                task.progress(counts["albums"], len(self.album_ids),
+                              f"Exporting discography... {counts['albums']}/{len(self.album_ids)} albums")
+            writer.close()
+        return counts
+
+    def _artist(self):
+        try:
+            artist = self.core.sp.artist(self.artist_id)
+        except Exception as e:
+            return {"id": self.artist_id, "error": str(e)}
+        return {
+            "id": artist["id"],
+            "name": artist.get("name"),
+            "genres": artist.get("genres", []),
+            "followers": artist.get("followers", {}).get("total", 0),
+            "popularity": artist.get("popularity"),
+            "spotify_url": artist.get("external_urls", {}).get("spotify", "")
+        }
+
+    def iter_albums(self, task=NULL_TASK):
+        # Album records (with their track records) chunk by chunk, in the order of the album IDs.
+        # Also used by snapshot.py, which stores the same records in its own format.
+        chunks = [self.album_ids[i:i + DISCOGRAPHY_CHUNK] for i in range(0, len(self.album_ids), DISCOGRAPHY_CHUNK)]
+        return self._load_chunks(chunks, task)
+
+    def _load_chunks(self, chunks, task):
+        # Loads chunks on a thread pool, a bounded number ahead, and yields them in order
+        workers = max(1, self.core.concurrency)
+        pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="discography-export")
+        try:
+            pending = []
+            for chunk in chunks:
+                pending.append(pool.submit(self._load_chunk, chunk, task))
+                if len(pending) >= workers:
+                    yield pending.pop(0).result()
+                    task.check()
+            for future in pending:
+                yield future.result()
+                task.check()
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _load_chunk(self, album_ids, task):
+        task.check()
+        sp = self.core.sp
+        albums = []
+        for album_id, (album, error) in zip(album_ids, self.core.lookup_albums(album_ids)):
+            if error:
+                albums.append({"id": album_id, "error": str(error), "tracks": []})
+                continue
+            items = list(album.get("tracks", {}).get("items", []))
+            # Albums with more than 50 tracks come with the first page only
+            while len(items) < album.get("total_tracks", len(items)):
+                task.check()
+                page = sp.album_tracks(album_id, limit=50, offset=len(items))["items"]
+                if not page:
+                    break
+                items.extend(page)
+            albums.append({
+                "id": album_id,
+                "name": album.get("name"),
+                "album_type": album.get("album_type"),
+                "release_date": album.get("release_date"),
+                "total_tracks": album.get("total_tracks"),
+                "popularity": album.get("popularity"),
+                "label": album.get("label"),
+                "spotify_url": album.get("external_urls", {}).get("spotify", ""),
+                "tracks": items
+            })
+
+        track_ids = [t["id"] for album in albums for t in album["tracks"]]
+        full_tracks = dict(zip(track_ids, self.core.lookup_tracks(track_ids)))
+        features = {}
+        try:
+            for start in range(0, len(track_ids), 100):
+                task.check()
+                batch = track_ids[start:start + 100]
+                features.update(zip(batch, sp.audio_features(batch)))
+        except Exception:
+            # audio-features isn't available to every app, the export goes on without it
+            features = {}
+        for album in albums:
+            album["tracks"] = [_track_record(t, full_tracks.get(t["id"]), features.get(t["id"]))
+                               for t in album["tracks"]]
+        return albums
+
+
+def _track_record(track, full, features):
+    full = full or {}
+    duration = full.get("duration_ms", track.get("duration_ms"))
+    record = {
+        "id": track["id"],
+        "name": track.get("name"),
+        "disc_number": track.get("disc_number"),
+        "track_number": track.get("track_number"),
+        "popularity": full.get("popularity"),
+        "duration_ms": duration,
+        "duration": ms_to_minsec(duration) if duration else None,
+        "explicit": track.get("explicit"),
+        "spotify_url": track.get("external_urls", {}).get("spotify", ""),
+        "audio_features": None
+    }
+    if features:
+        record["audio_features"] = {k: v for k, v in features.items()
+                                    if k not in ("id", "uri", "track_href", "analysis_url", "type")}
+    return record
+
+
+class _NdjsonWriter:
+    # {"type": "artist"}, then per album {"type": "album"} followed by its {"type": "track"} lines
+    def __init__(self, f):
+        self.f = f
+
+    def _line(self, record):
+        self.f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def artist(self, artist):
+        self._line(dict(artist, type="artist"))
+
+    def album(self, album):
+        self._line(dict({k: v for k, v in album.items() if k != "tracks"}, type="album"))
+        for track in album["tracks"]:
+            self._line(dict(track, type="track", album_id=album["id"]))
+        self.f.flush()
+
+    def close(self):
+        pass
+
+
+class _JsonWriter:
+    # {"artist": {...}, "albums": [{..., "tracks": [...]}, ...]}, written one album at a time
+    def __init__(self, f):
+        self.f = f
+        self.first = True
+
+    def artist(self, artist):
+        self.f.write('{\n  "artist": ' + _indented(artist) + ',\n  "albums": [')
+
+    def album(self, album):
+        self.f.write(("\n    " if self.first else ",\n    ") + _indented(album, 4))
+        self.first = False
+        self.f.flush()
+
+    def close(self):
+        self.f.write("\n  ]\n}\n" if not self.first else "]\n}\n")
+
+
+def _indented(obj, level=2):
+    return json.dumps(obj, ensure_ascii=False, indent=2).replace("\n", "\n" + " " * level)
@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+import argparse
+import gzip
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.error import HTTPError
+from urllib.parse import parse_qs, urlencode, urlparse
+from urllib.request import Request, urlopen
+
+# Local stand-in for the parts of the Spotify Web API the app uses.
+# It serves a synthetic but deterministic catalog, can add latency to every response and
+# can throttle with 429 + Retry-After, either randomly or when too many requests are in flight.
+#
+# Artist IDs ending in a number get that many releases ("artist500" has 500), anything else gets 25.
+# Every ID is base62 like the real ones (spotipy refuses anything else): album IDs are the artist ID, "A" and
+# the release number, track IDs the album ID, "T" and the track number.
+#
+# Fixtures: responses recorded from the real API can be replayed instead of the synthetic catalog.
+# With --upstream every request that isn't in the fixtures is forwarded there (with the client's
+# Authorization header) and the answer is added to the fixture file when the server stops.
+#
+#   python fake_spotify.py --port 8765 --latency 0.05 --max-in-flight 8
+#   python fake_spotify.py --fixtures real.json.gz --upstream https://api.spotify.com/v1/   # record
+#   python fake_spotify.py --fixtures real.json.gz                                        # replay
+
+ALBUM_TYPES = ["album", "single", "compilation"]
+NAME_SUFFIXES = ["", "", "", " (Live)", " (Remastered)", " (Deluxe Edition)", "", " - Demo"]
+TRACKS_PER_ALBUM = 10
+BASE62_RE = re.compile(r"^[0-9A-Za-z]+$")
+
+
+def _artist_size(artist_id):
+    match = re.search(r"(\d+)$", artist_id)
+    return int(match.group(1)) if match else 25
+
+
+def _popularity(seed):
+    return (sum(ord(c) for c in seed) * 37) % 101
+
+
+def make_artist(artist_id):
+    return {
+        "id": artist_id,
+        "name": f"Artist {artist_id}",
+        "type": "artist",
+        "genres": ["heavy metal", "thrash metal"],
+        "followers": {"href": None, "total": 1000 + _popularity(artist_id) * 997},
+        "popularity": _popularity(artist_id),
+        "external_urls": {"spotify": f"https://open.spotify.com/artist/{artist_id}"},
+    }
+
+
+def _album_index(album_id):
+    artist_id, _, index = album_id.rpartition("A")
+    return artist_id, int(index)
+
+
+def make_simple_album(artist_id, index):
+    album_id = f"{artist_id}A{index}"
+    return {
+        "id": album_id,
+        "name": f"Release {index}{NAME_SUFFIXES[index % len(NAME_SUFFIXES)]}",
+        "album_type": ALBUM_TYPES[index % len(ALBUM_TYPES)],
+        "album_group": ALBUM_TYPES[index % len(ALBUM_TYPES)],
+        "release_date": f"{1980 + index % 45}-0{1 + index % 9}-15",
+        "release_date_precision": "day",
+        "total_tracks": TRACKS_PER_ALBUM,
+        "artists": [{"id": artist_id, "name": f"Artist {artist_id}"}],
+        "external_urls": {"spotify": f"https://open.spotify.com/album/{album_id}"},
+    }
+
+
+def make_simple_track(album_id, number):
+    track_id = f"{album_id}T{number}"
+    return {
+        "id": track_id,
+        "name": f"Track {number}" + (" (Live)" if number == TRACKS_PER_ALBUM - 1 else ""),
+        "track_number": number + 1,
+        "duration_ms": 150000 + (_popularity(track_id) * 1234) % 240000,
+        "external_urls": {"spotify": f"https://open.spotify.com/track/{track_id}"},
+    }
+
+
+@lru_cache(maxsize=16)
+def _discography(artist_id):
+    # Built once per artist, otherwise every page of a 5000-release artist would build all 5000 albums
+    return [make_simple_album(artist_id, i) for i in range(_artist_size(artist_id))]
+
+
+def make_album(album_id):
+    try:
+        artist_id, index = _album_index(album_id)
+    except ValueError:
+        return None
+    if index >= _artist_size(artist_id):
+        return None
+    album = make_simple_album(artist_id, index)
+    album["popularity"] = _popularity(album_id)
+    album["genres"] = []
+    album["tracks"] = {"items": [make_simple_track(album_id, n) for n in range(TRACKS_PER_ALBUM)],
+                       "total": TRACKS_PER_ALBUM}
+    return album
+
+
+def make_track(track_id):
+    album_id, _, number = track_id.rpartition("T")
+    if not number.isdigit() or make_album(album_id) is None:
+        return None
+    track = make_simple_track(album_id, int(number))
+    track["popularity"] = _popularity(track_id)
+    track["album"] = make_simple_album(*_album_index(album_id))
+    return track
+
+
+def make_audio_features(track_id):
+    if make_track(track_id) is None:
+        return None
+    seed = _popularity(track_id)
+    return {"id": track_id, "tempo": 80.0 + seed, "valence": seed / 100, "energy": (100 - seed) / 100}
+
+
+def _page(items, params, default_limit=20):
+    limit = int(params.get("limit", default_limit))
+    offset = int(params.get("offset", 0))
+    return {"items": items[offset:offset + limit], "limit": limit, "offset": offset, "total": len(items),
+            "next": None if offset + limit >= len(items) else "more"}
+
+
+class FakeSpotifyServer:
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, throttle_rate=0.0, max_in_flight=0,
+                 retry_after=1, seed=0, fixtures=None, upstream=None):
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.max_in_flight = max_in_flight
+        self.retry_after = retry_after
+        self.requests = Counter()
+        self.throttled = 0
+        self.bytes_sent = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+        self.fixtures_path = fixtures
+        self.fixtures = load_fixtures(fixtures) if fixtures else {}
+        self.upstream = upstream
+        self.recorded = 0
+        self._thread = None
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+
+    @property
+    def prefix(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1/"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self.recorded:
+            save_fixtures(self.fixtures_path, self.fixtures)
+
+    def reset_stats(self):
+        with self._lock:
+            self.requests.clear()
+            self.throttled = 0
+            self.bytes_sent = 0
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def respond(self, path, params, headers):
+        # (endpoint name, status, body): fixtures first, then the upstream API (recording), then the synthetic catalog
+        endpoint = endpoint_name(_path_parts(path))
+        key = fixture_key(path, params)
+        with self._lock:
+            fixture = self.fixtures.get(key)
+        if fixture:
+            return endpoint, fixture["status"], fixture["body"]
+        if self.upstream:
+            status, body = self._forward(path, params, headers)
+            if status != 429:
+                with self._lock:
+                    self.fixtures[key] = {"status": status, "body": body}
+                    self.recorded += 1
+            return endpoint, status, body
+        # Like the real API, one malformed ID rejects a whole multi-ID request
+        if not all(BASE62_RE.match(i) for i in params.get("ids", "").split(",") if i):
+            return endpoint, 400, {"error": {"status": 400, "message": "invalid id"}}
+        _, body = self.route(path, params)
+        if body is None:
+            return endpoint, 404, {"error": {"status": 404, "message": "Non existing id"}}
+        return endpoint, 200, body
+
+    def _forward(self, path, params, headers):
+        relative = path.strip("/")
+        if relative.startswith("v1/"):
+            relative = relative[3:]
+        url = self.upstream + relative + ("?" + urlencode(params) if params else "")
+        request = Request(url, headers={"Authorization": headers.get("Authorization", "")})
+        try:
+            with urlopen(request, timeout=30) as resp:
+                return resp.status, json.load(resp)
+        except HTTPError as e:
+            try:
+                return e.code, json.load(e)
+            except ValueError:
+                return e.code, {"error": {"status": e.code, "message": str(e)}}
+
+    def route(self, path, params):
+        # Returns (endpoint name, response body) for a GET request
+        parts = _path_parts(path)
+        ids = [i for i in params.get("ids", "").split(",") if i]
+        if parts == ["search"]:
+            query = params.get("q", "artist")
+            artists = [make_artist(f"{re.sub(r'[^a-z0-9]', '', query.lower()) or 'artist'}X{n}")
+                       for n in (25, 100, 500, 5000, 10)]
+            return "search", {"artists": _page(artists, params, 10)}
+        if parts == ["albums"]:
+            return "albums", {"albums": [make_album(i) for i in ids]}
+        if parts == ["tracks"]:
+            return "tracks", {"tracks": [make_track(i) for i in ids]}
+        if parts == ["audio-features"]:
+            return "audio_features", {"audio_features": [make_audio_features(i) for i in ids]}
+        if len(parts) == 2 and parts[0] == "artists":
+            return "artist", make_artist(parts[1])
+        if len(parts) == 3 and parts[0] == "artists" and parts[2] == "albums":
+            groups = params.get("include_groups") or params.get("album_type") or ",".join(ALBUM_TYPES)
+            groups = groups.split(",")
+            albums = [a for a in _discography(parts[1]) if a["album_group"] in groups]
+            return "artist_albums", _page(albums, params)
+        if len(parts) == 2 and parts[0] == "albums":
+            return "album", make_album(parts[1])
+        if len(parts) == 3 and parts[0] == "albums" and parts[2] == "tracks":
+            album = make_album(parts[1])
+            return "album_tracks", album and _page(album["tracks"]["items"], params)
+        if len(parts) == 2 and parts[0] == "tracks":
+            return "track", make_track(parts[1])
+        return "unknown", None
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+                endpoint, status, body = server.respond(url.path, params, self.headers)
+                with server._lock:
+                    server._in_flight += 1
+                    server.requests[endpoint] += 1
+                    throttle = ((server.max_in_flight and server._in_flight > server.max_in_flight)
+                                or server._random.random() < server.throttle_rate)
+                    if throttle:
+                        server.throttled += 1
+                try:
+                    if server.latency:
+                        time.sleep(server.latency)
+                    if throttle:
+                        self._send(429, {"error": {"status": 429, "message": "API rate limit exceeded"}},
+                                   {"Retry-After": str(server.retry_after)})
+                    else:
+                        self._send(status, body)
+                finally:
+                    with server._lock:
+                        server._in_flight -= 1
+
+            def _send(self, status, body, headers=None):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+                with server._lock:
+                    server.bytes_sent += len(data)
+
+        return Handler
+
+
+def _path_parts(path):
+    parts = path.strip("/").split("/")
+    return parts[1:] if parts[0] == "v1" else parts
+
+
+def endpoint_name(parts):
+    # Endpoint name of a request path (split into parts, without "v1"), as used in the request counters
+    if parts in (["search"], ["albums"], ["tracks"]):
+        return parts[0]
+    if parts == ["audio-features"]:
+        return "audio_features"
+    if len(parts) == 2 and parts[0] in ("artists", "albums", "tracks"):
+        return parts[0][:-1]
+    if len(parts) == 3 and parts[0] == "artists" and parts[2] == "albums":
+        return "artist_albums"
+    if len(parts) == 3 and parts[0] == "albums" and parts[2] == "tracks":
+        return "album_tracks"
+    return "unknown"
+
+
+def fixture_key(path, params):
+    path = "/" + path.strip("/")
+    if not path.startswith("/v1/"):
+        path = "/v1" + path
+    return path + ("?" + urlencode(sorted(params.items())) if params else "")
+
+
+def load_fixtures(path):
+    # {request key: {"status", "body"}}, an empty set if the file doesn't exist yet (recording)
+    opener = gzip.open if path.endswith(".gz") else open
+    try:
+        with opener(path, "rt", encoding="utf-8") as f:
+            return json.load(f)["responses"]
+    except FileNotFoundError:
+        return {}
+
+
+def save_fixtures(path, fixtures):
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "wt", encoding="utf-8") as f:
+        json.dump({"version": 1, "responses": fixtures}, f, ensure_ascii=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the Spotify Web API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="share of requests answered with 429")
+    parser.add_argument("--max-in-flight", type=int, default=0, help="answer 429 above this many parallel requests")
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--fixtures", help="recorded responses to serve (.json or .json.gz)")
+    parser.add_argument("--upstream", help="record: forward requests missing from the fixtures to this API prefix")
+    args = parser.parse_args()
+    if args.upstream and not args.fixtures:
+        parser.error("--upstream needs --fixtures to record into")
+    server = FakeSpotifyServer(args.host, args.port, args.latency, args.throttle_rate, args.max_in_flight,
+                               args.retry_after, fixtures=args.fixtures, upstream=args.upstream)
+    print(f"Serving fake Spotify API at {server.prefix}")
+    server.start()
+    try:
+        while server._thread.is_alive():
+            server._thread.join(0.5)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+        if server.recorded:
+            print(f"Recorded {server.recorded} responses to {args.fixtures}")
+
+
+if __name__ == "__main__":
+    main()
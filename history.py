@@ -0,0 +1,168 @@
+import datetime
+import sqlite3
+import threading
+import time
+
+# Popularity history of albums and tracks.
+# Every time the app (or batch_cli.py) loads popularity numbers they're added to a small SQLite file.
+# Only change points are stored: a (item, day, popularity) row is written when an item's popularity differs
+# from what it was on its previous snapshot, and items remember the last day they were seen. A release
+# that sits at 42 for a year is one row, not 365, so daily snapshots of thousands of artists stay small.
+# Points are keyed (item, day) in a WITHOUT ROWID table, so a series or "the value at day X" is an index
+# range scan.
+
+HISTORY_FILE = ".spotify_history.sqlite"
+
+ALBUM = 0
+TRACK = 1
+
+
+def today():
+    return int(time.time() // 86400)
+
+
+def day_to_date(day):
+    return datetime.date(1970, 1, 1) + datetime.timedelta(days=day)
+
+
+class HistoryStore:
+    def __init__(self, path=HISTORY_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS artists ("
+            " id INTEGER PRIMARY KEY,"
+            " spotify_id TEXT NOT NULL UNIQUE,"
+            " name TEXT);"
+            "CREATE TABLE IF NOT EXISTS items ("
+            " id INTEGER PRIMARY KEY,"
+            " spotify_id TEXT NOT NULL UNIQUE,"
+            " kind INTEGER NOT NULL,"
+            " artist INTEGER NOT NULL,"
+            " name TEXT,"
+            " last_day INTEGER NOT NULL,"
+            " last_popularity INTEGER NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS items_artist ON items (artist, kind, last_day);"
+            "CREATE INDEX IF NOT EXISTS items_last_day ON items (last_day);"
+            "CREATE TABLE IF NOT EXISTS points ("
+            " item INTEGER NOT NULL,"
+            " day INTEGER NOT NULL,"
+            " popularity INTEGER NOT NULL,"
+            " PRIMARY KEY (item, day)) WITHOUT ROWID;"
+        )
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _artist_key(self, artist_id, artist_name):
+        self._conn.execute("INSERT INTO artists (spotify_id, name) VALUES (?, ?) "
+                           "ON CONFLICT (spotify_id) DO UPDATE SET name = excluded.name", (artist_id, artist_name))
+        return self._conn.execute("SELECT id FROM artists WHERE spotify_id = ?", (artist_id,)).fetchone()[0]
+
+    def record(self, artist_id, artist_name, kind, items, day=None, fetched=None):
+        # items are (spotify_id, name, popularity). Returns the number of change points written.
+        # fetched is {spotify_id: unix time} for popularities that were fetched earlier than `day`
+        # (served from the API cache), those are recorded under the day they were fetched.
+        day = today() if day is None else day
+        fetched = fetched or {}
+        items = [(spotify_id, name, int(popularity or 0)) for spotify_id, name, popularity in items]
+        if not items:
+            return 0
+        written = 0
+        with self._lock, self._conn:
+            artist = self._artist_key(artist_id, artist_name)
+            known = {}
+            ids = [item[0] for item in items]
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT spotify_id, id, last_day, last_popularity FROM items "
+                    f"WHERE spotify_id IN ({','.join('?' * len(chunk))})", chunk)
+                known.update((row[0], row[1:]) for row in rows)
+
+            for spotify_id, name, popularity in items:
+                item_day = int(fetched[spotify_id] // 86400) if spotify_id in fetched else day
+                if spotify_id not in known:
+                    key = self._conn.execute(
+                        "INSERT INTO items (spotify_id, kind, artist, name, last_day, last_popularity) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (spotify_id, kind, artist, name, item_day, popularity)).lastrowid
+                    self._conn.execute("INSERT INTO points VALUES (?, ?, ?)", (key, item_day, popularity))
+                    written += 1
+                    continue
+                key, last_day, last_popularity = known[spotify_id]
+                if item_day < last_day:
+                    continue  # older than what's stored, history is append-only
+                self._conn.execute("UPDATE items SET name = ?, last_day = ?, last_popularity = ? WHERE id = ?",
+                                   (name, item_day, popularity, key))
+                if popularity == last_popularity:
+                    continue
+                written += 1
+                # A second snapshot on the same day replaces that day's value; if that brings the value back to
+                # the one before, the day isn't a change point any more
+                previous = self._conn.execute(
+                    "SELECT popularity FROM points WHERE item = ? AND day < ? ORDER BY day DESC LIMIT 1",
+                    (key, item_day)).fetchone()
+                if previous and previous[0] == popularity:
+                    self._conn.execute("DELETE FROM points WHERE item = ? AND day = ?", (key, item_day))
+                else:
+                    self._conn.execute("INSERT OR REPLACE INTO points VALUES (?, ?, ?)", (key, item_day, popularity))
+        return written
+
+    def series(self, spotify_id):
+        # [(date, popularity)] from the first snapshot to the last one, one entry per change point
+        # plus the last day the item was seen (so the series can be drawn as steps)
+        with self._lock:
+            item = self._conn.execute("SELECT id, last_day, last_popularity FROM items WHERE spotify_id = ?",
+                                      (spotify_id,)).fetchone()
+            if not item:
+                return []
+            points = self._conn.execute("SELECT day, popularity FROM points WHERE item = ? ORDER BY day",
+                                        (item[0],)).fetchall()
+        if points and points[-1][0] < item[1]:
+            points.append((item[1], item[2]))
+        return [(day_to_date(day), popularity) for day, popularity in points]
+
+    def top_movers(self, artist_id=None, days=7, kind=None, limit=10, day=None):
+        # Items whose popularity changed the most over the last `days` days, biggest change first:
+        # [(spotify_id, name, kind, popularity_then, popularity_now)]. Items first seen inside the window
+        # have nothing to compare with and are left out.
+        since = (today() if day is None else day) - days
+        query = ("SELECT i.spotify_id, i.name, i.kind, "
+                 " (SELECT p.popularity FROM points p WHERE p.item = i.id AND p.day <= ? "
+                 "  ORDER BY p.day DESC LIMIT 1) AS before, i.last_popularity "
+                 "FROM items i ")
+        conditions = ["i.last_day >= ?"]
+        params = [since, since]
+        if artist_id is not None:
+            query += "JOIN artists a ON a.id = i.artist "
+            conditions.append("a.spotify_id = ?")
+            params.append(artist_id)
+        if kind is not None:
+            conditions.append("i.kind = ?")
+            params.append(kind)
+        query = (f"SELECT * FROM ({query} WHERE {' AND '.join(conditions)}) "
+                 f"WHERE before IS NOT NULL AND before != last_popularity "
+                 f"ORDER BY ABS(last_popularity - before) DESC LIMIT ?")
+        params.append(limit)
+        with self._lock:
+            return self._conn.execute(query, params).fetchall()
+
+    def stats(self):
+        with self._lock:
+            artists, = self._conn.execute("SELECT COUNT(*) FROM artists").fetchone()
+            items, = self._conn.execute("SELECT COUNT(*) FROM items").fetchone()
+            points, = self._conn.execute("SELECT COUNT(*) FROM points").fetchone()
+        return {"artists": artists, "items": items, "points": points}
+
+
+def open_history(path=HISTORY_FILE):
+    # Returns None instead of failing when the history file can't be used
+    try:
+        return HistoryStore(path)
+    except sqlite3.Error as e:
+        print(f"Popularity history disabled: {e}")
+        return None
@@ -1,64 +1,238 @@
 #!/usr/bin/env python3
+import time
+STARTUP_STARTED = time.perf_counter()
 import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext, filedialog
-import spotipy
-from spotipy.oauth2 import SpotifyClientCredentials
-import matplotlib
-matplotlib.use("TkAgg")
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
+import itertools
 import json
+import logging
 import sys
 import os
-import datetime
+import sqlite3
 from auth_handler import load_credentials, prompt_for_credentials
 from auth_handler import save_credentials, delete_credentials
-from PIL import ImageTk, Image
-import time
-
-creds = load_credentials()
-if not creds:
-    prompt_for_credentials()
-    creds = load_credentials()
-    if not creds:
-        sys.exit()
-
-client_id = creds["client_id"]
-client_secret = creds["client_secret"]
+from background import TaskRunner
+import async_client
+from analyzer_core import ALBUM_BATCH_SIZE, AnalyzerCore, DEFAULT_SETTINGS, KeywordFilter, VariantGroups, make_client
+from catalog import ArtistCatalog
+import columnar
+from raw_data import RawDataReport
+from exporter import DiscographyExport, PopularityExport
+from charts import BarChart, ComparisonChart, HistoryChart
+from diagnostics import ApiStats, InstrumentedSpotify
+from singleflight import SingleFlight
+import history
+import prefetch
+import snapshot
+import comparison
+from artist_index import ArtistSearch, open_index
+from credential_pool import CredentialPool
+# matplotlib, spotipy and PIL are heavy: they're imported while the splash is up or on first use
+IMPORTS_DONE = time.perf_counter()
+
+log = logging.getLogger("popularity")
+
+# While a discography is streaming in, the listbox and chart are refreshed every ALBUM_FLUSH_COUNT
+# releases or ALBUM_FLUSH_MS milliseconds, whichever comes first
+ALBUM_FLUSH_COUNT = 50
+ALBUM_FLUSH_MS = 200
+# Tracks drawn next to the album in the history chart
+HISTORY_TRACKS = 5
+# Raw Data window: blocks (the artist, an album, a track) rendered per scroll step
+RAW_DATA_PAGE_BLOCKS = 200
+# Typeahead: Spotify is only searched once typing pauses this long, and for at least this many characters
+TYPEAHEAD_DELAY_MS = 300
+TYPEAHEAD_MIN_CHARS = 2
+MORE_MATCHES = "More results..."
+APP_TITLE = "Spotify Popularity Analyzer"
+
+
+def _ms_since_start(t=None):
+    return round(((t or time.perf_counter()) - STARTUP_STARTED) * 1000)
 
 
 class SpotifyAnalyzer(tk.Tk):
     # ------------------------------
     # UI Functions & stuff
     # ------------------------------
-    def __init__(self, client_id, client_secret):
+    def __init__(self, client_id, client_secret, pool=None, snapshot_path=None):
         super().__init__()
-        self.title("Spotify Popularity Analyzer")
+        self.title(APP_TITLE)
         self.geometry("1200x800")
         self.minsize(800, 600)
         self.resizable(True, True)
-        # Set up Spotipy authentication with error handling (e.g., when there's no internet connection or no spotify API credentials)
-        try:
-            auth_manager = SpotifyClientCredentials(client_id=client_id, client_secret=client_secret)
-            self.sp = spotipy.Spotify(auth_manager=auth_manager)
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to authenticate with Spotify: {e}")
-            self.destroy()
-            return
+        # The window stays hidden until the backend is ready (main() shows a splash meanwhile)
+        self.withdraw()
+        self.splash = None
+        self.startup_timings = {"imports_ms": _ms_since_start(IMPORTS_DONE)}
+        self.sp = None
+        self.auth_manager = None
+        self.api_cache = None
+        # Calls, bytes, latencies and errors of every Spotify request, per endpoint (File -> Diagnostics)
+        self.api_stats = ApiStats()
+        self._diagnostics_win = None
+        self.core = None
+        # With a snapshot open, self.core reads from it and live_core is the one that talks to Spotify
+        self.live_core = None
+        self.snapshot = None
+        self.snapshot_path = snapshot_path
         self.artist_id = None
         self.artist_name = None
+        # The artist object of the selection (genres, followers) for the Raw Data window
+        self.artist_info = None
+        # Everything loaded for the selected artist, unfiltered (self.albums is the filtered view of it)
+        self.catalog = None
         self.albums = []
+        # Releases received from the discography task but not shown yet (see _flush_albums)
+        self._pending_albums = []
+        self._album_flush_id = None
+        self.current_album = None
         self.current_album_tracks = []
-        self.settings = {
-            "types": ["album", "single", "compilation"],
-            "filters": [],  # По умолчанию — без фильтрации
-            "albums_to_export": "3",
-            "tracks_to_export": "5",
-            "sort_order": "Descending"
+        # Popularity snapshots of everything that gets loaded (see history.py)
+        self.history = None
+        # Typeahead state: every artist seen so far is in the local index (see artist_index.py)
+        self.artist_index = None
+        self.artist_search = None
+        self.search_query = ""
+        self.search_count = 0
+        self.matches = []
+        # Artists compared side by side, each with its own catalog (see comparison.py)
+        self.comparison = comparison.Comparison()
+        self._comparison_win = None
+        self._comparison_view = None
+        # Artist ID -> key of the task loading it; every load runs under its own key, so adding an artist
+        # doesn't restart the ones still loading
+        self._comparison_loading = {}
+        self._comparison_keys = itertools.count()
+        self.show_history = tk.BooleanVar(value=False)
+        # Duplicate editions are collapsed while loading, this shows them again
+        self.show_variants = tk.BooleanVar(value=False)
+        self.settings = dict(DEFAULT_SETTINGS)
+        self.keyword_filter = KeywordFilter.from_settings(self.settings)
+        # Bulk fetches go through the concurrent aiohttp transport when it's installed
+        self.network = {
+            "async": async_client.available(),
+            "concurrency": "8"
         }
 
         self._create_menubar()
         self._create_main_layout()
+        # All Spotify requests run on worker threads, results come back through the Tk loop
+        self.tasks = TaskRunner(self, on_busy_change=self._on_busy_change)
+        # Tracklists of every artist stay in a bounded LRU; the ones likely to be opened next are
+        # loaded in the background once nothing else is running (see prefetch.py)
+        self.tracklists = prefetch.TracklistCache()
+        self.prefetcher = prefetch.Prefetcher(self.tracklists, self.tasks.busy)
+        # Set up Spotipy authentication with error handling (e.g., when there's no internet connection or no spotify API credentials)
+        self.tasks.submit("startup", self._start_backend, client_id, client_secret, pool,
+                          on_done=self._on_backend_ready, on_error=self._on_backend_failed)
+
+    def _start_backend(self, task, client_id, client_secret, pool):
+        # Runs on a worker thread while the splash is up: heavy imports, client setup and the first token.
+        # Without credentials the app runs offline and can only open snapshots.
+        started = time.perf_counter()
+        self.history = history.open_history()
+        if client_id is None:
+            columnar.load()
+            return None, None, None, None
+        # Responses are cached on disk, so repeated lookups (and restarts) don't hit the network again
+        # Identical requests from parallel tasks (selection, raw data, exports) share one request
+        sp, auth_manager, api_cache = make_client(client_id, client_secret,
+                                                  wrap=lambda client: InstrumentedSpotify(client, self.api_stats),
+                                                  flight=SingleFlight(self.api_stats), pool=pool)
+        self.artist_index = open_index()
+        self.startup_timings["client_ms"] = round((time.perf_counter() - started) * 1000)
+        started = time.perf_counter()
+        token_error = None
+        try:
+            auth_manager.get_access_token(as_dict=False)
+        except Exception as e:
+            token_error = e
+        self.startup_timings["token_ms"] = round((time.perf_counter() - started) * 1000)
+        # Only import the chart stack here, figures are created when the first chart is drawn
+        started = time.perf_counter()
+        import matplotlib.figure
+        import matplotlib.backends.backend_tkagg
+        columnar.load()
+        self.startup_timings["matplotlib_ms"] = round((time.perf_counter() - started) * 1000)
+        return sp, auth_manager, api_cache, token_error
+
+    def _on_backend_ready(self, result):
+        self.sp, self.auth_manager, self.api_cache, token_error = result
+        if self.sp is not None:
+            pool = self.auth_manager if isinstance(self.auth_manager, CredentialPool) else None
+            self.core = self.live_core = AnalyzerCore(
+                self.sp, lambda: self.auth_manager.get_access_token(as_dict=False), api_stats=self.api_stats,
+                pool=pool)
+            self._apply_network_settings()
+            self.artist_search = ArtistSearch(self.artist_index)
+            self.search_btn.config(state=tk.NORMAL)
+        else:
+            self.status_var.set("Offline: open a snapshot with File -> Open Snapshot...")
+        if token_error:
+            self.status_var.set(f"Could not get a Spotify access token: {token_error}")
+        self._show_main_window()
+        if self.snapshot_path:
+            self.open_snapshot(self.snapshot_path)
+
+    def _on_backend_failed(self, error):
+        self._show_main_window()
+        messagebox.showerror("Error", f"Failed to authenticate with Spotify: {error}")
+        self.destroy()
+
+    def _show_main_window(self):
+        self.startup_timings["backend_ready_ms"] = _ms_since_start()
+        if self.splash:
+            self.splash.destroy()
+            self.splash = None
+        self.deiconify()
+        self.after_idle(self._report_startup)
+
+    def _report_startup(self):
+        self.startup_timings["first_paint_ms"] = _ms_since_start()
+        log.info("Startup timings: %s", ", ".join(f"{k}={v}" for k, v in self.startup_timings.items()))
+        if "--startup-report" in sys.argv:
+            print(json.dumps(self.startup_timings))
+            self.destroy()
+
+    def _apply_network_settings(self):
+        for core in {self.core, self.live_core} - {None}:
+            core.use_async = self.network["async"]
+            core.concurrency = int(self.network["concurrency"])
+
+    def destroy(self):
+        if hasattr(self, "tasks"):
+            self.tasks.shutdown()
+            self.prefetcher.stop()
+        if getattr(self, "auth_manager", None):
+            self.auth_manager.stop()
+        if getattr(self, "api_cache", None):
+            try:
+                self.api_cache.flush()
+            except sqlite3.Error:
+                pass
+        super().destroy()
+
+    def _on_busy_change(self, busy):
+        self.cancel_btn.config(state=tk.NORMAL if busy else tk.DISABLED)
+        if not busy:
+            self.progress_bar.stop()
+            self.progress_bar.config(mode="determinate", value=0)
+
+    def _show_progress(self, done, total=None, text=None):
+        # Progress callback shared by all background tasks
+        if total:
+            self.progress_bar.stop()
+            self.progress_bar.config(mode="determinate", maximum=total, value=done)
+        elif str(self.progress_bar.cget("mode")) != "indeterminate":
+            self.progress_bar.config(mode="indeterminate")
+            self.progress_bar.start(10)
+        if text:
+            self.status_var.set(text)
+
+    def cancel_background_work(self):
+        self.tasks.cancel()
+        self.status_var.set("Cancelled")
 
     def _create_menubar(self):
         menubar = tk.Menu(self)
@@ -67,12 +241,24 @@ class SpotifyAnalyzer(tk.Tk):
         file_menu = tk.Menu(menubar, tearoff=False)
         menubar.add_cascade(label="File", menu=file_menu)
         file_menu.add_command(label="Export Popularity...", command=self.export_popularity)
+        file_menu.add_command(label="Export Discography (JSON)...", command=self.export_discography)
+        file_menu.add_command(label="Save Snapshot...", command=self.save_snapshot)
+        file_menu.add_command(label="Open Snapshot...", command=self.open_snapshot)
         file_menu.add_command(label="Raw Data", command=self.show_raw_data)
+        file_menu.add_command(label="Diagnostics", command=self.open_diagnostics_window)
         file_menu.add_command(label="Settings", command=self.open_settings_window)
+        file_menu.add_command(label="Clear API Cache", command=self.clear_api_cache)
         file_menu.add_separator()
         file_menu.add_command(label="Log Out", command=self.logout_spotify)
         file_menu.add_command(label="Exit", command=self.destroy)
 
+        view_menu = tk.Menu(menubar, tearoff=False)
+        menubar.add_cascade(label="View", menu=view_menu)
+        view_menu.add_checkbutton(label="History Chart", variable=self.show_history, command=self._toggle_history)
+        view_menu.add_checkbutton(label="Release Variants", variable=self.show_variants,
+                                  command=self._toggle_variants)
+        view_menu.add_command(label="Compare Artists...", command=self.open_comparison_window)
+
         help_menu = tk.Menu(menubar, tearoff=False)
         help_menu.add_command(label="About...", command=self.show_about)
         menubar.add_cascade(label="Help", menu=help_menu)
@@ -84,6 +270,115 @@ class SpotifyAnalyzer(tk.Tk):
             self.destroy()
             sys.exit()
 
+    def clear_api_cache(self):
+        if not self.api_cache:
+            messagebox.showinfo("API Cache", "The API cache is disabled.")
+            return
+        stats = self.api_cache.stats()
+        if messagebox.askyesno("API Cache", f"Remove {stats['entries']} cached responses "
+                                            f"({stats['bytes'] / (1024 * 1024):.1f} MB)?"):
+            self.api_cache.clear()
+            self.status_var.set("API cache cleared")
+
+    def _cache_summary(self, since=None):
+        # Hit/miss counters of the response cache, optionally relative to an earlier snapshot
+        if not self.api_cache:
+            return (0, 0), "cache disabled"
+        stats = self.api_cache.stats()
+        counters = (stats["hits"], stats["misses"])
+        hits, misses = counters
+        if since:
+            hits, misses = hits - since[0], misses - since[1]
+        return counters, f"cache: {hits} hits / {misses} misses, {stats['bytes'] / (1024 * 1024):.1f} MB on disk"
+
+    def _log_api_summary(self, label, since):
+        # One line per operation in the log, so a change in the number of calls or in latency stands out
+        log.info("API %s", self.api_stats.summary(label, self.api_cache, since))
+
+    def open_diagnostics_window(self):
+        if self._diagnostics_win is not None and self._diagnostics_win.winfo_exists():
+            self._diagnostics_win.lift()
+            return
+        diag_win = tk.Toplevel(self)
+        self._diagnostics_win = diag_win
+        if hasattr(sys, "_MEIPASS"):
+            base_path = sys._MEIPASS
+        else:
+            base_path = os.path.abspath(".")
+        diag_win.iconbitmap(os.path.join(base_path, "ico.ico"))
+        diag_win.title("Diagnostics")
+        diag_win.geometry("820x420")
+
+        columns = [("calls", "Calls", 60), ("shared", "Shared", 60), ("errors", "Errors", 60),
+                   ("throttled", "429s", 50), ("kb", "KB", 80),
+                   ("p50_ms", "p50 ms", 70), ("p95_ms", "p95 ms", 70), ("p99_ms", "p99 ms", 70)]
+        table = ttk.Treeview(diag_win, columns=[c[0] for c in columns], height=12)
+        table.heading("#0", text="Endpoint")
+        table.column("#0", width=160)
+        for name, title, width in columns:
+            table.heading(name, text=title)
+            table.column(name, width=width, anchor=tk.E)
+        table.pack(fill=tk.BOTH, expand=True, padx=10, pady=(10, 5))
+        ttk.Label(diag_win, text="429s only counts throttled async requests (and calls that failed with one): "
+                                 "spotipy and the key pool retry the others internally. "
+                                 "KB of synchronous calls are estimated from sampled responses.",
+                  wraplength=800, justify=tk.LEFT, foreground="gray").pack(anchor=tk.W, padx=10)
+        cache_var = tk.StringVar()
+        ttk.Label(diag_win, textvariable=cache_var).pack(anchor=tk.W, padx=10)
+        prefetch_var = tk.StringVar()
+        ttk.Label(diag_win, textvariable=prefetch_var).pack(anchor=tk.W, padx=10)
+        # One line per credential when requests are spread over a pool of them
+        keys_var = tk.StringVar()
+        ttk.Label(diag_win, textvariable=keys_var, justify=tk.LEFT).pack(anchor=tk.W, padx=10)
+
+        def row(stats):
+            return [stats["calls"], stats["shared"], stats["errors"], stats["throttled"],
+                    f"{stats['bytes'] / 1024:.0f}",
+                    *("-" if stats[key] is None else stats[key] for key in ("p50_ms", "p95_ms", "p99_ms"))]
+
+        def refresh():
+            if not diag_win.winfo_exists():
+                return
+            snap = self.api_stats.snapshot(self.api_cache)
+            table.delete(*table.get_children())
+            for endpoint, stats in snap["endpoints"].items():
+                table.insert("", tk.END, text=endpoint, values=row(stats))
+            table.insert("", tk.END, text="Total", values=row(snap["total"]))
+            cache = snap["cache"]
+            if cache is None:
+                cache_var.set("Response cache: disabled")
+            else:
+                ratio = "n/a" if cache["hit_ratio"] is None else f"{cache['hit_ratio']:.0%}"
+                cache_var.set(f"Response cache: {cache['hits']} hits, {cache['misses']} misses (hit ratio {ratio})")
+            prefetch_var.set(self.tracklists.summary())
+            if isinstance(self.auth_manager, CredentialPool):
+                keys_var.set("\n".join(
+                    f"Key {key['client_id']}: {key['calls']} calls ({key['calls_per_s']}/s), "
+                    f"{key['in_flight']} in flight, {key['throttled']} throttled, {key['errors']} errors"
+                    + (f", cooling down {key['cooling_s']} s" if key["cooling_s"] else "")
+                    for key in self.auth_manager.stats()))
+            diag_win.after(1000, refresh)
+
+        def export_json():
+            file_path = filedialog.asksaveasfilename(
+                parent=diag_win,
+                defaultextension=".json",
+                filetypes=[("JSON files", "*.json"), ("All files", "*.*")],
+                title="Export Diagnostics"
+            )
+            if file_path:
+                try:
+                    self.api_stats.export(file_path, self.api_cache)
+                except OSError as e:
+                    messagebox.showerror("Error", f"Failed to save file:\n{e}", parent=diag_win)
+
+        button_frame = ttk.Frame(diag_win)
+        button_frame.pack(pady=5)
+        ttk.Button(button_frame, text="Export as JSON", command=export_json).pack(side=tk.LEFT, padx=10)
+        ttk.Button(button_frame, text="Reset", command=self.api_stats.reset).pack(side=tk.LEFT, padx=10)
+        ttk.Button(button_frame, text="Close", command=diag_win.destroy).pack(side=tk.LEFT, padx=10)
+        refresh()
+
     def open_settings_window(self):
         settings_win = tk.Toplevel(self)
         if hasattr(sys, "_MEIPASS"):
@@ -171,18 +466,53 @@ class SpotifyAnalyzer(tk.Tk):
                                                                                                          column=2,
                                                                                                          sticky="w")
 
+        # Сеть
+        tk.Label(settings_win, text="Network", font=label_font, fg='black').grid(row=15, column=1, sticky="w",
+                                                                                  padx=10, pady=(20, 0))
+        self.async_var = tk.BooleanVar(value=self.network["async"])
+        tk.Checkbutton(settings_win, text="Concurrent requests", variable=self.async_var, font=checkbox_font,
+                       state=tk.NORMAL if async_client.available() else tk.DISABLED).grid(row=16, column=0,
+                                                                                          columnspan=2, padx=10,
+                                                                                          sticky="w")
+        self.concurrency_var = tk.StringVar(value=self.network["concurrency"])
+        ttk.OptionMenu(settings_win, self.concurrency_var, self.concurrency_var.get(), "2", "4", "8", "16").grid(
+            row=16, column=2, sticky="w")
+        tk.Label(settings_win, text="Market (e.g. US, empty for all):", font=checkbox_font).grid(row=17, column=0,
+                                                                                                columnspan=2, padx=10,
+                                                                                                sticky="w")
+        self.market_var = tk.StringVar(value=self.settings.get("market", ""))
+        ttk.Entry(settings_win, textvariable=self.market_var, width=6).grid(row=17, column=2, sticky="w")
+
         # Кнопка сохранить
         def save_and_close():
+            self.network = {
+                "async": self.async_var.get(),
+                "concurrency": self.concurrency_var.get()
+            }
+            self._apply_network_settings()
+            market = self.market_var.get().strip().upper()
+            market_changed = market != self.settings.get("market", "")
             self.settings = {
                 "types": [k for k, v in self.release_types.items() if v.get()],
                 "filters": [k for k, v in self.filter_keywords.items() if v.get()],
                 "albums_to_export": self.album_export_var.get(),
                 "tracks_to_export": self.track_export_var.get(),
-                "sort_order": self.sort_order_var.get()
+                "sort_order": self.sort_order_var.get(),
+                "market": market
             }
+            self.keyword_filter = KeywordFilter.from_settings(self.settings)
             settings_win.destroy()
+            # Applied to the in-memory catalog, only newly enabled release types are fetched.
+            # Another market means another discography, that one is loaded from scratch.
             if self.artist_id:
+                if market_changed and self.snapshot is None:
+                    self.catalog = ArtistCatalog(self.artist_id, self.tracklists)
                 self.fetch_albums()
+                self._refilter_tracks()
+            if len(self.comparison):
+                if market_changed:
+                    self.comparison.reset()
+                self._load_comparison(restart=True)
 
         # Кнопки OK и Cancel в один ряд
         button_frame = ttk.Frame(settings_win)
@@ -208,8 +538,22 @@ class SpotifyAnalyzer(tk.Tk):
         self.search_entry = ttk.Entry(top_frame, width=30)
         self.search_entry.grid(row=0, column=1, sticky="ew", padx=5)
         self.search_entry.bind("<Return>", lambda e: self.search_artist())
-        search_btn = ttk.Button(top_frame, text="Search", command=self.search_artist)
-        search_btn.grid(row=0, column=2, padx=5)
+        self.search_entry.bind("<KeyRelease>", self._on_search_typed)
+        # Enabled once the Spotify client is set up
+        self.search_btn = ttk.Button(top_frame, text="Search", command=self.search_artist, state=tk.DISABLED)
+        self.search_btn.grid(row=0, column=2, padx=5)
+
+        # Status bar at the bottom (packed before the paned window so it never gets squeezed out)
+        status_frame = ttk.Frame(self)
+        status_frame.pack(side=tk.BOTTOM, fill=tk.X)
+        self.status_var = tk.StringVar(value="Ready")
+        status_bar = ttk.Label(status_frame, textvariable=self.status_var, anchor=tk.W, relief=tk.SUNKEN)
+        status_bar.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.cancel_btn = ttk.Button(status_frame, text="Cancel", command=self.cancel_background_work,
+                                     state=tk.DISABLED)
+        self.cancel_btn.pack(side=tk.RIGHT, padx=2)
+        self.progress_bar = ttk.Progressbar(status_frame, length=200, mode="determinate")
+        self.progress_bar.pack(side=tk.RIGHT, padx=2)
 
         # Main horizontal Paned Window (left = artist/discography, right = charts)
         main_paned = tk.PanedWindow(self, orient=tk.HORIZONTAL, sashrelief=tk.RAISED)
@@ -222,6 +566,9 @@ class SpotifyAnalyzer(tk.Tk):
         self.matches_listbox = tk.Listbox(left_frame, height=5)
         self.matches_listbox.pack(fill=tk.X)
         self.matches_listbox.bind("<<ListboxSelect>>", self.on_select_artist)
+        matches_menu = tk.Menu(self.matches_listbox, tearoff=0)
+        matches_menu.add_command(label="Add to Comparison", command=self._compare_match)
+        self.matches_listbox.bind("<Button-3>", lambda event: self._show_matches_menu(matches_menu, event))
         ttk.Label(left_frame, text="Discography (Albums):").pack(anchor=tk.NW, pady=(10, 0))
         self.albums_listbox = tk.Listbox(left_frame, height=15)
         self.albums_listbox.pack(fill=tk.BOTH, expand=True)
@@ -237,58 +584,110 @@ class SpotifyAnalyzer(tk.Tk):
         # Top sub-frame for the album chart
         album_frame = ttk.Frame(right_paned)
         album_frame.pack(fill=tk.BOTH, expand=True)
-        album_pack_frame = ttk.Frame(album_frame)
-        album_pack_frame.pack(fill=tk.BOTH, expand=True)
-
-        # Create the album chart figure and axes
-        self.album_fig = plt.Figure(figsize=(5, 3), dpi=100)
-        self.album_ax = self.album_fig.add_subplot(111)
-        self.album_ax.set_title("Album Popularity", fontsize=8)
-        self.album_ax.tick_params(axis='x', labelsize=6)
-        self.album_ax.tick_params(axis='y', labelsize=6)
-        self.album_canvas = FigureCanvasTkAgg(self.album_fig, master=album_pack_frame)
-        album_canvas_widget = self.album_canvas.get_tk_widget()
-        album_canvas_widget.pack(side=tk.TOP, fill=tk.BOTH, expand=True)
-        # Create and pack the toolbar for the album chart
-        self.album_toolbar = NavigationToolbar2Tk(self.album_canvas, album_pack_frame)
-        self.album_toolbar.update()
-        self.album_toolbar.pack(side=tk.BOTTOM, fill=tk.X)
+        self.album_pack_frame = ttk.Frame(album_frame)
+        self.album_pack_frame.pack(fill=tk.BOTH, expand=True)
+        # The album chart itself is created on first use (see _ensure_album_chart)
+        self.album_fig = self.album_ax = self.album_canvas = self.album_toolbar = self.album_chart = None
+        self.album_placeholder = ttk.Label(self.album_pack_frame, text="Album Popularity", anchor=tk.CENTER)
+        self.album_placeholder.pack(fill=tk.BOTH, expand=True)
         right_paned.add(album_frame, minsize=200)
 
         # Bottom sub-frame for the track chart
         track_frame = ttk.Frame(right_paned)
         track_frame.pack(fill=tk.BOTH, expand=True)
-        track_pack_frame = ttk.Frame(track_frame)
-        track_pack_frame.pack(fill=tk.BOTH, expand=True)
-        # Create the track chart figure and axes
-        self.track_fig = plt.Figure(figsize=(5, 3), dpi=100)
-        self.track_ax = self.track_fig.add_subplot(111)
-        self.track_ax.set_title("Track Popularity", fontsize=8)
-        self.track_ax.tick_params(axis='x', labelsize=6)
-        self.track_ax.tick_params(axis='y', labelsize=6)
-        self.track_canvas = FigureCanvasTkAgg(self.track_fig, master=track_pack_frame)
-        track_canvas_widget = self.track_canvas.get_tk_widget()
-        track_canvas_widget.pack(side=tk.TOP, fill=tk.BOTH, expand=True)
-        # Create and pack the toolbar for the track chart
-        self.track_toolbar = NavigationToolbar2Tk(self.track_canvas, track_pack_frame)
-        self.track_toolbar.update()
-        self.track_toolbar.pack(side=tk.BOTTOM, fill=tk.X)
+        self.track_pack_frame = ttk.Frame(track_frame)
+        self.track_pack_frame.pack(fill=tk.BOTH, expand=True)
+        self.track_fig = self.track_ax = self.track_canvas = self.track_toolbar = self.track_chart = None
+        self.track_placeholder = ttk.Label(self.track_pack_frame, text="Track Popularity", anchor=tk.CENTER)
+        self.track_placeholder.pack(fill=tk.BOTH, expand=True)
         right_paned.add(track_frame, minsize=200)
 
-    def _get_expanded_keywords(self):
-        filters = self.settings.get("filters", [])
-        alias_map = {
-            "reissue": ["reissue", "re-issue"],
-            "remix": ["remix", "remixed"],
-            "remastered": ["remastered", "remaster"]
-        }
-        result = []
-        for keyword in filters:
-            if keyword in alias_map:
-                result.extend(alias_map[keyword])
-            else:
-                result.append(keyword)
-        return result
+        # Popularity history, shown below the other charts when View -> History Chart is on
+        self.right_paned = right_paned
+        self.history_frame = ttk.Frame(right_paned)
+        self.history_fig = self.history_ax = self.history_canvas = self.history_toolbar = self.history_chart = None
+
+    def _create_chart(self, master, title):
+        # Figure + canvas + toolbar for one of the popularity charts
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
+        fig = Figure(figsize=(5, 3), dpi=100)
+        ax = fig.add_subplot(111)
+        ax.set_title(title, fontsize=8)
+        ax.tick_params(axis='x', labelsize=6)
+        ax.tick_params(axis='y', labelsize=6)
+        canvas = FigureCanvasTkAgg(fig, master=master)
+        canvas_widget = canvas.get_tk_widget()
+        canvas_widget.pack(side=tk.TOP, fill=tk.BOTH, expand=True)
+        toolbar = NavigationToolbar2Tk(canvas, master)
+        toolbar.update()
+        toolbar.pack(side=tk.BOTTOM, fill=tk.X)
+        return fig, ax, canvas, toolbar
+
+    def _ensure_album_chart(self):
+        if self.album_ax is None:
+            self.album_placeholder.destroy()
+            self.album_fig, self.album_ax, self.album_canvas, self.album_toolbar = self._create_chart(
+                self.album_pack_frame, "Album Popularity")
+            self.album_chart = BarChart(self.album_ax, self.album_canvas, "Album Popularity", "skyblue")
+
+    def _ensure_track_chart(self):
+        if self.track_ax is None:
+            self.track_placeholder.destroy()
+            self.track_fig, self.track_ax, self.track_canvas, self.track_toolbar = self._create_chart(
+                self.track_pack_frame, "Track Popularity")
+            self.track_chart = BarChart(self.track_ax, self.track_canvas, "Track Popularity", "orange")
+
+    def _toggle_history(self):
+        if self.show_history.get():
+            self.right_paned.add(self.history_frame, minsize=150)
+            if self.history_chart is None:
+                self.history_fig, self.history_ax, self.history_canvas, self.history_toolbar = self._create_chart(
+                    self.history_frame, "Popularity History")
+                self.history_chart = HistoryChart(self.history_ax, self.history_canvas)
+            self.update_history_graph()
+        else:
+            self.right_paned.forget(self.history_frame)
+
+    def update_history_graph(self):
+        # The open album and its most popular tracks over time, or the artist's biggest movers of the week
+        if not self.show_history.get() or self.history_chart is None:
+            return
+        if not self.history:
+            self.history_chart.clear("Popularity history is not available")
+            return
+        if self.current_album:
+            album_id, album_name = self.current_album
+            series = {album_name: self.history.series(album_id)}
+            top_tracks = sorted(self.current_album_tracks, key=lambda t: t["popularity"], reverse=True)
+            for track in top_tracks[:HISTORY_TRACKS]:
+                series[track["name"]] = self.history.series(track["id"])
+            self.history_chart.show_series(f"History of '{album_name}'", series)
+            return
+        if self.artist_id:
+            movers = self.history.top_movers(self.artist_id, days=7, limit=15)
+            if movers:
+                self.history_chart.show_movers(f"{self.artist_name} - biggest movers in the last 7 days",
+                                               [(name, then, now) for _, name, _, then, now in movers])
+                return
+        self.history_chart.clear("No popularity changes recorded yet")
+
+    def _record_history(self, artist_id, artist_name, kind, items):
+        # Called on worker threads; the history is a nice-to-have, so it never fails a fetch.
+        # Popularities read from a snapshot are old, they don't go into it; the ones the API cache served
+        # go under the day they were fetched.
+        if not self.history or self.snapshot is not None:
+            return
+        try:
+            fetched = self.core.fetched_at("album" if kind == history.ALBUM else "track", [item[0] for item in items])
+            self.history.record(artist_id, artist_name, kind, items, fetched=fetched)
+        except Exception as e:
+            log.warning("Could not record popularity history: %s", e)
+
+    def _clear_track_graph(self):
+        if self.track_chart is None:
+            return
+        self.track_chart.clear("Track Popularity")
 
     def show_about(self):
         about_text = (
@@ -346,27 +745,77 @@ class SpotifyAnalyzer(tk.Tk):
     # ------------------------------
     def search_artist(self):
         # this function is called when the 'Search' button is clicked or the Enter key is pressed.
-        # the app then asks Spotify for up to 5 matching artists and displays them in the matches listbox.
-        # if you increase the number of matches, you'll need to scroll down the results, I didn't make any sliders for that.
+        # the app shows up to 5 matching artists in the matches listbox, artists it has seen before come straight
+        # from the local index and Spotify is only asked for the rest. "More results..." pages further.
         # Also, you're free to make typos or any mistakes in your inquiry. Normally, if artist name is correct, the first matching result is what you're looking for.
 
         query = self.search_entry.get().strip()
+        if self.sp is None:
+            return
         if not query:
             messagebox.showinfo("Info", "Please enter an artist name.")
             return
-        self.matches_listbox.delete(0, tk.END)
-        try:
-            results = self.sp.search(q=query, type='artist', limit=5) # feel free to increase/decrease this number if needed
-        except Exception as e:
-            messagebox.showerror("Error", f"Search failed: {e}")
+        self._start_search(query)
+
+    def _on_search_typed(self, event):
+        # Typeahead: the index answers on every keystroke, Spotify is asked once typing pauses
+        # (a newer keystroke cancels the pending search)
+        if self.sp is None:
+            return
+        query = self.search_entry.get().strip()
+        if query == self.search_query:
+            return
+        if len(query) < TYPEAHEAD_MIN_CHARS:
+            self.tasks.cancel("search")
+            self.search_query = query
+            self.matches = []
+            self.matches_listbox.delete(0, tk.END)
             return
-        artists = results['artists']['items']
-        if not artists:
+        self._start_search(query, TYPEAHEAD_DELAY_MS)
+
+    def _start_search(self, query, delay_ms=0, count=None):
+        self.search_query = query
+        self.search_count = count or self.artist_search.page_size
+        self._show_matches()
+        if not self.artist_search.needs_search(query, self.search_count):
+            self.tasks.cancel("search")
+            return
+
+        def done(_):
+            self.status_var.set("Ready")
+            if self.search_query == query:
+                self._show_matches()
+
+        def failed(e):
+            # A failed typeahead search isn't worth a dialog, Enter or the button is
+            if delay_ms:
+                self.status_var.set(f"Search failed: {e}")
+            else:
+                self._show_error(f"Search failed: {e}")
+
+        self.tasks.submit("search", self._search_worker, query, self.search_count, delay_ms=delay_ms,
+                          on_done=done, on_progress=self._show_progress, on_error=failed)
+
+    def _search_worker(self, task, query, count):
+        # Search pages until the query has `count` matches or Spotify has no more
+        while self.artist_search.needs_search(query, count):
+            task.check()
+            self.artist_search.fetch_page(self.sp, query, task)
+
+    def _show_matches(self):
+        search = self.artist_search
+        self.matches = search.matches(self.search_query, self.search_count)
+        self.matches_listbox.delete(0, tk.END)
+        if not self.matches and search.exhausted(self.search_query):
             self.matches_listbox.insert(tk.END, "No matches found.")
             return
-        for artist in artists:
-            entry = f"{artist['name']} ({artist['id']})"
-            self.matches_listbox.insert(tk.END, entry)
+        self.matches_listbox.insert(tk.END, *(f"{artist['name']} ({artist['id']})" for artist in self.matches))
+        if self.matches and search.has_more(self.search_query, self.search_count):
+            self.matches_listbox.insert(tk.END, MORE_MATCHES)
+
+    def _show_error(self, message):
+        self.status_var.set(message)
+        messagebox.showerror("Error", message)
 
     def on_select_artist(self, event):
         # this function is triggered when an artist is selected from the 'Artist Matches' listbox.
@@ -374,93 +823,203 @@ class SpotifyAnalyzer(tk.Tk):
         if not selection:
             return
         idx = selection[0]
-        text = self.matches_listbox.get(idx)
-        if "No matches found." in text:
-            return
-        try:
-            artist_id = text.split("(")[1].split(")")[0]
-        except:
-            messagebox.showerror("Error", "Unable to parse artist ID.")
+        if idx >= len(self.matches):
+            if self.matches_listbox.get(idx) == MORE_MATCHES:
+                self._start_search(self.search_query, count=self.search_count + self.artist_search.page_size)
             return
-        try:
+        artist_id = self.matches[idx]["id"]
+
+        def work(task):
+            task.progress(0, text="Loading artist...")
             artist_info = self.sp.artist(artist_id)
-        except Exception as e:
-            messagebox.showerror("Error", f"Artist retrieval failed: {e}")
-            return
-        self.artist_id = artist_id
-        self.artist_name = artist_info["name"]
-        # Reset filters to defaults on new artist selection
-        self.settings = {
-            "types": ["album", "single", "compilation"],  # appears_on отключён
-            "filters": [],  # никаких ключевых фильтров
-            "albums_to_export": "3",
-            "tracks_to_export": "3"
-        }
-        self.current_album_tracks = []
-        self.track_ax.clear()
-        self.track_ax.set_title("Track Popularity")
-        self.track_canvas.draw()
-        self.fetch_albums()
+            if self.artist_index is not None:
+                self.artist_index.add([artist_info])
+            return artist_info
+
+        def done(artist_info):
+            self._close_snapshot()
+            self.artist_id = artist_id
+            self.artist_name = artist_info["name"]
+            self.artist_info = artist_info
+            # Reset filters to defaults on new artist selection
+            self.settings = {
+                "types": ["album", "single", "compilation"],  # appears_on отключён
+                "filters": [],  # никаких ключевых фильтров
+                "albums_to_export": "3",
+                "tracks_to_export": "3",
+                "market": self.settings.get("market", "")
+            }
+            self.keyword_filter = KeywordFilter.from_settings(self.settings)
+            self.catalog = ArtistCatalog(artist_id, self.tracklists)
+            # Whatever was loading for the previous artist is stale now
+            self.tasks.cancel("tracks")
+            self.prefetcher.cancel()
+            self.tasks.cancel("variants")
+            self.current_album = None
+            self.current_album_tracks = []
+            self._clear_track_graph()
+            self.fetch_albums()
+
+        self.tasks.submit("artist", work, on_done=done, on_progress=self._show_progress,
+                          on_error=lambda e: self._show_error(f"Artist retrieval failed: {e}"))
 
     def fetch_albums(self):
-        self.albums_listbox.delete(0, tk.END)
-        self.albums.clear()
-        offset = 0
-
-        album_types = ",".join(self.settings.get("types", ["album"]))
-        all_keywords = self._get_expanded_keywords()
-
-        while True:
-            try:
-                results = self.sp.artist_albums(self.artist_id, album_type=album_types, limit=50, offset=offset)
-            except Exception as e:
-                messagebox.showerror("Error", f"Album retrieval failed: {e}")
-                return
-
-            items = results["items"]
-            if not items:
-                break
+        # Shows the discography of the current settings from the catalog and loads the release types
+        # that aren't in it yet (all of them for a new artist)
+        self._pending_albums = []
+        self._cancel_album_flush()
+        catalog = self.catalog
+        keyword_filter = self.keyword_filter
+        release_types = self.settings.get("types", ["album"])
+        missing = catalog.missing_types(release_types)
+        if missing:
+            # Variants of the types that are about to be reloaded would end up without their releases
+            self.tasks.cancel("variants")
+        catalog.start(missing)
+        self._show_albums(catalog.albums(release_types, keyword_filter, self.show_variants.get()))
+        if not missing:
+            self.tasks.cancel("albums")
+            self.status_var.set(f"Showing {len(self.albums)} releases of {self.artist_name}")
+            self._prefetch()
+            return
+        cache_before, _ = self._cache_summary()
+        api_mark = self.api_stats.mark(self.api_cache)
+        variants = VariantGroups()
+
+        def partial(by_type):
+            # Releases come in as they're hydrated; the listbox and chart are updated in throttled batches
+            self._pending_albums.extend(catalog.select(catalog.add(by_type), keyword_filter))
+            if len(self._pending_albums) >= ALBUM_FLUSH_COUNT:
+                self._flush_albums()
+            elif self._album_flush_id is None:
+                self._album_flush_id = self.after(ALBUM_FLUSH_MS, self._flush_albums)
+
+        def done(stats):
+            catalog.finish(missing)
+            catalog.add_variants(variants, stats["groups"])
+            self._flush_albums()
+            # Newly enabled types were appended while streaming, put everything back in discography order
+            albums = catalog.albums(release_types, keyword_filter, self.show_variants.get())
+            if not albums.same_rows(self.albums) or not albums or variants.collapsed:
+                self._show_albums(albums)
+            page_calls, lookup_calls = stats["pages"], stats["lookups"]
+            _, cache_text = self._cache_summary(since=cache_before)
+            self.status_var.set(
+                f"Loaded {len(self.albums)} releases of {self.artist_name} with {page_calls + lookup_calls} API calls "
+                f"({page_calls} discography pages, {lookup_calls} album lookups; {cache_text}; "
+                f"{variants.collapsed} duplicate editions collapsed)"
+            )
+            self._log_api_summary(f"fetch_albums {catalog.artist_id}", api_mark)
+            self.update_history_graph()
+            self._prefetch()
+            if self.show_variants.get():
+                self._fetch_variants()
+
+        self.tasks.submit("albums", self._fetch_albums_worker, catalog.artist_id, self.artist_name, missing,
+                          variants, self.settings.get("market") or None, on_done=done, on_partial=partial,
+                          on_progress=self._show_progress,
+                          on_error=lambda e: self._show_error(f"Album retrieval failed: {e}"))
+
+    def _fetch_albums_worker(self, task, artist_id, artist_name, release_types, variants, market):
+        # Runs on a worker thread. Every hydrated batch of releases goes to the UI right away,
+        # the call counters are returned at the end.
+        stats = {}
+        loaded = []
+        for by_type in self.core.iter_catalog(artist_id, release_types, task, stats, variants, market):
+            task.emit(by_type)
+            for albums in by_type.values():
+                loaded.extend((alb_id, alb_name, alb_pop) for alb_id, alb_name, alb_pop, alb_year in albums)
+        self._record_history(artist_id, artist_name, history.ALBUM, loaded)
+        return stats
+
+    def _toggle_variants(self):
+        if self.catalog is None:
+            return
+        if self.show_variants.get():
+            self._fetch_variants()
+        else:
+            self.tasks.cancel("variants")
+            self._show_albums(self.catalog.albums(self.settings.get("types", ["album"]), self.keyword_filter))
+
+    def _fetch_variants(self):
+        # Shows the collapsed editions too, hydrating the ones that haven't been loaded yet
+        catalog = self.catalog
+        keyword_filter = self.keyword_filter
+        release_types = self.settings.get("types", ["album"])
+        pending = catalog.unloaded_variants(release_types)
+        if not pending:
+            self._show_albums(catalog.albums(release_types, keyword_filter, True))
+            return
 
-            for album in items:
-                album_name = album.get("name", "")
-                if any(kw in album_name.lower() for kw in all_keywords):
-                    continue
+        def partial(by_type):
+            catalog.add(by_type, variant=True)
+
+        def done(stats):
+            self._show_albums(catalog.albums(release_types, keyword_filter, self.show_variants.get()))
+            self.status_var.set(f"Loaded {sum(len(pairs) for pairs in pending.values())} release variants of "
+                                f"{self.artist_name} with {stats.get('lookups', 0)} album lookups")
+
+        self.tasks.submit("variants", self._fetch_variants_worker, catalog.artist_id, self.artist_name, pending,
+                          on_done=done, on_partial=partial, on_progress=self._show_progress,
+                          on_error=lambda e: self._show_error(f"Variant retrieval failed: {e}"))
+
+    def _fetch_variants_worker(self, task, artist_id, artist_name, by_type):
+        stats = {}
+        loaded = []
+        for release_type, pairs in by_type.items():
+            for start in range(0, len(pairs), ALBUM_BATCH_SIZE):
+                task.progress(start, len(pairs), f"Loading {release_type} variants...")
+                albums = self.core.hydrate_albums(pairs[start:start + ALBUM_BATCH_SIZE], task, stats)
+                task.emit({release_type: albums})
+                loaded.extend((alb_id, alb_name, alb_pop) for alb_id, alb_name, alb_pop, alb_year in albums)
+        self._record_history(artist_id, artist_name, history.ALBUM, loaded)
+        return stats
+
+    def _album_entry(self, album):
+        # Listbox text of a release; representatives tell how many editions were collapsed into them
+        alb_id, alb_name, alb_pop, alb_year = album
+        text = f"{alb_name} ({alb_year}) [pop: {alb_pop}]"
+        if self.catalog.variant_of(alb_id):
+            return f"{text} [variant]"
+        count = self.catalog.variant_count(alb_id)
+        if count and not self.show_variants.get():
+            return f"{text} [+{count} variants]"
+        return text
+
+    def _show_albums(self, albums):
+        # albums is a columnar.AlbumView over the catalog, items are (id, name, popularity, year) tuples
+        self.albums = albums
+        self.albums_listbox.delete(0, tk.END)
+        self.albums_listbox.insert(tk.END, *(self._album_entry(album) for album in self.albums))
+        self.update_album_graph()
 
-                album_id = album["id"]
-                try:
-                    details = self.sp.album(album_id)
-                    pop = details.get("popularity", 0)
-                    release_date = details.get("release_date", "unknown")
-                    release_year = release_date.split("-")[0]
-                except Exception:
-                    pop = 0
-                    release_year = "????"
-                self.albums.append((album_id, album_name, pop, release_year))
-
-            offset += 50
-            if len(items) < 50:
-                break
-
-        for (alb_id, alb_name, alb_pop, alb_year) in self.albums:
-            display_str = f"{alb_name} ({alb_year}) [pop: {alb_pop}]"
-            self.albums_listbox.insert(tk.END, display_str)
+    def _cancel_album_flush(self):
+        if self._album_flush_id is not None:
+            self.after_cancel(self._album_flush_id)
+            self._album_flush_id = None
 
+    def _flush_albums(self):
+        # Appends the releases that arrived since the last flush and redraws the chart once for all of them
+        self._cancel_album_flush()
+        if not self._pending_albums:
+            return
+        rows, self._pending_albums = self._pending_albums, []
+        self.albums.extend(rows)
+        batch = self.catalog.releases.rows(rows)
+        self.albums_listbox.insert(tk.END, *(self._album_entry(album) for album in batch))
         self.update_album_graph()
 
     def update_album_graph(self):
-        self.album_ax.clear()
+        # The chart keeps its bars and only redraws when Tk is idle, so calling this often is cheap.
+        # Big discographies show the top releases plus an "Others" bar (scroll the chart for more).
+        self._ensure_album_chart()
         if not self.albums:
-            self.album_ax.set_title("No Albums Found")
-            self.album_canvas.draw()
+            self.album_chart.clear("No Albums Found")
             return
-        sorted_albums = sorted(self.albums, key=lambda x: x[2], reverse=True)
+        sorted_albums = self.albums.top()
         names = [f"{a[1]} ({a[3]})" for a in sorted_albums]
         pops = [a[2] for a in sorted_albums]
-        self.album_ax.barh(names, pops, color="skyblue")
-        self.album_ax.invert_yaxis()  # Highest popularity at the top
-        self.album_ax.set_title(f"{self.artist_name} - Albums")
-        self.album_ax.set_xlabel("Popularity")
-        self.album_canvas.draw()
+        self.album_chart.set_data(names, pops, f"{self.artist_name} - Albums", keep_offset=True)
 
     def on_select_album(self, event):
         # This function is triggered when an album is selected from the discography listbox.
@@ -471,32 +1030,65 @@ class SpotifyAnalyzer(tk.Tk):
         if idx >= len(self.albums):
             return
         album_id, album_name, alb_pop, alb_year = self.albums[idx]
-        try:
-            album_tracks = self.sp.album_tracks(album_id, limit=50)['items']
-        except Exception as e:
-            messagebox.showerror("Error", f"Track retrieval failed: {e}")
+        self.current_album = (album_id, album_name)
+        catalog = self.catalog
+        prefetched = self.tracklists.record_open(album_id)
+
+        # Albums that were opened or prefetched before are shown straight from memory
+        tracks = catalog.album_tracks(album_id, self.keyword_filter)
+        if tracks is not None:
+            self.tasks.cancel("tracks")
+            self._show_tracks(album_name, tracks)
+            if prefetched:
+                self.status_var.set(f"Loaded {len(tracks)} tracks of '{album_name}' (prefetched)")
+            self._prefetch(idx)
             return
-        self.current_album_tracks = []
-        # List of keywords for filtering tracks
-        filter_keywords = ["live", "remastered", "re-issue", "reissue", "demo"]
-        for track in album_tracks:
-            track_name = track.get("name", "")
-            # Skip tracks whose name contains any of the filtered keywords
-            # You can modify the keyword list or comment this section if you want to look through all albums
-            if any(keyword in track_name.lower() for keyword in filter_keywords):
-                continue
-            track_id = track["id"]
-            try:
-                full_track = self.sp.track(track_id)
-                track_pop = full_track.get("popularity", 0)
-            except Exception:
-                track_pop = 0
-            self.current_album_tracks.append({
-                "id": track_id,
-                "name": track_name,
-                "popularity": track_pop
-            })
+
+        def done(tracks):
+            catalog.tracks[album_id] = tracks
+            self._show_tracks(album_name, catalog.album_tracks(album_id, self.keyword_filter))
+
+        # Only the last selected album gets fetched: the short delay swallows arrow-key bursts
+        # and a newer selection cancels whatever is still loading
+        self.tasks.submit("tracks", self._fetch_tracks_worker, album_id, album_name, self.artist_id,
+                          self.artist_name, delay_ms=150, on_done=done, on_progress=self._show_progress,
+                          on_error=lambda e: self._show_error(f"Track retrieval failed: {e}"))
+        self._prefetch(idx)
+
+    def _fetch_tracks_worker(self, task, album_id, album_name, artist_id, artist_name):
+        # The whole tracklist is loaded, the keyword filter is applied on the main thread
+        task.progress(0, text=f"Loading tracks of '{album_name}'...")
+        tracks = self.core.fetch_album_tracks(album_id, None, task)
+        self._record_history(artist_id, artist_name, history.TRACK, [(t["id"], t["name"], t["popularity"]) for t in tracks])
+        return tracks
+
+    def _prefetch(self, selected=None):
+        # Queues the tracklists most likely to be opened next: the neighbours of the selection and
+        # the most popular releases. A snapshot reads its tracklists from the mapped file, nothing to prefetch.
+        if not self.albums or self.snapshot is not None:
+            self.prefetcher.cancel()
+            return
+        artist_id, artist_name = self.artist_id, self.artist_name
+
+        def fetch(task, album_id, album_name):
+            return self._fetch_tracks_worker(task, album_id, album_name, artist_id, artist_name)
+
+        self.prefetcher.schedule(prefetch.plan(self.albums, selected), fetch)
+
+    def _show_tracks(self, album_name, tracks):
+        self.current_album_tracks = tracks
         self._update_track_graph(album_name, self.current_album_tracks)
+        self.update_history_graph()
+        self.status_var.set(f"Loaded {len(tracks)} tracks of '{album_name}'")
+
+    def _refilter_tracks(self):
+        # Re-applies the keyword filter to the open album after a settings change
+        if not self.current_album:
+            return
+        album_id, album_name = self.current_album
+        tracks = self.catalog.album_tracks(album_id, self.keyword_filter)
+        if tracks is not None:
+            self._show_tracks(album_name, tracks)
 
     def delete_selected_album(self, event):
         # this functions allows you to delete selected item in discography. it also updates graphs.
@@ -504,38 +1096,67 @@ class SpotifyAnalyzer(tk.Tk):
         if not selection:
             return
         idx = selection[0]
-        # Remove the album from the internal list
+        self.tasks.cancel("tracks")
+        # Remove the album from the internal list (and keep it hidden when the settings change).
+        # Both just mask the row, nothing gets rebuilt.
+        self.catalog.remove(self.albums.index()[idx])
         del self.albums[idx]
         # Update the listbox
-        self.albums_listbox.delete(0, tk.END)
-        for (alb_id, alb_name, alb_pop, alb_year) in self.albums:
-            display_str = f"{alb_name} ({alb_year}) [pop: {alb_pop}]"
-            self.albums_listbox.insert(tk.END, display_str)
+        self.albums_listbox.delete(idx)
         # Update the album graph
         self.update_album_graph()
         # Clear the track graph since
+        self.current_album = None
         self.current_album_tracks = []
-        self.track_ax.clear()
-        self.track_ax.set_title("Track Popularity")
-        self.track_canvas.draw()
+        self._clear_track_graph()
+        self.update_history_graph()
 
     def _update_track_graph(self, album_name, track_list):
         # Updates the track popularity bar chart using the track data for the selected album
-        self.track_ax.clear()
+        self._ensure_track_chart()
         if not track_list:
-            self.track_ax.set_title("No Tracks Found")
-            self.track_canvas.draw()
+            self.track_chart.clear("No Tracks Found")
             return
         sorted_tracks = sorted(track_list, key=lambda x: x["popularity"], reverse=True)
         track_names = [t["name"] for t in sorted_tracks]
         track_pops = [t["popularity"] for t in sorted_tracks]
-        self.track_ax.barh(track_names, track_pops, color="orange")
-        self.track_ax.invert_yaxis()  # Highest popularity at the top
-        self.track_ax.set_xlabel("Popularity")
-        self.track_ax.set_title(f"Tracks in '{album_name}'")
-        self.track_canvas.draw()
+        self.track_chart.set_data(track_names, track_pops, f"Tracks in '{album_name}'")
 
     def show_raw_data(self):
+        # The window opens straight away with the releases and tracks the app holds; the details only Spotify
+        # has are fetched for each page of it as it gets rendered (see raw_data.py)
+        report = RawDataReport(self.artist_id, self.artist_name, self.albums, self.current_album_tracks,
+                               self.artist_info)
+        self._open_raw_data_window(report)
+
+    def _load_raw_details(self, report, start=0, stop=None, then=None):
+        # Fetches what blocks start:stop of the report still miss, then() runs once they're merged in
+        artist_wanted, album_ids, track_ids = report.missing(start, stop)
+        if not (artist_wanted or album_ids or track_ids):
+            if then:
+                then()
+            return
+
+        def done(details):
+            report.update(details)
+            if then:
+                then()
+
+        self.tasks.submit(self._raw_data_key(report, start), self._raw_data_worker, self.core,
+                          report.artist_id if artist_wanted else None, album_ids, track_ids,
+                          on_done=done, on_progress=self._show_progress,
+                          on_error=lambda e: self._show_error(f"Loading raw data failed: {e}"))
+
+    @staticmethod
+    def _raw_data_key(report, start):
+        # One task per report and page: a page that's still loading doesn't hold up the next one
+        return f"raw_data:{id(report)}:{start}"
+
+    def _raw_data_worker(self, task, core, artist_id, album_ids, track_ids):
+        # The runner passes the task first, collect_raw_details takes it last
+        return core.collect_raw_details(artist_id, album_ids, track_ids, task)
+
+    def _open_raw_data_window(self, report):
         raw_win = tk.Toplevel(self)
         if hasattr(sys, "_MEIPASS"):
             base_path = sys._MEIPASS
@@ -576,246 +1197,474 @@ class SpotifyAnalyzer(tk.Tk):
         button_frame = ttk.Frame(raw_win)
         button_frame.pack(pady=5)
 
-        def ms_to_minsec(ms):
-            minutes = ms // 60000
-            seconds = (ms % 60000) // 1000
-            return f"{minutes}:{seconds:02d}"
-
-        def insert(line, tag=None):
-            text_area.insert(tk.END, line + "\n", tag)
-
         def copy_all():
-            text = text_area.get("1.0", tk.END).strip()
-            raw_win.clipboard_clear()
-            raw_win.clipboard_append(text)
-            messagebox.showinfo("Copied", "Raw data copied to clipboard.")
+            # From the report itself, the widget may only hold the part that was scrolled to.
+            # The pages that were never shown get their details first.
+            def copy():
+                redraw(0, shown[0])
+                raw_win.clipboard_clear()
+                raw_win.clipboard_append(report.text())
+                messagebox.showinfo("Copied", "Raw data copied to clipboard.")
+            self._load_raw_details(report, then=copy)
 
         def export_to_txt():
-            content = text_area.get("1.0", tk.END).strip()
             file_path = filedialog.asksaveasfilename(
                 defaultextension=".txt",
                 filetypes=[("Text files", "*.txt"), ("All files", "*.*")],
                 title="Save Raw Data"
             )
-            if file_path:
+            if not file_path:
+                return
+
+            def write():
+                redraw(0, shown[0])
                 try:
                     with open(file_path, "w", encoding="utf-8") as f:
-                        f.write(content)
+                        report.write(f)
                     messagebox.showinfo("Saved", f"Raw data exported to:\n{file_path}")
                 except Exception as e:
                     messagebox.showerror("Error", f"Failed to save file:\n{e}")
-
-        def export_to_json():
-            json_data = {
-                "artist_info": {},
-                "albums": [],
-                "tracks": []
-            }
-
-            if self.artist_id:
-                try:
-                    artist = self.sp.artist(self.artist_id)
-                    json_data["artist_info"] = {
-                        "name": self.artist_name,
-                        "genres": artist.get("genres", []),
-                        "followers": artist.get("followers", {}).get("total", 0),
-                        "spotify_url": artist.get("external_urls", {}).get("spotify", "")
-                    }
-                except:
-                    pass
-
-            for alb_id, alb_name, alb_pop, alb_year in self.albums:
-                try:
-                    album = self.sp.album(alb_id)
-                    json_data["albums"].append({
-                        "id": alb_id,
-                        "name": alb_name,
-                        "popularity": alb_pop,
-                        "release_date": album.get("release_date", "N/A"),
-                        "spotify_url": album.get("external_urls", {}).get("spotify", "")
-                    })
-                except:
-                    continue
-
-            if self.current_album_tracks:
-                track_ids = [t["id"] for t in self.current_album_tracks]
-                try:
-                    features = self.sp.audio_features(track_ids)
-                except:
-                    features = [None] * len(track_ids)
-
-                for t, f in zip(self.current_album_tracks, features):
-                    track_json = {
-                        "id": t["id"],
-                        "name": t["name"],
-                        "popularity": t["popularity"],
-                        "duration_ms": t.get("duration_ms", None),
-                        "duration": ms_to_minsec(t["duration_ms"]) if t.get("duration_ms") else "N/A",
-                        "spotify_url": t.get("external_urls", {}).get("spotify", "N/A")
-                    }
-                    if f:
-                        track_json["tempo"] = f.get("tempo", "N/A")
-                        track_json["valence"] = f.get("valence", "N/A")
-                    json_data["tracks"].append(track_json)
-
-            file_path = filedialog.asksaveasfilename(
-                defaultextension=".json",
-                filetypes=[("JSON files", "*.json"), ("All files", "*.*")],
-                title="Export as JSON"
-            )
-            if file_path:
-                try:
-                    with open(file_path, "w", encoding="utf-8") as f:
-                        json.dump(json_data, f, indent=2)
-                    messagebox.showinfo("Saved", f"JSON exported to:\n{file_path}")
-                except Exception as e:
-                    messagebox.showerror("Error", f"Failed to export JSON:\n{e}")
+            self._load_raw_details(report, then=write)
 
         ttk.Button(button_frame, text="Copy All", command=copy_all).pack(side=tk.LEFT, padx=10)
         ttk.Button(button_frame, text="Export to .txt", command=export_to_txt).pack(side=tk.LEFT, padx=10)
-        ttk.Button(button_frame, text="Export as JSON", command=export_to_json).pack(side=tk.LEFT, padx=10)
+        ttk.Button(button_frame, text="Export as JSON", command=self.export_discography).pack(side=tk.LEFT, padx=10)
+        self.status_var.set("Ready")
+
+        # Populate text area: one page of blocks at a time, the next page once the user scrolls near the end.
+        # Every block carries a "block<i>" tag, so a page can be redrawn in place once its details arrive.
+        def page_chunks(start, stop):
+            chunks = []
+            for i in range(start, stop):
+                for line, tag in report.block(i):
+                    chunks += [line + "\n", (tag, f"block{i}") if tag else f"block{i}"]
+            return chunks
+
+        def render_page():
+            start = shown[0]
+            stop = min(start + RAW_DATA_PAGE_BLOCKS, len(report.items))
+            if start >= stop:
+                return False
+            # One insert call for the whole page
+            text_area.insert(tk.END, *page_chunks(start, stop))
+            shown[0] = stop
+            self._load_raw_details(report, start, stop, then=lambda: redraw(start, stop))
+            return True
+
+        def redraw(start, stop):
+            if start >= stop or not raw_win.winfo_exists():
+                return
+            first = text_area.index(f"block{start}.first")
+            view = text_area.yview()[0]
+            text_area.delete(first, f"block{stop - 1}.last")
+            text_area.insert(first, *page_chunks(start, stop))
+            text_area.yview_moveto(view)
+
+        def on_yscroll(first, last):
+            text_area.vbar.set(first, last)
+            if float(last) > 0.9 and not pending[0]:
+                pending[0] = raw_win.after_idle(load_more)
+
+        def load_more():
+            pending[0] = None
+            if not render_page():
+                text_area.config(yscrollcommand=text_area.vbar.set)
+
+        def on_destroy(event):
+            # Details still loading for this window are of no use anymore
+            if event.widget is raw_win:
+                for start in range(0, shown[0], RAW_DATA_PAGE_BLOCKS):
+                    self.tasks.cancel(self._raw_data_key(report, start))
+
+        shown = [0]  # blocks rendered so far
+        pending = [None]
+        raw_win.bind("<Destroy>", on_destroy)
+        text_area.config(yscrollcommand=on_yscroll)
+        render_page()
 
-        # Populate text area
-        if not self.artist_id:
-            insert("Albums: No album data available.", "error")
-            insert("Tracks: No track data available.", "error")
+    def export_popularity(self):
+        if not self.artist_id or not self.albums:
+            messagebox.showinfo("Info", "Please search and select an artist first.")
             return
-
-        try:
-            artist_info = self.sp.artist(self.artist_id)
-            insert("Artist Info:")
-            insert(f"  Name: {self.artist_name}")
-            insert(f"  Genres: {', '.join(artist_info.get('genres', []))}")
-            insert(f"  Followers: {artist_info['followers']['total']}")
-            insert(f"  Spotify URL: {artist_info['external_urls']['spotify']}")
-            insert("")
-        except Exception as e:
-            insert(f"Error loading artist info: {e}", "error")
-            insert("")
-
-        if not self.albums:
-            insert("Albums: No album data available.", "error")
-            insert("Tracks: No track data available.", "error")
+        # The file is picked first: albums are written to it as soon as they're loaded
+        save_path = filedialog.asksaveasfilename(
+            defaultextension=".txt",
+            filetypes=[("Text files", "*.txt"), ("All files", "*.*")],
+            title="Save Popularity Export"
+        )
+        if not save_path:
             return
-
-        insert("Albums:")
-        for alb_id, alb_name, alb_pop, alb_year in self.albums:
-            try:
-                album_data = self.sp.album(alb_id)
-                insert(f"  • {alb_name} ({alb_year})")
-                insert(f"     ID: {alb_id}")
-                insert(f"     Popularity: {alb_pop}")
-                insert(f"     Release date: {album_data.get('release_date', 'N/A')}")
-                insert(f"     Spotify URL: {album_data['external_urls']['spotify']}")
-                insert("")
-            except Exception as e:
-                insert(f"  • {alb_name} — Error fetching album details: {e}", "error")
-                insert("")
-
-        if not self.current_album_tracks:
-            insert("Tracks: No track data available.", "error")
-            return
-
-        insert("Tracks:")
-        track_ids = [t["id"] for t in self.current_album_tracks]
-        try:
-            features_list = self.sp.audio_features(track_ids)
-        except Exception as e:
-            features_list = [None] * len(track_ids)
-            insert(f"(Audio features not loaded: {e})", "error")
-            insert("")
-
-        for t, f in zip(self.current_album_tracks, features_list):
-            insert(f"  • {t['name']}")
-            insert(f"     ID: {t['id']}")
-            insert(f"     Popularity: {t['popularity']}")
-            dur = t.get("duration_ms", None)
-            insert(f"     Duration: {ms_to_minsec(dur)} ({dur} ms)" if dur else "     Duration: N/A")
-            insert(f"     Spotify URL: {t.get('external_urls', {}).get('spotify', 'N/A')}")
-            if f:
-                insert(f"     Tempo: {f.get('tempo', 'N/A')}")
-                insert(f"     Valence: {f.get('valence', 'N/A')}")
+        job = PopularityExport(self.core, self.artist_id, self.artist_name, self.albums, self.settings, save_path)
+        resume = False
+        done_before = job.resumable()
+        if done_before:
+            answer = messagebox.askyesnocancel(
+                "Resume Export", f"An earlier export to this file stopped after {done_before} of "
+                                 f"{len(job.albums)} albums.\n\nContinue where it stopped? (No starts over)")
+            if answer is None:
+                return
+            resume = answer
+        api_mark = self.api_stats.mark(self.api_cache)
+
+        def done(result):
+            self.status_var.set("Ready")
+            self._log_api_summary(f"export_popularity {self.artist_id}", api_mark)
+            if result["errors"]:
+                messagebox.showwarning("Export Incomplete",
+                                       f"Data exported to:\n{save_path}\n\n{result['errors']} albums could not be "
+                                       f"loaded. Export to the same file again to retry them.")
             else:
-                insert("     No audio features available.", "error")
-            insert("")
+                messagebox.showinfo("Export Complete", f"Data exported to:\n{save_path}")
 
-    def export_popularity(self):
+        def failed(error):
+            self._log_api_summary(f"export_popularity {self.artist_id} (failed)", api_mark)
+            self._show_error(f"Export failed: {error}\nExport to the same file again to continue where it stopped.")
+
+        self.tasks.submit("export", job.run, resume, on_done=done, on_progress=self._show_progress, on_error=failed)
+
+    def export_discography(self):
+        # Artist, every listed album and all of their tracks (popularity, duration, audio features)
         if not self.artist_id or not self.albums:
             messagebox.showinfo("Info", "Please search and select an artist first.")
             return
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".json",
+            filetypes=[("JSON files", "*.json"), ("NDJSON files", "*.ndjson *.jsonl"), ("All files", "*.*")],
+            title="Export as JSON"
+        )
+        if not file_path:
+            return
+        job = DiscographyExport(self.core, self.artist_id, list(self.albums), file_path)
+        api_mark = self.api_stats.mark(self.api_cache)
 
-        count_option = self.settings.get("albums_to_export", "3")
-        export_num = len(self.albums) if count_option == "All" else min(int(count_option), len(self.albums))
-
-        reverse_order = self.settings.get("sort_order", "Descending") == "Descending"
-        sorted_albums = sorted(self.albums, key=lambda x: x[2], reverse=reverse_order)
-        top_albums = sorted_albums[:export_num]
+        def done(result):
+            self._log_api_summary(f"export_discography {self.artist_id}", api_mark)
+            self.status_var.set(f"Exported {result['albums']} albums and {result['tracks']} tracks")
+            messagebox.showinfo("Saved", f"JSON exported to:\n{file_path}")
 
-        dt = datetime.datetime.now().astimezone()
-        all_keywords = self._get_expanded_keywords()
+        self.tasks.submit("json_export", job.run, on_done=done, on_progress=self._show_progress,
+                          on_error=lambda e: self._show_error(f"Failed to export JSON:\n{e}"))
 
+    def save_snapshot(self):
+        # The whole catalog of the artist with every tracklist and the audio features, for opening offline later
+        if not self.artist_id or self.catalog is None:
+            messagebox.showinfo("Info", "Please search and select an artist first.")
+            return
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=snapshot.EXTENSION,
+            filetypes=[("Snapshot bundles", f"*{snapshot.EXTENSION}"), ("All files", "*.*")],
+            title="Save Snapshot"
+        )
+        if not file_path:
+            return
+        core, catalog, settings = self.core, self.catalog, dict(self.settings)
+        api_mark = self.api_stats.mark(self.api_cache)
+
+        def done(result):
+            self._log_api_summary(f"save_snapshot {catalog.artist_id}", api_mark)
+            self.status_var.set(f"Saved {result['albums']} releases and {result['tracks']} tracks "
+                                f"({result['bytes'] / 2 ** 20:.1f} MB) to {os.path.basename(file_path)}")
+
+        self.tasks.submit("snapshot", lambda task: snapshot.save(core, catalog, file_path, settings, task),
+                          on_done=done, on_progress=self._show_progress,
+                          on_error=lambda e: self._show_error(f"Failed to save snapshot:\n{e}"))
+
+    def open_snapshot(self, path=None):
+        # A saved artist comes back from the bundle alone: no requests, no credentials needed.
+        # Charts, exports and the Raw Data window read from it until another artist is selected.
+        path = path or filedialog.askopenfilename(
+            filetypes=[("Snapshot bundles", f"*{snapshot.EXTENSION}"), ("All files", "*.*")],
+            title="Open Snapshot"
+        )
+        if not path:
+            return
+        started = time.perf_counter()
         try:
-            artist_info = self.sp.artist(self.artist_id)
-            genres = artist_info.get("genres", [])
-            genre_str = ", ".join(sorted(set(genres))) if genres else "N/A"
-        except:
-            genre_str = "N/A"
-
-        lines = []
-        lines.append(f"Popularity Export for Artist: {self.artist_name}")
-        lines.append(f"Date/Time (Local): {dt.strftime('%Y-%m-%d %H:%M:%S %Z')}")
-        lines.append(f"Genre: {genre_str}")
-        lines.append(f"The most popular song: ")
-        lines.append(f"Stream Count: ")
-        lines.append("Source: Spotify API — https://www.spotify.com\n")
-
-        for (alb_id, alb_name, alb_pop, alb_year) in top_albums:
-            lines.append(f"Album: {alb_name} ({alb_year}), Popularity: {alb_pop}")
-            try:
-                album_tracks = self.sp.album_tracks(alb_id, limit=50)['items']
-            except Exception as e:
-                lines.append(f"  Error fetching tracks: {e}\n")
-                continue
-
-            track_data = []
-            for tr in album_tracks:
-                tr_name = tr.get("name", "")
-                if any(kw in tr_name.lower() for kw in all_keywords):
-                    continue
-                tr_id = tr["id"]
-                try:
-                    full_tr = self.sp.track(tr_id)
-                    tr_pop = full_tr.get("popularity", 0)
-                except Exception:
-                    tr_pop = 0
-                track_data.append((tr_name, tr_pop))
+            bundle = snapshot.Snapshot(path)
+        except (OSError, ValueError, KeyError) as e:
+            self._show_error(f"Could not open snapshot:\n{e}")
+            return
+        # Whatever was loading for the previous artist is stale now
+        for key in ("artist", "albums", "variants", "tracks"):
+            self.tasks.cancel(key)
+        self.prefetcher.cancel()
+        self._close_snapshot()
+        self.snapshot = bundle
+        self.core = AnalyzerCore(snapshot.SnapshotSpotify(bundle))
+        self._apply_network_settings()
+        self.artist_id = bundle.artist_id
+        self.artist_name = bundle.artist_name
+        self.artist_info = None
+        self.settings = dict(DEFAULT_SETTINGS, **bundle.settings)
+        self.keyword_filter = KeywordFilter.from_settings(self.settings)
+        # Tracklists of a snapshot stay out of the shared cache, they'd pass for current ones otherwise
+        self.catalog = bundle.catalog()
+        self.current_album = None
+        self.current_album_tracks = []
+        self._clear_track_graph()
+        self.title(f"{APP_TITLE} - {self.artist_name} (snapshot, offline)")
+        self.fetch_albums()
+        saved = time.strftime("%Y-%m-%d %H:%M", time.localtime(bundle.created))
+        self.status_var.set(f"Opened the snapshot of {self.artist_name} from {saved}: {len(self.albums)} releases, "
+                            f"{bundle.track_count} tracks in {(time.perf_counter() - started) * 1000:.0f} ms")
 
-            track_data.sort(key=lambda x: x[1], reverse=reverse_order)
+    def _close_snapshot(self):
+        if self.snapshot is None:
+            return
+        self.snapshot.close()
+        self.snapshot = None
+        self.core = self.live_core
+        self.title(APP_TITLE)
 
-            track_limit = self.settings.get("tracks_to_export", "3")
-            top_tracks = track_data if track_limit == "All" else track_data[:int(track_limit)]
+    # ------------------------------
+    # Artist comparison
+    # ------------------------------
+    def _show_matches_menu(self, menu, event):
+        idx = self.matches_listbox.nearest(event.y)
+        if idx < len(self.matches):
+            self.matches_listbox.activate(idx)
+            menu.tk_popup(event.x_root, event.y_root)
+
+    def _compare_match(self):
+        idx = self.matches_listbox.index(tk.ACTIVE)
+        if idx < len(self.matches):
+            self.add_to_comparison(self.matches[idx]["id"], self.matches[idx]["name"])
+
+    def add_to_comparison(self, artist_id, artist_name):
+        # Only the new artist gets loaded; the selected artist brings along what the main window has already
+        if artist_id in self.comparison:
+            self.status_var.set(f"{artist_name} is compared already")
+            self.open_comparison_window()
+            return
+        catalog = self.catalog.copy() if artist_id == self.artist_id and self.catalog is not None else None
+        if not self.comparison.add(artist_id, artist_name, catalog):
+            self._show_error(f"At most {self.comparison.max_artists} artists can be compared at once.")
+            return
+        if self._comparison_view is not None:
+            self._load_comparison()
+        # Opening the window loads whatever is missing
+        self.open_comparison_window()
+
+    def _cancel_comparison(self):
+        for key in set(self._comparison_loading.values()):
+            self.tasks.cancel(key)
+        self._comparison_loading = {}
+
+    def _load_comparison(self, restart=False):
+        # Loads what the compared artists miss for the current settings, all of them concurrently.
+        # Artists that are loading already are left alone unless restart (the settings changed).
+        if restart:
+            self._cancel_comparison()
+        release_types = self.settings.get("types", ["album"])
+        loading = {artist_id for artist_id, key in self._comparison_loading.items() if self.tasks.is_running(key)}
+        pending = self.comparison.start(release_types, loading)
+        self._refresh_comparison()
+        if not pending:
+            return
+        if self.live_core is None:
+            self._show_error("Loading artists for the comparison needs a connection to Spotify.")
+            return
+        catalogs = {artist_id: self.comparison.catalog(artist_id) for artist_id in pending}
+        names = {artist_id: self.comparison.name(artist_id) for artist_id in pending}
+        core = self.comparison.core(self.live_core)
+        requested, shared = core.sp.requested, core.sp.shared
+        api_mark = self.api_stats.mark(self.api_cache)
+        failed = []
+
+        def partial(event):
+            artist_id, by_type, result = event
+            catalog = catalogs[artist_id]
+            if by_type:
+                catalog.add(by_type)
+            elif isinstance(result, Exception):
+                failed.append(f"{names[artist_id]}: {result}")
+            else:
+                catalog.finish(pending[artist_id])
+                catalog.add_variants(result["variants"], result["stats"]["groups"])
+                self._refresh_comparison()
+
+        def finished():
+            for artist_id in pending:
+                if self._comparison_loading.get(artist_id) == key:
+                    del self._comparison_loading[artist_id]
+
+        def done(_):
+            finished()
+            self._refresh_comparison()
+            self._log_api_summary(f"compare {len(pending)} artists", api_mark)
+            text = (f"Loaded {len(pending) - len(failed)} of {len(pending)} artists for the comparison "
+                    f"({core.sp.requested - requested} album lookups, {core.sp.shared - shared} shared "
+                    f"between artists)")
+            if failed:
+                self._show_error(text + "\n\nFailed:\n" + "\n".join(failed))
+            else:
+                self.status_var.set(text)
+
+        def error(e):
+            finished()
+            self._show_error(f"Comparison failed: {e}")
+
+        key = f"compare-{next(self._comparison_keys)}"
+        self._comparison_loading.update((artist_id, key) for artist_id in pending)
+        self.tasks.submit(key, self._compare_worker, core, pending, names, self.settings.get("market") or None,
+                          on_done=done, on_partial=partial, on_progress=self._show_progress, on_error=error)
+
+    def _compare_worker(self, task, core, pending, names, market):
+        loaded = {}
+        for event in comparison.iter_catalogs(core, pending, task, market):
+            task.emit(event)
+            artist_id, by_type, result = event
+            if by_type:
+                loaded.setdefault(artist_id, []).extend((alb_id, alb_name, alb_pop) for albums in by_type.values()
+                                                        for alb_id, alb_name, alb_pop, _ in albums)
+            elif not isinstance(result, Exception):
+                self._record_history(artist_id, names[artist_id], history.ALBUM, loaded.pop(artist_id, []))
+
+    def _refresh_comparison(self):
+        if self._comparison_view is not None:
+            self._comparison_view()
+
+    def open_comparison_window(self):
+        if self._comparison_win is not None and self._comparison_win.winfo_exists():
+            self._comparison_win.lift()
+            self._refresh_comparison()
+            return
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
+        comp_win = tk.Toplevel(self)
+        self._comparison_win = comp_win
+        if hasattr(sys, "_MEIPASS"):
+            base_path = sys._MEIPASS
+        else:
+            base_path = os.path.abspath(".")
+        comp_win.iconbitmap(os.path.join(base_path, "ico.ico"))
+        comp_win.title("Compare Artists")
+        comp_win.geometry("1150x600")
+
+        paned = tk.PanedWindow(comp_win, orient=tk.HORIZONTAL, sashrelief=tk.RAISED)
+        paned.pack(fill=tk.BOTH, expand=True)
+        left_frame = ttk.Frame(paned)
+        paned.add(left_frame, minsize=330)
+        # Artists come from the local artist index and the search results, double-click or Enter adds one;
+        # right-click on the main window's matches works too
+        ttk.Label(left_frame, text="Find artist:").pack(anchor=tk.NW)
+        find_entry = ttk.Entry(left_frame)
+        find_entry.pack(fill=tk.X)
+        found_listbox = tk.Listbox(left_frame, height=6)
+        found_listbox.pack(fill=tk.X)
+        ttk.Label(left_frame, text="Compared artists:").pack(anchor=tk.NW, pady=(10, 0))
+        columns = [("releases", "Releases", 55), ("median", "Median", 50), ("iqr", "IQR", 55), ("max", "Max", 40),
+                   ("top", "Top release", 120)]
+        table = ttk.Treeview(left_frame, columns=[c[0] for c in columns], height=10)
+        table.heading("#0", text="Artist")
+        table.column("#0", width=120)
+        for name, title, width in columns:
+            table.heading(name, text=title)
+            table.column(name, width=width, anchor=tk.W if name == "top" else tk.E)
+        table.pack(fill=tk.BOTH, expand=True)
+
+        chart_frame = ttk.Frame(paned)
+        paned.add(chart_frame, minsize=500)
+        fig = Figure(figsize=(8, 4), dpi=100)
+        fig.subplots_adjust(bottom=0.22, wspace=0.25)
+        canvas = FigureCanvasTkAgg(fig, master=chart_frame)
+        canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=True)
+        toolbar = NavigationToolbar2Tk(canvas, chart_frame)
+        toolbar.update()
+        toolbar.pack(side=tk.BOTTOM, fill=tk.X)
+        chart = ComparisonChart(fig.add_subplot(121), fig.add_subplot(122), canvas)
+        found = []
+
+        def find(event=None):
+            query = find_entry.get().strip()
+            if self.artist_search is not None and len(query) >= TYPEAHEAD_MIN_CHARS:
+                found[:] = self.artist_search.matches(query, 20)
+            else:
+                found[:] = self.matches
+            found_listbox.delete(0, tk.END)
+            found_listbox.insert(tk.END, *(f"{artist['name']} ({artist['id']})" for artist in found))
+
+        def add_found(event=None):
+            selection = found_listbox.curselection()
+            if selection and selection[0] < len(found):
+                self.add_to_comparison(found[selection[0]]["id"], found[selection[0]]["name"])
+
+        def add_current():
+            if not self.artist_id:
+                messagebox.showinfo("Info", "Please search and select an artist first.", parent=comp_win)
+                return
+            self.add_to_comparison(self.artist_id, self.artist_name)
 
-            for (t_name, t_pop) in top_tracks:
-                lines.append(f"   Track: {t_name}, Popularity: {t_pop}, Stream Count: ")
-            lines.append("")
+        def remove_selected():
+            for artist_id in table.selection():
+                self.comparison.remove(artist_id)
+                self._comparison_loading.pop(artist_id, None)
+            self._refresh_comparison()
 
-        output_text = "\n".join(lines)
-        save_path = filedialog.asksaveasfilename(
-            defaultextension=".txt",
-            filetypes=[("Text files", "*.txt"), ("All files", "*.*")],
-            title="Save Popularity Export"
-        )
-        if not save_path:
-            return
-        try:
-            with open(save_path, "w", encoding="utf-8") as f:
-                f.write(output_text)
-            messagebox.showinfo("Export Complete", f"Data exported to:\n{save_path}")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to write file: {e}")
+        def render():
+            if not comp_win.winfo_exists():
+                return
+            rows = self.comparison.distributions(self.settings.get("types", ["album"]), self.keyword_filter)
+            table.delete(*table.get_children())
+            for artist_id, name, popularity, top in rows:
+                stats = comparison.summary(popularity)
+                if stats is None:
+                    values = ["-"] * len(columns)
+                else:
+                    values = [stats["releases"], f"{stats['median']:.0f}", f"{stats['p25']:.0f}-{stats['p75']:.0f}",
+                              stats["max"], f"{top[0][1]} ({top[0][2]})"]
+                table.insert("", tk.END, iid=artist_id, text=name, values=values)
+            chart.show([(name, popularity, [(album[1], album[2]) for album in top])
+                        for _, name, popularity, top in rows])
+
+        def close():
+            # Whatever is still loading gets picked up again the next time
+            self._cancel_comparison()
+            self._comparison_view = None
+            comp_win.destroy()
+
+        find_entry.bind("<KeyRelease>", find)
+        found_listbox.bind("<Double-Button-1>", add_found)
+        found_listbox.bind("<Return>", add_found)
+        table.bind("<Delete>", lambda event: remove_selected())
+        button_frame = ttk.Frame(left_frame)
+        button_frame.pack(pady=5)
+        ttk.Button(button_frame, text="Add Current Artist", command=add_current).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="Remove", command=remove_selected).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="Close", command=close).pack(side=tk.LEFT, padx=5)
+        comp_win.protocol("WM_DELETE_WINDOW", close)
+        self._comparison_view = render
+        find()
+        self._load_comparison()
+
+
+def _cache_dir():
+    base = os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "SpotifyPopularityAnalyzer")
+
+
+def _load_splash_image(master, splash_path, max_w=800, max_h=600):
+    # Decoding and LANCZOS-resizing the full-size PNG takes a while, so it's done once with PIL and the
+    # result is cached as a small PNG that Tk can load by itself on every later launch
+    cache_path = os.path.join(_cache_dir(), f"splash_{os.path.getsize(splash_path)}_{max_w}x{max_h}.png")
+    if os.path.exists(cache_path):
+        return tk.PhotoImage(master=master, file=cache_path)
+    from PIL import Image, ImageTk
+    splash_img = Image.open(splash_path)
+    w, h = splash_img.size
+    scale = min(max_w / w, max_h / h)
+    new_size = (int(w * scale), int(h * scale))
+    splash_img = splash_img.resize(new_size, Image.LANCZOS)
+    try:
+        os.makedirs(_cache_dir(), exist_ok=True)
+        splash_img.save(cache_path)
+    except OSError as e:
+        log.warning("Could not cache the splash image: %s", e)
+    return ImageTk.PhotoImage(splash_img, master=master)
 
 
 def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
     # Поддержка путей внутри PyInstaller-сборки
     if hasattr(sys, "_MEIPASS"):
         base_path = sys._MEIPASS
@@ -824,49 +1673,47 @@ def main():
 
     icon_path = os.path.join(base_path, "ico.ico")
     splash_path = os.path.join(base_path, "splash.png")
-    # Показ сплэш-экрана
-    splash = tk.Tk()
-    splash.overrideredirect(True)
-    splash.geometry("600x400+{}+{}".format(
-        (splash.winfo_screenwidth() - 600) // 2,
-        (splash.winfo_screenheight() - 400) // 2
-    ))
 
-    try:
-        splash_img = Image.open(splash_path)
-        w, h = splash_img.size
-
-        max_w, max_h = 800, 600  # максимальные размеры окна
-        scale = min(max_w / w, max_h / h)
-        new_size = (int(w * scale), int(h * scale))
-
-        splash_img = splash_img.resize(new_size, Image.LANCZOS)
-        splash_photo = ImageTk.PhotoImage(splash_img)
-
-        label = tk.Label(splash, image=splash_photo, bg="black")
-        label.image = splash_photo
-        label.pack(expand=True)
-        splash.geometry(
-            f"{new_size[0]}x{new_size[1]}+{(splash.winfo_screenwidth() - new_size[0]) // 2}+{(splash.winfo_screenheight() - new_size[1]) // 2}")
-    except Exception as e:
-        print("Could not load splash image:", e)
-
-    splash.after(2500, splash.destroy)
-    splash.mainloop()
+    # --snapshot FILE opens a saved snapshot right away; without saved credentials the app then runs offline
+    snapshot_path = None
+    if "--snapshot" in sys.argv[1:-1]:
+        snapshot_path = sys.argv[sys.argv.index("--snapshot") + 1]
 
     creds = load_credentials()
-    if not creds:
+    if not creds and not snapshot_path:
         prompt_for_credentials()
         creds = load_credentials()
         if not creds:
             sys.exit()
+    creds = creds or {"client_id": None, "client_secret": None}
 
     client_id = creds["client_id"]
     client_secret = creds["client_secret"]
 
-    app = SpotifyAnalyzer(client_id, client_secret)
+    # The main window is built hidden and starts its backend right away, the splash stays up
+    # only until that's done
+    app = SpotifyAnalyzer(client_id, client_secret, creds.get("pool"), snapshot_path)
+
+    # Показ сплэш-экрана
+    splash = tk.Toplevel(app)
+    splash.overrideredirect(True)
+    try:
+        splash_photo = _load_splash_image(splash, splash_path)
+        label = tk.Label(splash, image=splash_photo, bg="black")
+        label.image = splash_photo
+        label.pack(expand=True)
+        w, h = splash_photo.width(), splash_photo.height()
+    except Exception as e:
+        print("Could not load splash image:", e)
+        w, h = 600, 400
+    splash.geometry(f"{w}x{h}+{(splash.winfo_screenwidth() - w) // 2}+{(splash.winfo_screenheight() - h) // 2}")
+    # The app closes the splash itself as soon as its backend is ready
+    app.splash = splash
+    splash.update()
+    app.startup_timings["splash_ms"] = _ms_since_start()
+
     app.iconbitmap(icon_path)
     app.mainloop()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
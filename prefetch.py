@@ -0,0 +1,209 @@
+import threading
+from collections import OrderedDict
+
+from background import TaskCancelled
+
+# Background prefetching of the tracklists the user is likely to open next.
+# Once a discography is loaded, the tracklists of the most popular releases are fetched on a single
+# low-priority thread; every selection moves its neighbours in the list to the front of the queue.
+# The prefetcher waits while the app has foreground work running and never requests anything that is
+# already in memory, so a click costs nothing extra either way.
+# Tracklists live in TracklistCache, an LRU bounded by approximate size shared by all artists, which
+# also keeps the numbers for the prefetch hit rate.
+
+PREFETCH_TOP = 8  # most popular releases prefetched after a discography load
+PREFETCH_NEIGHBOURS = 2  # releases above and below the selection
+MEMORY_BUDGET = 16 * 2 ** 20  # approximate bytes of tracklists kept in memory
+BUSY_POLL_S = 0.1
+
+TRACK_OVERHEAD = 400  # rough size of a {"id", "name", "popularity"} dict without the strings
+
+
+def tracklist_size(tracks):
+    return 64 + sum(TRACK_OVERHEAD + len(t.get("id") or "") + len(t.get("name") or "") for t in tracks)
+
+
+def plan(albums, selected=None, top=PREFETCH_TOP, neighbours=PREFETCH_NEIGHBOURS):
+    # (id, name) of the releases to prefetch, most likely next first: the neighbours of the selected
+    # index (closest first), then the most popular releases. albums is a columnar.AlbumView.
+    picked = []
+    if selected is not None:
+        for distance in range(1, neighbours + 1):
+            for i in (selected + distance, selected - distance):
+                if 0 <= i < len(albums):
+                    picked.append(albums[i][:2])
+    picked.extend(album[:2] for album in albums.top(top))
+    return list(OrderedDict.fromkeys(picked))
+
+
+class TracklistCache:
+    # album ID -> unfiltered tracklist, least recently used first out once max_bytes is exceeded.
+    # Used from the prefetch thread and the main thread.
+    def __init__(self, max_bytes=MEMORY_BUDGET):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # album ID -> [tracks, size, prefetched and not opened yet]
+        self.opened = 0  # albums selected
+        self.instant = 0  # ... that were in memory already
+        self.prefetch_hits = 0  # ... because the prefetcher loaded them
+        self.prefetched = 0
+        self.evicted = 0
+        self.wasted = 0  # prefetched tracklists evicted before anyone opened them
+
+    def __contains__(self, album_id):
+        with self._lock:
+            return album_id in self._entries
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def get(self, album_id, default=None):
+        with self._lock:
+            entry = self._entries.get(album_id)
+            if entry is None:
+                return default
+            self._entries.move_to_end(album_id)
+            return entry[0]
+
+    def __setitem__(self, album_id, tracks):
+        self.put(album_id, tracks)
+
+    def put(self, album_id, tracks, prefetched=False):
+        size = tracklist_size(tracks)
+        with self._lock:
+            old = self._entries.pop(album_id, None)
+            if old is not None:
+                self.size -= old[1]
+                prefetched = prefetched and old[2]
+            self._entries[album_id] = [tracks, size, prefetched]
+            self.size += size
+            if prefetched:
+                self.prefetched += 1
+            while self.size > self.max_bytes and len(self._entries) > 1:
+                _, (_, evicted_size, unused) = self._entries.popitem(last=False)
+                self.size -= evicted_size
+                self.evicted += 1
+                self.wasted += unused
+
+    def unopened_bytes(self):
+        with self._lock:
+            return sum(entry[1] for entry in self._entries.values() if entry[2])
+
+    def record_open(self, album_id):
+        # Counts a selection; returns True when it was served by a prefetch
+        with self._lock:
+            self.opened += 1
+            entry = self._entries.get(album_id)
+            if entry is None:
+                return False
+            self.instant += 1
+            if not entry[2]:
+                return False
+            entry[2] = False
+            self.prefetch_hits += 1
+            return True
+
+    def stats(self):
+        with self._lock:
+            # Re-opens of albums that were loaded on click before don't say anything about the prefetcher
+            first_opens = self.opened - (self.instant - self.prefetch_hits)
+            return {
+                "albums": len(self._entries),
+                "bytes": self.size,
+                "opened": self.opened,
+                "instant": self.instant,
+                "prefetched": self.prefetched,
+                "prefetch_hits": self.prefetch_hits,
+                "hit_rate": round(self.prefetch_hits / first_opens, 3) if first_opens else None,
+                "evicted": self.evicted,
+                "wasted": self.wasted,
+            }
+
+    def summary(self):
+        stats = self.stats()
+        rate = "n/a" if stats["hit_rate"] is None else f"{stats['hit_rate']:.0%}"
+        return (f"Prefetch: {stats['prefetch_hits']} of {stats['opened']} selections served by prefetch "
+                f"(hit rate {rate}), {stats['prefetched']} tracklists prefetched, {stats['wasted']} unused, "
+                f"{stats['albums']} in memory ({stats['bytes'] / 2 ** 20:.1f} MB)")
+
+
+class _PrefetchTask:
+    # Cancellation for AnalyzerCore calls: a newer schedule() or stop() ends the current fetch
+    def __init__(self, prefetcher, generation):
+        self._prefetcher = prefetcher
+        self._generation = generation
+
+    def check(self):
+        if self._prefetcher._generation != self._generation:
+            raise TaskCancelled()
+
+    def progress(self, done, total=None, text=None):
+        self.check()
+
+
+class Prefetcher:
+    # fetch(task, album_id, album_name) loads one tracklist on the prefetch thread; is_busy() tells
+    # whether foreground work is running, the prefetcher waits for it to finish before every album
+    def __init__(self, cache, is_busy=lambda: False):
+        self.cache = cache
+        self.is_busy = is_busy
+        self.errors = 0
+        self._cond = threading.Condition()
+        self._queue = []
+        self._fetch = None
+        self._generation = 0
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="spotify-prefetch", daemon=True)
+        self._thread.start()
+
+    def schedule(self, albums, fetch):
+        # Replaces whatever is still queued; albums are (id, name) pairs, most wanted first
+        with self._cond:
+            self._generation += 1
+            self._queue = [album for album in albums if album[0] not in self.cache]
+            self._fetch = fetch
+            self._cond.notify()
+
+    def cancel(self):
+        self.schedule([], None)
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._generation += 1
+            self._cond.notify()
+
+    def _next(self):
+        with self._cond:
+            while not self._stopped and not self._queue:
+                self._cond.wait()
+            if self._stopped:
+                return None
+            return self._queue.pop(0), self._fetch, self._generation
+
+    def _run(self):
+        while True:
+            item = self._next()
+            if item is None:
+                return
+            (album_id, album_name), fetch, generation = item
+            task = _PrefetchTask(self, generation)
+            try:
+                while self.is_busy():
+                    task.check()
+                    with self._cond:
+                        self._cond.wait(BUSY_POLL_S)
+                task.check()
+                # Prefetched tracklists may only take half of the budget, the rest is for what was opened
+                if album_id in self.cache or self.cache.unopened_bytes() * 2 > self.cache.max_bytes:
+                    continue
+                tracks = fetch(task, album_id, album_name)
+                task.check()
+                self.cache.put(album_id, tracks, prefetched=True)
+            except TaskCancelled:
+                continue
+            except Exception as e:
+                self.errors += 1
+                print(f"Prefetching tracks of '{album_name}' failed: {e}")
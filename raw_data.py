@@ -0,0 +1,164 @@
+# Text of the Raw Data window.
+# The report is built from what the app already holds (the release rows and the open album's tracks), so the
+# window opens right away. What only Spotify has (artist info, release date and label, durations, audio features)
+# is fetched with AnalyzerCore.collect_raw_details() for the blocks being rendered and merged in with update().
+# The window only renders the blocks that are scrolled into view, "Copy All" and "Export to .txt" read the
+# same blocks straight from here, so no step ever needs the whole text inside the Tk widget.
+
+ALBUM_URL = "https://open.spotify.com/album/"
+TRACK_URL = "https://open.spotify.com/track/"
+
+
+def ms_to_minsec(ms):
+    minutes = ms // 60000
+    seconds = (ms % 60000) // 1000
+    return f"{minutes}:{seconds:02d}"
+
+
+class RawDataReport:
+    # albums are (id, name, popularity, year) rows, tracks {"id", "name", "popularity"} dicts;
+    # artist is the artist object when the app has it already
+    def __init__(self, artist_id, artist_name, albums, tracks, artist=None):
+        self.artist_id = artist_id
+        self.artist_name = artist_name
+        self.albums = list(albums)
+        self.tracks = list(tracks)
+        self.artist = artist
+        self.artist_error = None
+        self.album_details = {}  # album ID -> (full album, error)
+        self.track_details = {}  # track ID -> full track, None when it couldn't be loaded
+        self.features = {}  # track ID -> (audio features, error)
+        self.items = self._items()
+
+    def _items(self):
+        # One (kind, value) entry per block, a block is a small unit (the artist, one album, one track)
+        # that can be rendered on its own
+        if not self.artist_id:
+            return [("empty", None)]
+        items = [("artist", None)]
+        if not self.albums:
+            return items + [("empty", None)]
+        items += [("albums", None)] + [("album", album) for album in self.albums]
+        if not self.tracks:
+            return items + [("no_tracks", None)]
+        return items + [("tracks", None)] + [("track", t) for t in self.tracks]
+
+    def missing(self, start=0, stop=None):
+        # What blocks start:stop still need from Spotify: (artist wanted, album IDs, track IDs)
+        artist_wanted, album_ids, track_ids = False, [], []
+        for kind, value in self.items[start:stop]:
+            if kind == "artist":
+                artist_wanted = self.artist is None and self.artist_error is None
+            elif kind == "album" and value[0] not in self.album_details:
+                album_ids.append(value[0])
+            elif kind == "track" and value["id"] not in self.track_details:
+                track_ids.append(value["id"])
+        return artist_wanted, album_ids, track_ids
+
+    def update(self, details):
+        # Merges what collect_raw_details() returned
+        if details["artist"] is not None:
+            self.artist = details["artist"]
+        self.artist_error = details["artist_error"] or self.artist_error
+        self.album_details.update(details["albums"])
+        self.track_details.update(details["tracks"])
+        self.features.update(details["features"])
+
+    def block(self, i):
+        # Block i as (line, tag) pairs, tag is "error" or None
+        kind, value = self.items[i]
+        if kind == "empty":
+            return [("Albums: No album data available.", "error"), ("Tracks: No track data available.", "error")]
+        if kind == "artist":
+            return self._artist_block()
+        if kind == "albums":
+            return [("Albums:", None)]
+        if kind == "album":
+            return self._album_block(*value)
+        if kind == "no_tracks":
+            return [("Tracks: No track data available.", "error")]
+        if kind == "tracks":
+            return [("Tracks:", None)]
+        return self._track_block(value)
+
+    def blocks(self):
+        for i in range(len(self.items)):
+            yield self.block(i)
+
+    def _artist_block(self):
+        if self.artist is None and self.artist_error is None:
+            # Not loaded yet
+            return [("Artist Info:", None), (f"  Name: {self.artist_name}", None), ("", None)]
+        try:
+            if self.artist_error:
+                raise self.artist_error
+            artist_info = self.artist
+            return [
+                ("Artist Info:", None),
+                (f"  Name: {self.artist_name}", None),
+                (f"  Genres: {', '.join(artist_info.get('genres', []))}", None),
+                (f"  Followers: {artist_info['followers']['total']}", None),
+                (f"  Spotify URL: {artist_info['external_urls']['spotify']}", None),
+                ("", None),
+            ]
+        except Exception as e:
+            return [(f"Error loading artist info: {e}", "error"), ("", None)]
+
+    def _album_block(self, alb_id, alb_name, alb_pop, alb_year):
+        block = [
+            (f"  • {alb_name} ({alb_year})", None),
+            (f"     ID: {alb_id}", None),
+            (f"     Popularity: {alb_pop}", None),
+            (f"     Spotify URL: {ALBUM_URL}{alb_id}", None),
+        ]
+        if alb_id in self.album_details:
+            album_data, error = self.album_details[alb_id]
+            if error:
+                block.append((f"     Error fetching album details: {error}", "error"))
+            else:
+                block += [(f"     Release date: {album_data.get('release_date') or 'N/A'}", None),
+                          (f"     Label: {album_data.get('label') or 'N/A'}", None)]
+        block.append(("", None))
+        return block
+
+    def _track_block(self, t):
+        block = [
+            (f"  • {t['name']}", None),
+            (f"     ID: {t['id']}", None),
+            (f"     Popularity: {t['popularity']}", None),
+            (f"     Spotify URL: {TRACK_URL}{t['id']}", None),
+        ]
+        if t["id"] in self.track_details:
+            dur = (self.track_details[t["id"]] or {}).get("duration_ms")
+            block.append((f"     Duration: {ms_to_minsec(dur)} ({dur} ms)" if dur else "     Duration: N/A", None))
+        if t["id"] in self.features:
+            f, error = self.features[t["id"]]
+            if error:
+                block.append((f"     Audio features not loaded: {error}", "error"))
+            elif f:
+                block += [(f"     Tempo: {f.get('tempo', 'N/A')}", None),
+                          (f"     Valence: {f.get('valence', 'N/A')}", None)]
+            else:
+                block.append(("     No audio features available.", "error"))
+        block.append(("", None))
+        return block
+
+    def lines(self):
+        # Every line of the report without the trailing empty ones (like the old text_area.get().strip())
+        blank = 0
+        for block in self.blocks():
+            for line, tag in block:
+                if not line:
+                    blank += 1
+                    continue
+                for _ in range(blank):
+                    yield ""
+                blank = 0
+                yield line
+
+    def write(self, f):
+        for line in self.lines():
+            f.write(line + "\n")
+
+    def text(self):
+        return "\n".join(self.lines())
@@ -0,0 +1,87 @@
+import json
+import threading
+from collections import Counter
+
+# Single-flight request coalescing.
+# The same resource is often asked for from several worker threads at once (the artist from the selection,
+# the raw data and both exports; albums from the discography load and the raw data). When a request for
+# an endpoint and arguments is already in flight, later callers wait for it and get a copy of its result
+# (or its exception) instead of sending the same request again.
+# CoalescingSpotify sits under the response cache (see make_client), so it only deals with real requests;
+# once the first one is done its result is in the cache anyway.
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.waiters = 0
+        self.snapshot = None  # the result as JSON text, taken before done is set
+        self.error = None
+
+
+class SingleFlight:
+    # stats (a diagnostics.ApiStats) is told about every request that was shared instead of sent
+    def __init__(self, stats=None):
+        self.stats = stats
+        self.sent = Counter()  # endpoint -> requests that were actually made
+        self.shared = Counter()  # endpoint -> callers that got another caller's result
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, endpoint, key, fn):
+        with self._lock:
+            call = self._calls.get((endpoint, key))
+            leader = call is None
+            if leader:
+                call = self._calls[(endpoint, key)] = _Call()
+                self.sent[endpoint] += 1
+            else:
+                call.waiters += 1
+                self.shared[endpoint] += 1
+        if not leader:
+            if self.stats:
+                self.stats.record_shared(endpoint)
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            # Every caller gets its own copy, results are plain JSON and callers are free to modify them
+            return json.loads(call.snapshot)
+        result = None
+        try:
+            result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[(endpoint, key)]
+                waiters = call.waiters
+            # Nobody can join any more: the followers read an immutable copy made before the leader's caller
+            # gets (and maybe changes) the result, so no copy has to be made when nobody waited
+            if waiters and call.error is None:
+                call.snapshot = json.dumps(result, separators=(",", ":"))
+            call.done.set()
+        return result
+
+    def counts(self):
+        with self._lock:
+            return {endpoint: {"sent": self.sent[endpoint], "shared": self.shared[endpoint]}
+                    for endpoint in sorted(set(self.sent) | set(self.shared))}
+
+
+class CoalescingSpotify:
+    # Wraps spotipy.Spotify: concurrent identical calls (same method, same arguments) share one request
+    def __init__(self, sp, flight=None):
+        self._sp = sp
+        self.flight = flight or SingleFlight()
+
+    def __getattr__(self, name):
+        attr = getattr(self._sp, name)
+        if not callable(attr) or name.startswith("_"):
+            return attr
+
+        def call(*args, **kwargs):
+            key = json.dumps([args, kwargs], sort_keys=True, separators=(",", ":"), default=str)
+            return self.flight.do(name, key, lambda: attr(*args, **kwargs))
+
+        return call
@@ -0,0 +1,403 @@
+import json
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+
+from analyzer_core import NULL_TASK
+from catalog import ArtistCatalog
+from columnar import UNKNOWN_YEAR, load
+from exporter import DiscographyExport
+
+# Offline snapshot bundles of an artist: the artist, every live release in the catalog (with the collapsed
+# variants; releases the user deleted only keep their ID, so they stay deleted when the bundle is opened)
+# and all tracklists with popularity, duration and audio features.
+#
+# Layout: MAGIC, the columns, the compressed string table, a JSON header, the header's offset, MAGIC.
+# Numbers are stored as raw little-endian NumPy columns, each starting on an ALIGN boundary, so opening a
+# bundle maps the file and wraps the columns without copying or parsing them. Every text (IDs, names, dates,
+# URLs) goes into one string table, zlib-compressed and decoded once on open; string columns hold indices
+# into it (-1 for None).
+#
+# SnapshotSpotify answers the spotipy calls of AnalyzerCore and the exporters from a bundle, so with it
+# the tracklists, both exports and the Raw Data window work without a network connection or credentials.
+
+MAGIC = b"SPSNAP\x00\x01"
+VERSION = 1
+ALIGN = 64
+EXTENSION = ".spsnap"
+
+# Audio feature fields kept per track (float64, NaN when missing); the INT_FEATURES come back as ints
+FEATURES = ("danceability", "energy", "key", "loudness", "mode", "speechiness", "acousticness",
+            "instrumentalness", "liveness", "valence", "tempo", "duration_ms", "time_signature")
+INT_FEATURES = {"key", "mode", "duration_ms", "time_signature"}
+
+ALBUM_STRINGS = ("id", "name", "release_date", "album_type", "label", "url", "error")
+TRACK_STRINGS = ("id", "name", "url")
+
+
+class _Strings:
+    def __init__(self):
+        self.values = []
+        self._index = {}
+
+    def add(self, value):
+        if value is None:
+            return -1
+        value = str(value)
+        i = self._index.get(value)
+        if i is None:
+            i = self._index[value] = len(self.values)
+            self.values.append(value)
+        return i
+
+
+def _int(value, default=-1):
+    return default if value is None else int(value)
+
+
+def save(core, catalog, path, settings=None, task=NULL_TASK):
+    # Loads everything the catalog lists (through the response cache, so it's mostly local) and writes the
+    # bundle. Returns {"albums", "tracks", "bytes"}.
+    np = load()
+    table = catalog.releases
+    rows = np.flatnonzero(table.alive)
+    albums = table.rows(rows)
+    task.progress(0, len(albums), "Saving snapshot...")
+    artist = core.sp.artist(catalog.artist_id)
+    records = []
+    for chunk in DiscographyExport(core, catalog.artist_id, albums, path).iter_albums(task):
+        records.extend(chunk)
+        task.progress(len(records), len(albums), f"Saving snapshot... {len(records)}/{len(albums)} albums")
+
+    strings = _Strings()
+    types = {code: release_type for release_type, code in catalog.type_codes.items()}
+    album_columns = {name: [] for name in ALBUM_STRINGS}
+    track_columns = {name: [] for name in TRACK_STRINGS + ("popularity", "duration_ms", "disc_number",
+                                                            "track_number", "explicit")}
+    features = {name: [] for name in FEATURES}
+    has_features = []
+    track_start = []
+    total_tracks = []
+    for record in records:
+        album_columns["id"].append(strings.add(record["id"]))
+        album_columns["name"].append(strings.add(record.get("name")))
+        album_columns["release_date"].append(strings.add(record.get("release_date")))
+        album_columns["album_type"].append(strings.add(record.get("album_type")))
+        album_columns["label"].append(strings.add(record.get("label")))
+        album_columns["url"].append(strings.add(record.get("spotify_url")))
+        album_columns["error"].append(strings.add(record.get("error")))
+        total_tracks.append(_int(record.get("total_tracks")))
+        track_start.append(len(has_features))
+        for track in record["tracks"]:
+            track_columns["id"].append(strings.add(track["id"]))
+            track_columns["name"].append(strings.add(track.get("name")))
+            track_columns["url"].append(strings.add(track.get("spotify_url")))
+            track_columns["popularity"].append(_int(track.get("popularity")))
+            track_columns["duration_ms"].append(_int(track.get("duration_ms")))
+            track_columns["disc_number"].append(_int(track.get("disc_number")))
+            track_columns["track_number"].append(_int(track.get("track_number")))
+            track_columns["explicit"].append(_int(track.get("explicit")))
+            audio = track.get("audio_features") or {}
+            has_features.append(bool(audio))
+            for name in FEATURES:
+                value = audio.get(name)
+                features[name].append(math.nan if value is None else float(value))
+    track_start.append(len(has_features))
+
+    columns = {
+        # The catalog row of every release: what the discography list and the album chart show
+        "albums.name": np.asarray([strings.add(album[1]) for album in albums], dtype="<i4"),
+        "albums.popularity": table.popularity[rows].astype("<i2"),
+        "albums.year": table.year[rows].astype("<i2"),
+        "albums.type": table.type[rows].astype("i1"),
+        "albums.variant": catalog.variant[rows].astype("?"),
+        "albums.total_tracks": np.asarray(total_tracks, dtype="<i4"),
+        "albums.track_start": np.asarray(track_start, dtype="<i4"),
+        "tracks.has_features": np.asarray(has_features, dtype="?"),
+    }
+    for name in ALBUM_STRINGS:
+        # The album object's own name can differ from the listed one (it's only used for the API answers)
+        columns["albums." + ("full_name" if name == "name" else name)] = np.asarray(album_columns[name], dtype="<i4")
+    for name, values in track_columns.items():
+        dtype = "<i4" if name in TRACK_STRINGS or name == "duration_ms" else "<i2"
+        columns["tracks." + name] = np.asarray(values, dtype=dtype)
+    for name, values in features.items():
+        columns["features." + name] = np.asarray(values, dtype="<f8")
+    text = "".join(strings.values)
+    offsets = [0]
+    for value in strings.values:
+        offsets.append(offsets[-1] + len(value))
+    columns["strings.offsets"] = np.asarray(offsets, dtype="<u4")
+
+    header = {
+        "version": VERSION,
+        "created": time.time(),
+        "artist": artist,
+        "settings": settings or {},
+        "albums": len(albums),
+        "tracks": len(has_features),
+        "catalog": {
+            "types": [types[code] for code in sorted(types)],
+            "loaded": sorted(catalog.loaded),
+            "removed": sorted(catalog.removed),
+            "variants": catalog.variants,
+        },
+        "columns": {},
+    }
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        for name, column in columns.items():
+            f.write(b"\x00" * (-f.tell() % ALIGN))
+            header["columns"][name] = [column.dtype.str, f.tell(), len(column)]
+            f.write(column.tobytes())
+        blob = zlib.compress(text.encode("utf-8"), 6)
+        header["strings"] = {"offset": f.tell(), "size": len(blob), "count": len(strings.values), "codec": "zlib"}
+        f.write(blob)
+        header_offset = f.tell()
+        f.write(json.dumps(header, separators=(",", ":")).encode("utf-8"))
+        f.write(struct.pack("<Q", header_offset))
+        f.write(MAGIC)
+        size = f.tell()
+    os.replace(tmp_path, path)
+    return {"albums": len(albums), "tracks": len(has_features), "bytes": size}
+
+
+class Snapshot:
+    # A bundle opened read-only. The columns are NumPy views on the mapped file, strings are looked up in the
+    # decoded string table. Safe to use from several threads.
+    def __init__(self, path):
+        np = load()
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        mm = self._mmap
+        try:
+            if len(mm) < 2 * len(MAGIC) + 8 or mm[:len(MAGIC)] != MAGIC or mm[-len(MAGIC):] != MAGIC:
+                raise ValueError(f"{path} is not a snapshot bundle")
+            header_offset, = struct.unpack_from("<Q", mm, len(mm) - len(MAGIC) - 8)
+            self.header = json.loads(mm[header_offset:len(mm) - len(MAGIC) - 8].decode("utf-8"))
+            if self.header.get("version") != VERSION:
+                raise ValueError(f"{path} is a snapshot bundle of an unsupported version")
+            self.columns = {
+                name: np.frombuffer(mm, dtype=np.dtype(dtype), count=count, offset=offset) if count
+                else np.empty(0, dtype=np.dtype(dtype))
+                for name, (dtype, offset, count) in self.header["columns"].items()}
+            strings = self.header["strings"]
+            self._text = zlib.decompress(mm[strings["offset"]:strings["offset"] + strings["size"]]).decode("utf-8")
+        except Exception:
+            self.close()
+            raise
+        self._offsets = self.columns["strings.offsets"].tolist()
+        self.artist = self.header["artist"]
+        self.artist_id = self.artist["id"]
+        self.artist_name = self.artist.get("name", "")
+        self.created = self.header["created"]
+        self.settings = self.header.get("settings") or {}
+        self._track_starts = self.columns["albums.track_start"].tolist()
+        self._album_rows = {album_id: row for row, album_id in enumerate(self._strings("albums.id"))}
+        self._track_rows = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self.header["albums"]
+
+    @property
+    def track_count(self):
+        return self.header["tracks"]
+
+    def close(self):
+        # Views that are still in use keep the mapping alive, it's then closed once they're gone
+        self.columns = {}
+        try:
+            self._mmap.close()
+        except BufferError:
+            pass
+
+    def string(self, i):
+        i = int(i)
+        return None if i < 0 else self._text[self._offsets[i]:self._offsets[i + 1]]
+
+    def _strings(self, column, start=0, stop=None):
+        return [self.string(i) for i in self.columns[column][start:stop].tolist()]
+
+    def catalog(self, tracks=None):
+        # An ArtistCatalog as it was when the bundle was saved
+        np = load()
+        saved = self.header["catalog"]
+        catalog = ArtistCatalog(self.artist_id, tracks)
+        ids = self._strings("albums.id")
+        names = self._strings("albums.name")
+        popularity = self.columns["albums.popularity"].tolist()
+        years = [str(year) if year else UNKNOWN_YEAR for year in self.columns["albums.year"].tolist()]
+        codes = self.columns["albums.type"]
+        variant = self.columns["albums.variant"]
+        for code, release_type in enumerate(saved["types"]):
+            for is_variant in (False, True):
+                rows = np.flatnonzero((codes == code) & (variant == is_variant)).tolist()
+                if rows:
+                    catalog.add({release_type: [(ids[i], names[i], popularity[i], years[i]) for i in rows]},
+                                variant=is_variant)
+        catalog.finish(saved["loaded"])
+        catalog.removed.update(saved["removed"])
+        catalog.set_variants(saved["variants"])
+        return catalog
+
+    # API-shaped objects, built on demand
+
+    def album_row(self, album_id):
+        return self._album_rows.get(album_id)
+
+    def track_row(self, track_id):
+        with self._lock:
+            if self._track_rows is None:
+                rows = {}
+                for row, value in enumerate(self._strings("tracks.id")):
+                    rows.setdefault(value, row)
+                self._track_rows = rows
+        return self._track_rows.get(track_id)
+
+    def album_object(self, row):
+        # None for releases that couldn't be loaded when the bundle was saved
+        if self.string(self.columns["albums.error"][row]) is not None:
+            return None
+        start, stop = self._track_starts[row], self._track_starts[row + 1]
+        total = int(self.columns["albums.total_tracks"][row])
+        return {
+            "id": self.string(self.columns["albums.id"][row]),
+            "name": self.string(self.columns["albums.full_name"][row]),
+            "album_type": self.string(self.columns["albums.album_type"][row]),
+            "release_date": self.string(self.columns["albums.release_date"][row]),
+            "total_tracks": total if total >= 0 else stop - start,
+            "popularity": int(self.columns["albums.popularity"][row]),
+            "label": self.string(self.columns["albums.label"][row]),
+            "external_urls": {"spotify": self.string(self.columns["albums.url"][row]) or ""},
+            "tracks": {"items": self.album_tracks(row, 0, 50), "total": stop - start},
+        }
+
+    def album_error(self, row):
+        return self.string(self.columns["albums.error"][row])
+
+    def album_tracks(self, row, offset=0, limit=None):
+        start, stop = self._track_starts[row], self._track_starts[row + 1]
+        start = min(stop, start + offset)
+        if limit is not None:
+            stop = min(stop, start + limit)
+        return [self.track_object(i, full=False) for i in range(start, stop)]
+
+    def album_track_count(self, row):
+        return self._track_starts[row + 1] - self._track_starts[row]
+
+    def track_object(self, i, full=True):
+        columns = self.columns
+
+        def number(name):
+            value = int(columns[name][i])
+            return None if value < 0 else value
+
+        explicit = number("tracks.explicit")
+        track = {
+            "id": self.string(columns["tracks.id"][i]),
+            "name": self.string(columns["tracks.name"][i]),
+            "disc_number": number("tracks.disc_number"),
+            "track_number": number("tracks.track_number"),
+            "duration_ms": number("tracks.duration_ms"),
+            "explicit": None if explicit is None else bool(explicit),
+            "external_urls": {"spotify": self.string(columns["tracks.url"][i]) or ""},
+        }
+        if full:
+            track["popularity"] = number("tracks.popularity")
+        return track
+
+    def features_object(self, i):
+        if not self.columns["tracks.has_features"][i]:
+            return None
+        features = {"id": self.string(self.columns["tracks.id"][i])}
+        for name in FEATURES:
+            value = float(self.columns["features." + name][i])
+            if not math.isnan(value):
+                features[name] = int(value) if name in INT_FEATURES else value
+        return features
+
+
+class SnapshotSpotify:
+    # Stands in for spotipy.Spotify with the data of one Snapshot. Anything that isn't in the bundle raises
+    # LookupError, like a failed request would; bulk lookups answer None for it, like the API does.
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+
+    def _missing(self, kind, item_id):
+        return LookupError(f"{kind} {item_id} is not in the snapshot of {self.snapshot.artist_name}")
+
+    def artist(self, artist_id):
+        if artist_id != self.snapshot.artist_id:
+            raise self._missing("artist", artist_id)
+        return json.loads(json.dumps(self.snapshot.artist))
+
+    def _album(self, album_id):
+        row = self.snapshot.album_row(album_id)
+        return None if row is None else self.snapshot.album_object(row)
+
+    def album(self, album_id, market=None):
+        album = self._album(album_id)
+        if album is None:
+            row = self.snapshot.album_row(album_id)
+            raise LookupError(self.snapshot.album_error(row)) if row is not None else self._missing("album", album_id)
+        return album
+
+    def albums(self, albums, market=None):
+        return {"albums": [self._album(album_id) for album_id in albums]}
+
+    def album_tracks(self, album_id, limit=50, offset=0, market=None):
+        row = self.snapshot.album_row(album_id)
+        if row is None:
+            raise self._missing("album", album_id)
+        return {"items": self.snapshot.album_tracks(row, offset, limit), "limit": limit, "offset": offset,
+                "total": self.snapshot.album_track_count(row), "next": None}
+
+    def _track(self, track_id):
+        row = self.snapshot.track_row(track_id)
+        return None if row is None else self.snapshot.track_object(row)
+
+    def track(self, track_id, market=None):
+        track = self._track(track_id)
+        if track is None:
+            raise self._missing("track", track_id)
+        return track
+
+    def tracks(self, tracks, market=None):
+        return {"tracks": [self._track(track_id) for track_id in tracks]}
+
+    def audio_features(self, tracks=()):
+        snapshot = self.snapshot
+        rows = [snapshot.track_row(track_id) for track_id in tracks]
+        return [None if row is None else snapshot.features_object(row) for row in rows]
+
+    def artist_albums(self, artist_id, album_type=None, include_groups=None, country=None, limit=20, offset=0):
+        # The releases of the requested types in the bundle, as discography page items
+        snapshot = self.snapshot
+        if artist_id != snapshot.artist_id:
+            raise self._missing("artist", artist_id)
+        types = snapshot.header["catalog"]["types"]
+        wanted = set((include_groups or album_type or ",".join(types)).split(","))
+        codes = snapshot.columns["albums.type"].tolist()
+        rows = [row for row in range(len(snapshot)) if types[codes[row]] in wanted]
+        items = []
+        for row in rows[offset:offset + limit]:
+            album = snapshot.album_object(row) or {}
+            items.append({
+                "id": snapshot.string(snapshot.columns["albums.id"][row]),
+                "name": snapshot.string(snapshot.columns["albums.name"][row]),
+                "album_group": types[codes[row]],
+                "album_type": album.get("album_type"),
+                "release_date": album.get("release_date"),
+                "total_tracks": album.get("total_tracks"),
+            })
+        return {"items": items, "limit": limit, "offset": offset, "total": len(rows), "next": None}
+
+    def search(self, q, limit=10, offset=0, type="track", market=None):
+        raise LookupError("Searching needs a connection to Spotify, a snapshot is open")
@@ -0,0 +1,30 @@
+import os
+import sys
+
+import pytest
+
+# The modules live at the top of the repository, next to this folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_spotify import FakeSpotifyServer  # noqa: E402
+
+
+@pytest.fixture
+def server():
+    # Retry-After has to be whole seconds for urllib3, 0 keeps the throttling tests fast
+    with FakeSpotifyServer(retry_after=0) as fake:
+        yield fake
+
+
+@pytest.fixture
+def sp(server):
+    # A real spotipy client talking to the fake server
+    spotipy = pytest.importorskip("spotipy")
+    client = spotipy.Spotify(auth="test")
+    client.prefix = server.prefix
+    return client
+
+
+@pytest.fixture
+def needs_aiohttp():
+    pytest.importorskip("aiohttp")
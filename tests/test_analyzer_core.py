@@ -0,0 +1,68 @@
+import pytest
+
+from analyzer_core import AnalyzerCore
+from api_cache import CachedSpotify, ResponseCache
+from diagnostics import ApiStats
+from fake_spotify import make_album
+
+ALL_TYPES = "album,single,compilation"
+
+
+def expected_rows(artist_id, count):
+    rows = []
+    for i in range(count):
+        album = make_album(f"{artist_id}A{i}")
+        rows.append((album["id"], album["name"], album["popularity"], album["release_date"][:4]))
+    return rows
+
+
+@pytest.fixture(params=["sync", "async"])
+def core(request, sp, server):
+    if request.param == "async":
+        request.getfixturevalue("needs_aiohttp")
+    return AnalyzerCore(sp, lambda: "test", use_async=request.param == "async", concurrency=4,
+                        api_prefix=server.prefix, api_stats=ApiStats())
+
+
+def test_discography_comes_in_discography_order(core):
+    albums, pages, lookups = core.fetch_discography("artz120", ALL_TYPES, [])
+    assert albums == expected_rows("artz120", 120)
+    assert pages == 3
+    assert lookups == 7  # 50 + 50 + 20 releases, 20 per lookup
+
+
+def test_rejected_batch_falls_back_to_single_lookups(sp):
+    page = [("artz5A0", "Release 0"), ("not-an-id", "Broken"), ("artz5A1", "Release 1")]
+    stats = {}
+    rows = AnalyzerCore(sp).hydrate_albums(page, stats=stats)
+    expected = expected_rows("artz5", 2)
+    assert rows == [expected[0], ("not-an-id", "Broken", 0, "????"), expected[1]]
+    assert stats["lookups"] == 4
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_cached_albums_are_not_counted_as_lookups(sp, server, tmp_path, use_async):
+    if use_async:
+        pytest.importorskip("aiohttp")
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+    core = AnalyzerCore(CachedSpotify(sp, cache), lambda: "test", use_async=use_async, api_prefix=server.prefix)
+    # Half of the releases were looked at before
+    core.hydrate_albums([(album[0], album[1]) for album in expected_rows("artz40", 20)])
+    server.reset_stats()
+    albums, _, lookups = core.fetch_discography("artz40", ALL_TYPES, [])
+    assert albums == expected_rows("artz40", 40)
+    assert lookups == server.requests["albums"] == 1
+
+
+def test_throttled_requests_are_retried(core, server):
+    if core.async_enabled():
+        # Too many requests at once get a 429: the limiter has to back off until they fit
+        server.max_in_flight = 2
+        server.latency = 0.02
+    else:
+        server.throttle_rate = 0.3
+    albums, _, _ = core.fetch_discography("artz300", ALL_TYPES, [])
+    assert albums == expected_rows("artz300", 300)
+    assert server.throttled > 0
+    if core.async_enabled():
+        assert core.api_stats.snapshot()["total"]["throttled"] == server.throttled
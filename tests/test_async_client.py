@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+
+from async_client import AdaptiveLimiter, AsyncSpotifyError, run_bulk
+from credential_pool import CredentialPool
+
+
+def test_limiter_halves_once_per_retry_after_window():
+    async def burst():
+        limiter = AdaptiveLimiter(16)
+        for _ in range(8):
+            limiter.on_throttled(0.05)
+        halved = limiter.limit
+        await asyncio.sleep(0.06)
+        limiter.on_throttled(0.05)
+        return halved, limiter.limit, limiter.throttled
+
+    assert asyncio.run(burst()) == (8, 4, 9)
+
+
+def test_limiter_opens_up_after_a_full_window():
+    async def successes():
+        limiter = AdaptiveLimiter(4, maximum=6)
+        limits = []
+        for _ in range(4 + 5 + 6):
+            limiter.on_success()
+            limits.append(limiter.limit)
+        return limits
+
+    assert asyncio.run(successes()) == [4, 4, 4, 5] + [5, 5, 5, 5, 6] + [6] * 6
+
+
+def test_albums_stay_aligned_when_a_batch_is_rejected(needs_aiohttp, server):
+    ids = ["artz30A1", "not-an-id", "artz30A2"] + [f"artz30A{i}" for i in range(3, 25)]
+    albums = run_bulk(lambda: "test", lambda client: client.albums(ids), prefix=server.prefix)
+    assert [album and album["id"] for album in albums] == [None if i == "not-an-id" else i for i in ids]
+    # The batch of 20 with the bad ID went one by one, the second batch in one request
+    assert server.requests["albums"] == 2
+    assert server.requests["album"] == 20
+
+
+def test_errors_other_than_400_are_raised(needs_aiohttp, server):
+    with pytest.raises(AsyncSpotifyError) as error:
+        run_bulk(lambda: "test", lambda client: client.get("artists/x/nothing"), prefix=server.prefix)
+    assert error.value.http_status == 404
+
+
+def test_backs_off_when_throttled(needs_aiohttp, server):
+    server.max_in_flight = 2
+    server.latency = 0.02
+
+    async def work(client):
+        artists = await asyncio.gather(*(client.artist(f"artz{i}") for i in range(40)))
+        return artists, client.limiter.limit, client.limiter.throttled
+
+    artists, limit, throttled = run_bulk(lambda: "test", work, prefix=server.prefix, concurrency=8)
+    assert [artist["id"] for artist in artists] == [f"artz{i}" for i in range(40)]
+    assert throttled == server.throttled > 0
+    assert limit < 8
+
+
+class FakeTokenSession:
+    def get_access_token(self, as_dict=True):
+        return "test"
+
+    def stop(self):
+        pass
+
+
+def test_retry_after_that_isnt_a_number_falls_back_to_the_default(needs_aiohttp, server):
+    # Retry-After may also be an HTTP date; the request is retried after the default pause
+    server.retry_after = "Wed, 21 Oct 2015 07:28:00 GMT"
+    server.max_in_flight = 1
+    server.latency = 0.05
+
+    async def work(client):
+        return await asyncio.gather(client.artist("artz1"), client.artist("artz2"))
+
+    artists = run_bulk(lambda: "test", work, prefix=server.prefix, concurrency=2)
+    assert [artist["id"] for artist in artists] == ["artz1", "artz2"]
+    assert server.throttled > 0
+
+
+def test_pooled_requests_cool_the_key_down_and_back_off(needs_aiohttp, server):
+    pool = CredentialPool([("first-key", None, FakeTokenSession()), ("second-key", None, FakeTokenSession())])
+    server.max_in_flight = 2
+    server.latency = 0.02
+
+    async def work(client):
+        artists = await asyncio.gather(*(client.artist(f"artz{i}") for i in range(40)))
+        return artists, client.limiter.limit, client.limiter.throttled
+
+    artists, limit, throttled = run_bulk(None, work, prefix=server.prefix, concurrency=8, pool=pool)
+    assert [artist["id"] for artist in artists] == [f"artz{i}" for i in range(40)]
+    assert throttled == server.throttled == sum(key["throttled"] for key in pool.stats()) > 0
+    assert limit < 8
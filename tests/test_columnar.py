@@ -0,0 +1,31 @@
+import random
+
+from columnar import AlbumTable, AlbumView, top_indices
+
+
+def test_top_indices_match_a_stable_sort():
+    rng = random.Random(1)
+    values = [rng.randrange(20) for _ in range(500)]
+    for descending in (True, False):
+        # sorted() keeps ties in their original order, with reverse=True too
+        expected = sorted(range(len(values)), key=lambda i: values[i], reverse=descending)
+        for n in (0, 1, 10, 499, 500, 1000, None):
+            assert top_indices(values, n, descending).tolist() == expected[:n]
+
+
+def test_view_top_skips_deleted_and_dead_rows():
+    table = AlbumTable(capacity=2)
+    rows = table.append([(f"id{i}", f"Album {i}", pop, "2000") for i, pop in enumerate([5, 80, 40, 80, 10])])
+    assert table.size == 5
+    table.kill([1])
+    view = AlbumView(table, rows[table.alive[rows]])
+    del view[1]  # "id2"
+    assert view.top(2) == [("id3", "Album 3", 80, "2000"), ("id4", "Album 4", 10, "2000")]
+    assert [album[0] for album in view.top(descending=False)] == ["id0", "id4", "id3"]
+    assert len(view) == 3
+
+
+def test_unknown_years_round_trip():
+    table = AlbumTable()
+    table.append([("id", "Album", None, "????")])
+    assert table.row(0) == ("id", "Album", 0, "????")
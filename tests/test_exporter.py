@@ -0,0 +1,89 @@
+import os
+
+import pytest
+
+from analyzer_core import DEFAULT_SETTINGS, NULL_TASK
+from background import TaskCancelled
+from exporter import CHECKPOINT_SUFFIX, PopularityExport
+
+ALBUMS = [(f"album{i}", f"Album {i}", 90 - i, str(2000 + i)) for i in range(8)]
+SETTINGS = dict(DEFAULT_SETTINGS, albums_to_export="All", tracks_to_export="3")
+
+
+class FakeCore:
+    # What PopularityExport needs from AnalyzerCore, without the network; albums in `broken` fail to load
+    def __init__(self, broken=()):
+        self.broken = set(broken)
+        self.loaded = []
+
+    def artist_genres(self, artist_id):
+        return ["thrash metal"]
+
+    def iter_albums_tracks(self, albums, keywords=None, task=NULL_TASK):
+        for album in albums:
+            self.loaded.append(album[0])
+            if album[0] in self.broken:
+                yield album, [], RuntimeError("HTTP 502")
+                continue
+            yield album, [{"id": f"{album[0]}T{n}", "name": f"Track {n}", "popularity": (n * 37) % 100}
+                          for n in range(5)], None
+
+
+class CancelAfter:
+    def __init__(self, albums):
+        self.albums = albums
+
+    def check(self):
+        pass
+
+    def progress(self, done, total=None, text=None):
+        if done >= self.albums:
+            raise TaskCancelled()
+
+
+def export(core, path):
+    return PopularityExport(core, "artist", "Artist", ALBUMS, SETTINGS, str(path))
+
+
+def read(path):
+    # Without the export time, the only thing two runs of the same export differ in
+    with open(path, encoding="utf-8") as f:
+        return "".join(line for line in f if not line.startswith("Date/Time"))
+
+
+def test_interrupted_export_resumes_where_it_stopped(tmp_path):
+    reference = tmp_path / "reference.txt"
+    assert export(FakeCore(), reference).run()["albums"] == len(ALBUMS)
+
+    path = tmp_path / "export.txt"
+    with pytest.raises(TaskCancelled):
+        export(FakeCore(), path).run(CancelAfter(3))
+    assert export(FakeCore(), path).resumable() == 3
+
+    core = FakeCore()
+    result = export(core, path).run()
+    assert result == {"albums": len(ALBUMS), "resumed": 3, "errors": 0}
+    assert core.loaded == [album[0] for album in ALBUMS[3:]]
+    assert read(path) == read(reference)
+    assert not os.path.exists(str(path) + CHECKPOINT_SUFFIX)
+
+
+def test_failed_album_keeps_the_checkpoint_before_it(tmp_path):
+    path = tmp_path / "export.txt"
+    result = export(FakeCore(broken={"album5"}), path).run()
+    assert result == {"albums": len(ALBUMS), "resumed": 0, "errors": 1}
+    assert export(FakeCore(), path).resumable() == 5
+
+    core = FakeCore()
+    assert export(core, path).run()["resumed"] == 5
+    assert core.loaded == ["album5", "album6", "album7"]
+    assert "HTTP 502" not in read(path)
+
+
+def test_checkpoint_of_other_settings_is_ignored(tmp_path):
+    path = tmp_path / "export.txt"
+    with pytest.raises(TaskCancelled):
+        export(FakeCore(), path).run(CancelAfter(3))
+    other = PopularityExport(FakeCore(), "artist", "Artist", ALBUMS, dict(SETTINGS, tracks_to_export="5"), str(path))
+    assert other.resumable() == 0
+    assert other.run()["resumed"] == 0
@@ -0,0 +1,76 @@
+import time
+
+import pytest
+
+import history
+from api_cache import CachedSpotify, ResponseCache
+from history import ALBUM, HistoryStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.sqlite"))
+    yield store
+    store.close()
+
+
+def test_only_change_points_are_stored(store):
+    for day, popularity in [(100, 40), (101, 40), (102, 40), (103, 45), (104, 45), (105, 41)]:
+        store.record("artist", "Artist", ALBUM, [("album", "Album", popularity)], day=day)
+    assert store.stats() == {"artists": 1, "items": 1, "points": 3}
+    assert store.series("album") == [(history.day_to_date(100), 40), (history.day_to_date(103), 45),
+                                     (history.day_to_date(105), 41)]
+
+
+def test_series_ends_on_the_last_day_seen(store):
+    store.record("artist", "Artist", ALBUM, [("album", "Album", 40)], day=100)
+    store.record("artist", "Artist", ALBUM, [("album", "Album", 40)], day=110)
+    assert store.series("album") == [(history.day_to_date(100), 40), (history.day_to_date(110), 40)]
+
+
+def test_second_snapshot_of_a_day_replaces_it(store):
+    store.record("artist", "Artist", ALBUM, [("album", "Album", 40)], day=100)
+    assert store.record("artist", "Artist", ALBUM, [("album", "Album", 50)], day=101) == 1
+    store.record("artist", "Artist", ALBUM, [("album", "Album", 55)], day=101)
+    assert store.series("album")[-1] == (history.day_to_date(101), 55)
+    # Back to the value before: day 101 isn't a change point any more
+    store.record("artist", "Artist", ALBUM, [("album", "Album", 40)], day=101)
+    assert store.stats()["points"] == 1
+    assert store.series("album") == [(history.day_to_date(100), 40), (history.day_to_date(101), 40)]
+
+
+def test_older_snapshots_are_ignored(store):
+    store.record("artist", "Artist", ALBUM, [("album", "Album", 40)], day=100)
+    assert store.record("artist", "Artist", ALBUM, [("album", "Album", 10)], day=90) == 0
+    assert store.series("album") == [(history.day_to_date(100), 40)]
+
+
+def test_top_movers(store):
+    items = [("a", "A", 10), ("b", "B", 50), ("c", "C", 30)]
+    store.record("artist", "Artist", ALBUM, items, day=100)
+    store.record("artist", "Artist", ALBUM, [("a", "A", 30), ("b", "B", 45), ("c", "C", 30)], day=105)
+    store.record("artist", "Artist", ALBUM, [("new", "New", 90)], day=105)
+    # "new" was first seen inside the window, there's nothing to compare it with
+    movers = store.top_movers("artist", days=3, day=105)
+    assert [(m[0], m[3], m[4]) for m in movers] == [("a", 10, 30), ("b", 50, 45)]
+
+
+
+def test_cached_popularities_go_under_the_day_they_were_fetched(store):
+    store.record("artist", "Artist", ALBUM, [("album", "Album", 40)], day=100)
+    # Served from the cache on day 102, fetched late on day 101
+    fetched = {"album": 101 * 86400 + 80000}
+    store.record("artist", "Artist", ALBUM, [("album", "Album", 45), ("other", "Other", 20)], day=102,
+                 fetched=fetched)
+    assert store.series("album") == [(history.day_to_date(100), 40), (history.day_to_date(101), 45)]
+    assert store.series("other") == [(history.day_to_date(102), 20)]
+
+
+def test_cache_reports_when_responses_were_fetched(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+    sp = CachedSpotify(None, cache)
+    before = time.time()
+    sp.remember("album", [{"id": "cached", "popularity": 40}])
+    fetched = sp.fetched_at("album", ["cached", "missing"])
+    assert list(fetched) == ["cached"]
+    assert before - 1 <= fetched["cached"] <= time.time() + 1
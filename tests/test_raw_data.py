@@ -0,0 +1,90 @@
+import time
+
+from analyzer_core import AnalyzerCore
+from background import TaskRunner
+from fake_spotify import make_album, make_artist, make_track
+from popularity import SpotifyAnalyzer
+from raw_data import RawDataReport
+
+ALL_TYPES = "album,single,compilation"
+
+
+class FakeRoot:
+    # Stands in for the Tk root: after() callbacks only run when the test pumps them
+    def __init__(self):
+        self.pending = []
+
+    def after(self, ms, fn):
+        self.pending.append(fn)
+        return len(self.pending)
+
+    def after_cancel(self, after_id):
+        pass
+
+    def pump(self):
+        pending, self.pending = self.pending, []
+        for fn in pending:
+            fn()
+
+
+def make_app(core):
+    # The window itself isn't created, only what loading the report's details needs
+    app = SpotifyAnalyzer.__new__(SpotifyAnalyzer)
+    app.root = FakeRoot()
+    app.tasks = TaskRunner(app.root)
+    app.core = core
+    app.errors = []
+    app._show_progress = lambda *args: None
+    app._show_error = app.errors.append
+    return app
+
+
+def run_tasks(app, timeout=10):
+    deadline = time.monotonic() + timeout
+    while app.tasks.busy() and time.monotonic() < deadline:
+        app.root.pump()
+        time.sleep(0.01)
+    app.tasks.shutdown()
+
+
+def test_report_starts_from_the_held_data(sp):
+    albums, _, _ = AnalyzerCore(sp).fetch_discography("artz3", ALL_TYPES, [])
+    report = RawDataReport("artz3", "Artist artz3", albums, [])
+    text = report.text()
+    assert f"     Popularity: {albums[0][2]}" in text
+    assert "Release date" not in text
+    assert report.missing() == (True, [album[0] for album in albums], [])
+
+
+def test_page_details_are_loaded_through_the_task_runner(sp):
+    core = AnalyzerCore(sp)
+    albums, _, _ = core.fetch_discography("artz3", ALL_TYPES, [])
+    track = make_track("artz3A0T0")
+    tracks = [{"id": track["id"], "name": track["name"], "popularity": track["popularity"]}]
+    report = RawDataReport("artz3", "Artist artz3", albums, tracks, artist=make_artist("artz3"))
+    app = make_app(core)
+    loaded = []
+    # Only the artist and the first two albums are on this page
+    app._load_raw_details(report, 0, 4, then=lambda: loaded.append(True))
+    run_tasks(app)
+    assert app.errors == []
+    assert loaded == [True]
+    assert list(report.album_details) == [album[0] for album in albums[:2]]
+    assert report.missing() == (False, [albums[2][0]], [track["id"]])
+    album = make_album(albums[0][0])
+    assert f"     Release date: {album['release_date']}" in report.text()
+
+
+def test_details_of_a_page_are_fetched_once(sp, server):
+    core = AnalyzerCore(sp)
+    albums, _, _ = core.fetch_discography("artz3", ALL_TYPES, [])
+    report = RawDataReport("artz3", "Artist artz3", albums, [], artist=make_artist("artz3"))
+    app = make_app(core)
+    app._load_raw_details(report)
+    run_tasks(app)
+    server.reset_stats()
+    loaded = []
+    app = make_app(core)
+    app._load_raw_details(report, then=lambda: loaded.append(True))
+    assert loaded == [True]
+    assert not server.requests
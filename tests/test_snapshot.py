@@ -0,0 +1,73 @@
+import pytest
+
+import snapshot
+from analyzer_core import AnalyzerCore, KeywordFilter, VariantGroups
+from catalog import ArtistCatalog
+
+TYPES = ["album", "single", "compilation"]
+
+
+@pytest.fixture
+def catalog(sp):
+    core = AnalyzerCore(sp)
+    catalog = ArtistCatalog("artz40")
+    catalog.start(TYPES)
+    stats = {}
+    variants = VariantGroups()
+    for by_type in core.iter_catalog("artz40", TYPES, stats=stats, variants=variants):
+        catalog.add(by_type)
+    catalog.finish(TYPES)
+    catalog.add_variants(variants, stats["groups"])
+    # A hydrated variant of the first release
+    catalog.set_variants({"artz40A0": [("artz41A0", "Release 0", "album")]})
+    catalog.add({"album": [("artz41A0", "Release 0", 12, "1980")]}, variant=True)
+    catalog.remove(2)
+    return catalog
+
+
+def rows(catalog):
+    return sorted(catalog.albums(TYPES, KeywordFilter([]), show_variants=True))
+
+
+def test_save_and_open_round_trip(sp, catalog, tmp_path):
+    path = str(tmp_path / ("artist" + snapshot.EXTENSION))
+    saved = snapshot.save(AnalyzerCore(sp), catalog, path, {"market": ""})
+    assert saved["albums"] == len(rows(catalog))
+
+    bundle = snapshot.Snapshot(path)
+    try:
+        assert bundle.artist_id == "artz40"
+        assert bundle.settings == {"market": ""}
+        opened = bundle.catalog()
+        assert rows(opened) == rows(catalog)
+        assert opened.removed == catalog.removed
+        assert opened.loaded == catalog.loaded
+        assert opened.variants == catalog.variants
+        assert opened.variant_of("artz41A0") == "artz40A0"
+        assert opened.releases.rows(opened.variant.nonzero()[0]) == [("artz41A0", "Release 0", 12, "1980")]
+
+        offline = snapshot.SnapshotSpotify(bundle)
+        album_id = rows(catalog)[0][0]
+        live_album = sp.album(album_id)
+        album = offline.album(album_id)
+        assert album["popularity"] == live_album["popularity"]
+        assert album["release_date"] == live_album["release_date"]
+        assert [t["id"] for t in offline.album_tracks(album_id)["items"]] == \
+            [t["id"] for t in live_album["tracks"]["items"]]
+
+        track_id = live_album["tracks"]["items"][0]["id"]
+        assert offline.track(track_id)["popularity"] == sp.track(track_id)["popularity"]
+        features = offline.audio_features([track_id, "missing"])
+        assert features[0]["tempo"] == sp.audio_features([track_id])[0]["tempo"]
+        assert features[1] is None
+        with pytest.raises(LookupError):
+            offline.album(catalog.releases.ids[2])
+    finally:
+        bundle.close()
+
+
+def test_not_a_bundle(tmp_path):
+    path = tmp_path / "other.spsnap"
+    path.write_bytes(b"not a snapshot at all")
+    with pytest.raises(ValueError):
+        snapshot.Snapshot(str(path))